@@ -1,33 +1,297 @@
-from fastapi import APIRouter, Depends
-from ..models import schemas
-from ..services import ingestion_service, dashboard_service, reorder_service
-from ..utils.dependencies import verify_write_allowed
+from datetime import date
+from typing import List, Optional
+from fastapi import APIRouter, Depends, Header, HTTPException, Path, Query, Request, status
+from fastapi.responses import StreamingResponse
+from ...core.cache import cache
+from ...models import schemas
+from ...models.validation import BatchValidationError
+from ...services import budget_cube, exports, ingestion_service, ingest_jobs, dashboard_service, reorder_runs, reorder_service
+from ...utils.csv_stream import CsvFormatError
+from ...utils.dependencies import verify_write_allowed
+from ...utils.responses import FORMAT_PATTERN, MEDIA_TYPES, STREAM_FORMAT_PATTERN, encode_rows, rows_response
 
 router = APIRouter()
 
+# Optional client-chosen id of one submission; with it ingestion commits in
+# checkpointed batches and retrying a failed submission with the same id
+# resumes where it stopped. Use a new id for each new upload.
+SOURCE_FINGERPRINT = Header(None, regex="^[0-9A-Za-z_.:-]{8,128}$")
+
+# Optional name of the uploaded file, recorded in audit_log.file_name
+FILE_NAME = Header(None, max_length=255)
+
+def _batch_errors(exc: BatchValidationError):
+    errors = exc.errors.head(ingestion_service.MAX_REPORTED_ERRORS)
+    return {"message": str(exc), "errors": errors.to_dict("records")}
+
 @router.get("/dashboard/sales-summary", response_model=list[schemas.SalesSummary])
-async def sales_summary():
-    data = await dashboard_service.get_sales_summary()
-    return [schemas.SalesSummary(**row) for row in data]
+async def sales_summary(
+    request: Request,
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    format: Optional[str] = Query(None, regex=FORMAT_PATTERN),
+):
+    data = await dashboard_service.get_sales_summary(start_date, end_date)
+    return rows_response(request, data, schemas.SalesSummary, format)
 
 @router.get("/dashboard/inventory-status", response_model=list[schemas.InventoryStatus])
-async def inventory_status():
-    data = await dashboard_service.get_inventory_status()
-    return [schemas.InventoryStatus(**row) for row in data]
+async def inventory_status(
+    request: Request,
+    store_id: Optional[int] = None,
+    sku_prefix: Optional[str] = Query(None, regex="^[A-Za-z0-9_-]{1,20}$"),
+    min_quantity: Optional[int] = None,
+    max_quantity: Optional[int] = None,
+    after_store_id: Optional[int] = None,
+    after_sku: Optional[str] = Query(None, regex=schemas.SKU_PATTERN),
+    limit: Optional[int] = Query(None, ge=1, le=10000),
+    format: Optional[str] = Query(None, regex=STREAM_FORMAT_PATTERN),
+    as_of: Optional[date] = None,
+):
+    if (after_store_id is None) != (after_sku is None):
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail="after_store_id and after_sku must be given together",
+        )
+    after = (after_store_id, after_sku) if after_store_id is not None else None
+    filters = dict(
+        store_id=store_id, sku_prefix=sku_prefix, min_quantity=min_quantity,
+        max_quantity=max_quantity, after=after, limit=limit, as_of=as_of,
+    )
+
+    # Rows come straight from the inventory table's typed columns, so they are
+    # serialized as-is rather than re-validated through InventoryStatus.
+    if format == "ndjson" or (format is None and "application/x-ndjson" in request.headers.get("accept", "")):
+        columns = list(schemas.InventoryStatus.__fields__)
+
+        async def lines():
+            async for rows in dashboard_service.stream_inventory_status(**filters):
+                yield encode_rows(rows, "ndjson", columns)
+        return StreamingResponse(lines(), media_type=MEDIA_TYPES["ndjson"])
+
+    data = await dashboard_service.get_inventory_status(**filters)
+    headers = {}
+    if limit is not None and len(data) == limit:
+        last = data[-1]
+        headers["X-Next-Cursor"] = f"after_store_id={last['store_id']}&after_sku={last['sku']}"
+    return rows_response(request, data, schemas.InventoryStatus, format, headers)
+
+@router.get("/dashboard/sales-velocity", response_model=list[schemas.SalesVelocity])
+async def sales_velocity(
+    request: Request,
+    store_id: Optional[int] = None,
+    sku_prefix: Optional[str] = Query(None, regex="^[A-Za-z0-9_-]{1,20}$"),
+    after_store_id: Optional[int] = None,
+    after_sku: Optional[str] = Query(None, regex=schemas.SKU_PATTERN),
+    limit: int = Query(1000, ge=1, le=10000),
+    format: Optional[str] = Query(None, regex=FORMAT_PATTERN),
+):
+    if (after_store_id is None) != (after_sku is None):
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail="after_store_id and after_sku must be given together",
+        )
+    after = (after_store_id, after_sku) if after_store_id is not None else None
+    data = await dashboard_service.get_sales_velocity(store_id, sku_prefix, after, limit)
+    return rows_response(request, data, schemas.SalesVelocity, format)
+
+@router.get("/dashboard/sales-budget", response_model=list[schemas.SalesBudgetRollup])
+async def sales_budget(
+    request: Request,
+    grain: str = Query("month", regex="^(day|week|month)$"),
+    store_id: Optional[int] = None,
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    format: Optional[str] = Query(None, regex=FORMAT_PATTERN),
+):
+    data = await dashboard_service.get_sales_budget_rollup(grain, store_id, start_date, end_date)
+    return rows_response(request, data, schemas.SalesBudgetRollup, format)
+
+@router.get("/dashboard/budget-variance", response_model=list[schemas.BudgetVariance])
+async def budget_variance(
+    request: Request,
+    grain: str = Query("month", regex="^(day|week|month|fiscal_year)$"),
+    store_id: Optional[List[int]] = Query(None),
+    store_name: Optional[List[str]] = Query(None),
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    by_store: bool = True,
+    format: Optional[str] = Query(None, regex=FORMAT_PATTERN),
+):
+    try:
+        cube = budget_cube.get_cube()
+    except budget_cube.CubeNotLoaded as exc:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=str(exc))
+    data = cube.variance(grain, store_id, store_name, start_date, end_date, by_store)
+    return rows_response(request, data, schemas.BudgetVariance, format)
+
+@router.get("/export/{dataset}")
+async def export_history(
+    dataset: str = Path(..., regex="^(historical_daily_sales|budget_forecasts|salessummary)$"),
+    format: str = Query(exports.PARQUET, regex="^(parquet|arrow)$"),
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    store_id: Optional[int] = None,
+    store_name: Optional[str] = None,
+):
+    try:
+        chunks = exports.stream_export(dataset, format, start_date, end_date, store_id, store_name)
+    except exports.ExportError as exc:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=str(exc))
+    filename = f"{dataset}.{exports.FILE_EXTENSIONS[format]}"
+    return StreamingResponse(
+        chunks,
+        media_type=exports.MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
 
+async def _json_records(request: Request):
+    try:
+        return ingestion_service.decode_records(await request.body())
+    except ingestion_service.InvalidPayload as exc:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=str(exc))
+
+# The JSON bodies are decoded without per-record models and validated
+# column-wise by the service, like the CSV uploads.
 @router.post("/ingest/sales")
-async def ingest_sales(payload: schemas.SalesIngestion, allowed: bool = Depends(verify_write_allowed)):
-    await ingestion_service.insert_sales(payload.records)
-    return {"status": "success", "ingested": len(payload.records)}
+async def ingest_sales(
+    request: Request,
+    on_error: str = Query("reject", regex="^(reject|quarantine)$"),
+    x_source_fingerprint: Optional[str] = SOURCE_FINGERPRINT,
+    x_file_name: Optional[str] = FILE_NAME,
+    allowed: bool = Depends(verify_write_allowed),
+):
+    records = await _json_records(request)
+    try:
+        counts = await ingestion_service.insert_sales(
+            records, on_error, source=x_source_fingerprint, file_name=x_file_name,
+        )
+    except BatchValidationError as exc:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=_batch_errors(exc))
+    return {"status": "success", **counts}
 
 @router.post("/ingest/inventory")
-async def ingest_inventory(payload: schemas.InventoryIngestion, allowed: bool = Depends(verify_write_allowed)):
-    await ingestion_service.insert_inventory(payload.records)
-    return {"status": "success", "ingested": len(payload.records)}
+async def ingest_inventory(
+    request: Request,
+    on_error: str = Query("reject", regex="^(reject|quarantine)$"),
+    x_source_fingerprint: Optional[str] = SOURCE_FINGERPRINT,
+    x_file_name: Optional[str] = FILE_NAME,
+    allowed: bool = Depends(verify_write_allowed),
+):
+    records = await _json_records(request)
+    try:
+        counts = await ingestion_service.insert_inventory(
+            records, on_error, source=x_source_fingerprint, file_name=x_file_name,
+        )
+    except BatchValidationError as exc:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=_batch_errors(exc))
+    return {"status": "success", **counts}
+
+@router.post("/ingest/sales/csv")
+async def ingest_sales_csv(
+    request: Request,
+    on_error: str = Query("reject", regex="^(reject|quarantine)$"),
+    x_source_fingerprint: Optional[str] = SOURCE_FINGERPRINT,
+    x_file_name: Optional[str] = FILE_NAME,
+    allowed: bool = Depends(verify_write_allowed),
+):
+    try:
+        counts = await ingestion_service.insert_sales_csv(
+            request.stream(), on_error, source=x_source_fingerprint, file_name=x_file_name,
+        )
+    except CsvFormatError as exc:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=str(exc))
+    except BatchValidationError as exc:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=_batch_errors(exc))
+    return {"status": "success", **counts}
+
+@router.post("/ingest/inventory/csv")
+async def ingest_inventory_csv(
+    request: Request,
+    on_error: str = Query("reject", regex="^(reject|quarantine)$"),
+    x_source_fingerprint: Optional[str] = SOURCE_FINGERPRINT,
+    x_file_name: Optional[str] = FILE_NAME,
+    allowed: bool = Depends(verify_write_allowed),
+):
+    try:
+        counts = await ingestion_service.insert_inventory_csv(
+            request.stream(), on_error, source=x_source_fingerprint, file_name=x_file_name,
+        )
+    except CsvFormatError as exc:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=str(exc))
+    except BatchValidationError as exc:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=_batch_errors(exc))
+    return {"status": "success", **counts}
+
+@router.post("/ingest/inventory/snapshot")
+async def ingest_inventory_snapshot(
+    payload: schemas.InventorySnapshot,
+    as_of: Optional[date] = None,
+    x_file_name: Optional[str] = FILE_NAME,
+    allowed: bool = Depends(verify_write_allowed),
+):
+    counts = await ingestion_service.insert_inventory_snapshot(payload.records, as_of, file_name=x_file_name)
+    return {"status": "success", "ingested": len(payload.records), **counts}
+
+@router.post("/ingest/inventory/snapshot/csv")
+async def ingest_inventory_snapshot_csv(
+    request: Request,
+    as_of: Optional[date] = None,
+    x_file_name: Optional[str] = FILE_NAME,
+    allowed: bool = Depends(verify_write_allowed),
+):
+    # No quarantine mode: a skipped row would remove its position
+    try:
+        counts = await ingestion_service.insert_inventory_snapshot_csv(request.stream(), as_of, file_name=x_file_name)
+    except CsvFormatError as exc:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=str(exc))
+    except BatchValidationError as exc:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=_batch_errors(exc))
+    return {"status": "success", **counts}
+
+@router.post("/ingest/jobs/{kind}", status_code=status.HTTP_202_ACCEPTED)
+async def submit_ingest_job(
+    request: Request,
+    kind: str = Path(..., regex="^(sales|inventory)$"),
+    format: str = Query("csv", regex="^(csv|json)$"),
+    on_error: str = Query("reject", regex="^(reject|quarantine)$"),
+    x_file_name: Optional[str] = FILE_NAME,
+    allowed: bool = Depends(verify_write_allowed),
+):
+    try:
+        return await ingest_jobs.submit(kind, format, on_error, request.stream(), file_name=x_file_name)
+    except ingest_jobs.QueueFull as exc:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS, detail=str(exc), headers={"Retry-After": "30"}
+        )
+
+@router.get("/ingest/jobs/{job_id}")
+async def ingest_job(job_id: str = Path(..., regex="^[0-9a-f]{32}$")):
+    job = await ingest_jobs.get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Ingestion job not found")
+    return job
 
 @router.get("/reorder/recommendations", response_model=list[schemas.ReorderRecommendation])
-async def reorder_recommendations():
+async def reorder_recommendations(request: Request, format: Optional[str] = Query(None, regex=FORMAT_PATTERN)):
     data = await reorder_service.get_reorder_recommendations()
-    return [schemas.ReorderRecommendation(**row) for row in data]
+    return rows_response(request, data, schemas.ReorderRecommendation, format)
+
+@router.post("/reorder/runs", status_code=status.HTTP_202_ACCEPTED)
+async def start_reorder_run(
+    window_days: Optional[int] = Query(None, ge=1, le=365),
+    allowed: bool = Depends(verify_write_allowed),
+):
+    return await reorder_runs.start_run(window_days)
+
+@router.get("/reorder/runs/{run_id}", response_model=schemas.ReorderRun)
+async def reorder_run(run_id: int):
+    run = await reorder_service.get_run(run_id)
+    if run is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Reorder run not found")
+    return schemas.ReorderRun(**run)
+
+@router.get("/cache/stats")
+async def cache_stats():
+    return cache.stats()
 
 api_router = router
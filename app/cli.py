@@ -0,0 +1,162 @@
+"""Operational commands for the API's database objects.
+
+    python -m app.cli verify-velocity [--show N]
+    python -m app.cli rebuild-velocity
+    python -m app.cli partitions [TABLE]
+    python -m app.cli maintain-partitions
+    python -m app.cli detach-partition TABLE YYYY-MM [--archive]
+    python -m app.cli attach-partition TABLE YYYY-MM
+    python -m app.cli export DATASET OUTPUT [--format parquet|arrow] [--start-date D] [--end-date D]
+                             [--store-id N] [--store-name NAME]
+"""
+import argparse
+import asyncio
+import sys
+from datetime import date, datetime
+
+from .core.database import db
+from .services import exports, partitions, sales_velocity
+
+
+async def _verify_velocity(args):
+    as_of, mismatches, sample = await sales_velocity.verify(limit=args.show)
+    if as_of is None:
+        print("sales_velocity has not been built yet; run rebuild-velocity")
+        return 1
+    if not mismatches:
+        print(f"sales_velocity matches raw sales as of {as_of}")
+        return 0
+    print(f"sales_velocity differs from raw sales as of {as_of} for {mismatches} store/SKU rows")
+    for row in sample:
+        print(f"  store {row['store_id']} sku {row['sku']}")
+        print(f"    expected: {row['expected']}")
+        print(f"    actual:   {row['actual']}")
+    return 1
+
+
+async def _rebuild_velocity(args):
+    rows = await sales_velocity.rebuild()
+    print(f"Rebuilt sales_velocity: {rows} rows")
+    return 0
+
+
+async def _list_partitions(args):
+    async with db.pool.acquire() as conn:
+        for table in args.table or partitions.FACT_TABLES:
+            if not await partitions.is_partitioned(conn, table):
+                print(f"{table}: not partitioned; run partitioning.sql")
+                continue
+            print(table)
+            for row in await partitions.list_partitions(conn, table):
+                month = "default" if row["month"] is None else f"{row['month']:%Y-%m}"
+                print(f"  {month:8} {row['partition']:40} ~{row['estimated_rows']} rows {row['bytes']} bytes")
+    return 0
+
+
+async def _maintain_partitions(args):
+    results = await partitions.maintain()
+    if results is None:
+        print("Partition maintenance is already running in another process")
+        return 1
+    for table, result in results.items():
+        print(
+            f"{table}: {result['created']} created, "
+            f"detached {result['detached'] or 'none'}, archived {result['archived'] or 'none'}"
+        )
+    return 0
+
+
+async def _detach_partition(args):
+    async with db.pool.acquire() as conn:
+        async with conn.transaction():
+            if args.archive:
+                name = await partitions.archive_partition(conn, args.table, args.month)
+            else:
+                name = await partitions.detach_partition(conn, args.table, args.month)
+        if args.archive:
+            await partitions.compact_archived(conn, name)
+    print(f"{'Archived' if args.archive else 'Detached'} {name}")
+    return 0
+
+
+async def _attach_partition(args):
+    async with db.pool.acquire() as conn:
+        async with conn.transaction():
+            name = await partitions.attach_partition(conn, args.table, args.month)
+    print(f"Attached {name}")
+    return 0
+
+
+async def _export(args):
+    try:
+        chunks = exports.stream_export(
+            args.dataset, args.format, args.start_date, args.end_date, args.store_id, args.store_name,
+            args.batch_rows,
+        )
+    except exports.ExportError as exc:
+        print(exc)
+        return 1
+    size = 0
+    with open(args.output, "wb") as f:
+        async for chunk in chunks:
+            f.write(chunk)
+            size += len(chunk)
+    print(f"Wrote {args.dataset} to {args.output} ({size} bytes)")
+    return 0
+
+
+def _month(value):
+    return datetime.strptime(value, "%Y-%m").date()
+
+
+COMMANDS = {
+    "verify-velocity": _verify_velocity,
+    "rebuild-velocity": _rebuild_velocity,
+    "partitions": _list_partitions,
+    "maintain-partitions": _maintain_partitions,
+    "detach-partition": _detach_partition,
+    "attach-partition": _attach_partition,
+    "export": _export,
+}
+
+
+async def _run(args):
+    await db.connect()
+    try:
+        return await COMMANDS[args.command](args)
+    finally:
+        await db.disconnect()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m app.cli", description="Cascadia API maintenance commands")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    verify = subparsers.add_parser("verify-velocity", help="Recompute sales_velocity from raw sales and diff")
+    verify.add_argument("--show", type=int, default=20, help="Number of differing rows to print")
+    subparsers.add_parser("rebuild-velocity", help="Recompute sales_velocity from raw sales")
+    tables = sorted(partitions.FACT_TABLES)
+    listing = subparsers.add_parser("partitions", help="List the monthly partitions of the sales fact tables")
+    listing.add_argument("table", nargs="*", choices=tables)
+    subparsers.add_parser("maintain-partitions", help="Create upcoming partitions and apply retention now")
+    detach = subparsers.add_parser("detach-partition", help="Detach one month of a fact table")
+    detach.add_argument("table", choices=tables)
+    detach.add_argument("month", type=_month, help="Month as YYYY-MM")
+    detach.add_argument("--archive", action="store_true", help="Move it to the archive schema and compact it")
+    attach = subparsers.add_parser("attach-partition", help="Attach a detached or archived month again")
+    attach.add_argument("table", choices=tables)
+    attach.add_argument("month", type=_month, help="Month as YYYY-MM")
+    export = subparsers.add_parser("export", help="Write sales or budget history as Parquet or Arrow IPC")
+    export.add_argument("dataset", choices=sorted(exports.DATASETS))
+    export.add_argument("output", help="File to write")
+    export.add_argument("--format", choices=sorted(exports.MEDIA_TYPES), default=exports.PARQUET)
+    export.add_argument("--start-date", type=date.fromisoformat)
+    export.add_argument("--end-date", type=date.fromisoformat)
+    export.add_argument("--store-id", type=int)
+    export.add_argument("--store-name")
+    export.add_argument("--batch-rows", type=int, help="Rows per record batch (default EXPORT_BATCH_ROWS)")
+    args = parser.parse_args(argv)
+    return asyncio.run(_run(args))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
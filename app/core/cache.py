@@ -0,0 +1,144 @@
+"""In-process TTL/LRU result cache for read endpoints, invalidated by (table, store_id) tags."""
+import asyncio
+import functools
+import inspect
+import time
+from collections import OrderedDict
+
+from .config import settings
+
+ALL_STORES = None
+_TABLE = object()
+
+
+class ResultCache:
+    def __init__(self, ttl: float, max_entries: int):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._inflight = {}
+        self._generations = {}
+        self._stats = {"hits": 0, "misses": 0, "coalesced": 0, "evictions": 0, "invalidations": 0}
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl > 0 and self.max_entries > 0
+
+    async def get_or_load(self, key, tags, loader):
+        if not self.enabled:
+            return await loader()
+
+        entry = self._entries.get(key)
+        if entry is not None:
+            expires_at, _, value = entry
+            if expires_at > time.monotonic():
+                self._entries.move_to_end(key)
+                self._stats["hits"] += 1
+                return value
+            del self._entries[key]
+
+        pending = self._inflight.get(key)
+        if pending is not None:
+            self._stats["coalesced"] += 1
+            return await asyncio.shield(pending)
+
+        self._stats["misses"] += 1
+        generations = self._snapshot(tags)
+        pending = asyncio.get_running_loop().create_future()
+        self._inflight[key] = pending
+        try:
+            value = await loader()
+        except asyncio.CancelledError:
+            pending.cancel()
+            raise
+        except Exception as exc:
+            pending.set_exception(exc)
+            # Retrieve it so an unawaited failure is not logged as a warning
+            pending.exception()
+            raise
+        finally:
+            del self._inflight[key]
+        pending.set_result(value)
+        # An invalidation that raced the load may have made `value` stale
+        if generations == self._snapshot(tags):
+            self._store(key, tags, value)
+        return value
+
+    def invalidate(self, table: str, store_ids=None) -> int:
+        """Drop entries for `table` that cover any of `store_ids` (or every store if None)."""
+        stores = None if store_ids is None else set(store_ids)
+        self._bump(table, stores)
+        stale = [
+            key
+            for key, (_, tags, _) in self._entries.items()
+            if any(
+                tag_table == table and (stores is None or tag_store is ALL_STORES or tag_store in stores)
+                for tag_table, tag_store in tags
+            )
+        ]
+        for key in stale:
+            del self._entries[key]
+        self._stats["invalidations"] += len(stale)
+        return len(stale)
+
+    def clear(self):
+        self._entries.clear()
+        self._generations.clear()
+
+    def stats(self) -> dict:
+        lookups = self._stats["hits"] + self._stats["misses"] + self._stats["coalesced"]
+        return {
+            **self._stats,
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl,
+            "hit_ratio": (self._stats["hits"] + self._stats["coalesced"]) / lookups if lookups else 0.0,
+        }
+
+    def _store(self, key, tags, value):
+        self._entries[key] = (time.monotonic() + self.ttl, tags, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self._stats["evictions"] += 1
+
+    def _snapshot(self, tags):
+        return tuple(
+            (self._generations.get((table, _TABLE), 0), self._generations.get((table, store), 0))
+            for table, store in tags
+        )
+
+    def _bump(self, table, stores):
+        # A table-wide invalidation moves the _TABLE counter every tag on that
+        # table snapshots; a store-scoped one moves the counters of those
+        # stores and of ALL_STORES, since all-store results include them.
+        keys = [(table, _TABLE)] if stores is None else [(table, ALL_STORES), *((table, s) for s in stores)]
+        for tag in keys:
+            self._generations[tag] = self._generations.get(tag, 0) + 1
+
+
+cache = ResultCache(settings.cache_ttl_seconds, settings.cache_max_entries)
+
+
+def cached(*tables, store_arg=None):
+    """Cache an async read function's result, tagged by `tables`.
+
+    The key is the function name plus its bound arguments. When `store_arg`
+    names a parameter, entries are tagged with that store so ingestion for
+    other stores leaves them in place.
+    """
+    def decorator(func):
+        signature = inspect.signature(func)
+
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            key = (func.__module__, func.__qualname__, tuple(bound.arguments.items()))
+            store = bound.arguments.get(store_arg, ALL_STORES) if store_arg else ALL_STORES
+            tags = tuple((table, store) for table in tables)
+            return await cache.get_or_load(key, tags, lambda: func(*args, **kwargs))
+
+        return wrapper
+
+    return decorator
@@ -1,14 +1,112 @@
+import asyncio
+import contextlib
+import time
+
 import asyncpg
 from .config import settings
+from .logging import logger
+from . import metrics
+
+# Errors on a replica connection that say the replica, not the query, is at fault
+REPLICA_CONNECTION_ERRORS = (
+    OSError,
+    asyncpg.InterfaceError,
+    asyncpg.exceptions.CannotConnectNowError,
+    asyncpg.exceptions.AdminShutdownError,
+)
+
+# Zero while the replica has replayed everything it received; otherwise the
+# age of the last replayed transaction
+REPLICA_LAG_QUERY = """
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() THEN 0
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+    END
+"""
+
+class AppConnection(asyncpg.Connection):
+    """Connection that keeps explicitly prepared statements for its lifetime."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._prepared = {}
+
+    async def fetch_prepared(self, query, *args):
+        """fetch() through a statement prepared once per connection."""
+        statement = self._prepared.get(query)
+        if statement is None:
+            statement = self._prepared[query] = await self.prepare(query)
+        try:
+            return await statement.fetch(*args)
+        except asyncpg.exceptions.InvalidCachedStatementError:
+            # The schema changed under the statement; prepare it again once
+            statement = self._prepared[query] = await self.prepare(query)
+            return await statement.fetch(*args)
+
+async def _init_connection(conn):
+    conn.add_query_logger(metrics.record_query)
 
 class Database:
+    """Primary pool for writes, optional replica pool for interactive reads.
+
+    acquire_read() uses the replica while it is reachable, within
+    REPLICA_MAX_LAG_SECONDS, and no write went through this process
+    within that window (so a cache refill after ingestion never reads
+    stale rows); otherwise it uses the primary. The fallback happens when
+    the connection is handed out: an error raised while the caller uses a
+    replica connection propagates (callers are not retried), but a
+    connection-level one marks the replica unhealthy so later reads go to
+    the primary until the monitor sees it recover. acquire_bulk() caps
+    ingestion at DB_BULK_MAX_CONNECTIONS primary connections so long loads
+    cannot starve dashboard reads.
+    """
+
     def __init__(self):
         self._pool = None
+        self._replica = None
+        self._replica_healthy = False
+        self._replica_monitor = None
+        self._bulk_slots = None
+        self._last_write = float("-inf")
+
+    async def _create_pool(self, name, dsn, min_size, max_size):
+        pool = await asyncpg.create_pool(
+            dsn=dsn,
+            min_size=min_size,
+            max_size=max_size,
+            max_queries=settings.db_max_queries,
+            max_inactive_connection_lifetime=settings.db_max_inactive_lifetime,
+            statement_cache_size=settings.db_statement_cache_size,
+            connection_class=AppConnection,
+            init=_init_connection,
+        )
+        metrics.watch_pool(pool, name)
+        return metrics.InstrumentedPool(pool, name)
 
     async def connect(self):
-        self._pool = await asyncpg.create_pool(dsn=settings.database_url)
+        self._pool = await self._create_pool(
+            "primary", settings.database_url, settings.db_pool_min_size, settings.db_pool_max_size
+        )
+        self._bulk_slots = asyncio.Semaphore(settings.db_bulk_max_connections)
+        if settings.database_replica_url:
+            try:
+                self._replica = await self._create_pool(
+                    "replica", settings.database_replica_url,
+                    settings.db_replica_pool_min_size, settings.db_replica_pool_max_size,
+                )
+            except (OSError, asyncpg.PostgresError, asyncio.TimeoutError) as exc:
+                logger.warning("Replica unavailable, reading from primary: %s", exc)
+            else:
+                await self._check_replica()
+                self._replica_monitor = asyncio.create_task(self._monitor_replica())
 
     async def disconnect(self):
+        if self._replica_monitor:
+            self._replica_monitor.cancel()
+            await asyncio.gather(self._replica_monitor, return_exceptions=True)
+        if self._replica:
+            await self._replica.close()
         if self._pool:
             await self._pool.close()
 
@@ -16,4 +114,71 @@ class Database:
     def pool(self):
         return self._pool
 
+    async def _check_replica(self):
+        try:
+            async with self._replica.acquire(timeout=settings.replica_check_interval) as conn:
+                lag = float(await conn.fetchval(REPLICA_LAG_QUERY))
+        except (OSError, asyncpg.PostgresError, asyncio.TimeoutError) as exc:
+            if self._replica_healthy:
+                logger.warning("Replica check failed, reading from primary: %s", exc)
+            self._replica_healthy = False
+            return
+        metrics.replica_lag_seconds.set(value=lag)
+        healthy = lag <= settings.replica_max_lag_seconds
+        if healthy != self._replica_healthy:
+            logger.info("Replica %s (lag %.1fs)", "in use" if healthy else "lagging, reading from primary", lag)
+        self._replica_healthy = healthy
+
+    async def _monitor_replica(self):
+        while True:
+            await asyncio.sleep(settings.replica_check_interval)
+            await self._check_replica()
+
+    def _use_replica(self):
+        return (
+            self._replica is not None
+            and self._replica_healthy
+            and time.monotonic() - self._last_write > settings.replica_max_lag_seconds
+        )
+
+    @contextlib.asynccontextmanager
+    async def acquire_read(self):
+        """Connection for reads that tolerate replica lag up to REPLICA_MAX_LAG_SECONDS.
+
+        Falls back to the primary only if no replica connection can be
+        acquired; errors inside the block reach the caller.
+        """
+        if self._use_replica():
+            try:
+                conn = await self._replica.acquire(timeout=settings.replica_acquire_timeout)
+            except (OSError, asyncpg.PostgresError, asyncio.TimeoutError) as exc:
+                logger.warning("Replica acquire failed, reading from primary: %s", exc)
+                self._replica_healthy = False
+            else:
+                try:
+                    yield conn
+                except REPLICA_CONNECTION_ERRORS as exc:
+                    logger.warning("Replica connection failed, reading from primary: %s", exc)
+                    self._replica_healthy = False
+                    raise
+                finally:
+                    await self._replica.release(conn)
+                return
+        async with self._pool.acquire() as conn:
+            yield conn
+
+    def note_write(self):
+        """Keep acquire_read() on the primary until the replica can have caught up."""
+        self._last_write = time.monotonic()
+
+    @contextlib.asynccontextmanager
+    async def acquire_bulk(self):
+        """Primary connection for ingestion, limited to DB_BULK_MAX_CONNECTIONS at once."""
+        async with self._bulk_slots:
+            try:
+                async with self._pool.acquire() as conn:
+                    yield conn
+            finally:
+                self.note_write()
+
 db = Database()
@@ -0,0 +1,298 @@
+"""In-process metrics with a Prometheus text exposition."""
+import bisect
+import functools
+import inspect
+import re
+import time
+
+from .logging import logger
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+SIZE_BUCKETS = (1, 10, 100, 500, 1000, 5000, 10000, 50000, 100000)
+MAX_STATEMENTS = 500
+STATEMENT_LENGTH = 160
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names, values, extra=()):
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    pairs.extend(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name, help, labels=()):
+        self.name, self.help, self.label_names = name, help, tuple(labels)
+        self._values = {}
+
+    def inc(self, *labels, amount=1):
+        self._values[labels] = self._values.get(labels, 0) + amount
+
+    def samples(self):
+        for labels, value in self._values.items():
+            yield self.name, _labels(self.label_names, labels), value
+
+
+class Gauge:
+    kind = "gauge"
+
+    def __init__(self, name, help, labels=(), callback=None):
+        self.name, self.help, self.label_names = name, help, tuple(labels)
+        self._values = {}
+        self._callback = callback
+
+    def set(self, *labels, value):
+        self._values[labels] = value
+
+    def samples(self):
+        values = self._callback() if self._callback else self._values
+        for labels, value in values.items():
+            yield self.name, _labels(self.label_names, labels), value
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        self.name, self.help, self.label_names = name, help, tuple(labels)
+        self.buckets = tuple(buckets)
+        self._series = {}
+
+    def observe(self, *labels, value):
+        series = self._series.get(labels)
+        if series is None:
+            series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+        series[0][bisect.bisect_left(self.buckets, value)] += 1
+        series[1] += value
+        series[2] += 1
+
+    def samples(self):
+        for labels, (counts, total, count) in list(self._series.items()):
+            cumulative = 0
+            for bound, bucket_count in zip((*self.buckets, float("inf")), counts):
+                cumulative += bucket_count
+                yield (
+                    f"{self.name}_bucket",
+                    _labels(self.label_names, labels, [f'le="{_number(bound)}"']),
+                    cumulative,
+                )
+            yield f"{self.name}_sum", _labels(self.label_names, labels), total
+            yield f"{self.name}_count", _labels(self.label_names, labels), count
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = {}
+
+    def register(self, metric):
+        self._metrics[metric.name] = metric
+        return metric
+
+    def render(self):
+        lines = []
+        for metric in self._metrics.values():
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for name, labels, value in metric.samples():
+                lines.append(f"{name}{labels} {_number(value)}")
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+http_request_seconds = registry.register(Histogram(
+    "cascadia_http_request_seconds", "HTTP request latency by route", ("method", "route", "status"),
+))
+pool_acquire_seconds = registry.register(Histogram(
+    "cascadia_db_pool_acquire_seconds", "Time spent waiting for a pooled connection", ("pool",),
+))
+db_query_seconds = registry.register(Histogram(
+    "cascadia_db_query_seconds", "Query execution time by statement", ("statement", "outcome"),
+))
+service_call_seconds = registry.register(Histogram(
+    "cascadia_service_call_seconds", "Service function latency", ("service", "function", "outcome"),
+))
+ingest_batch_rows = registry.register(Histogram(
+    "cascadia_ingest_batch_rows", "Rows per ingestion merge batch", ("table",), buckets=SIZE_BUCKETS,
+))
+ingest_rows_total = registry.register(Counter(
+    "cascadia_ingest_rows_total", "Rows merged by ingestion", ("table", "result"),
+))
+ingest_rows_per_second = registry.register(Gauge(
+    "cascadia_ingest_rows_per_second", "Throughput of the most recent ingestion batch", ("table",),
+))
+audit_events_total = registry.register(Counter(
+    "cascadia_audit_events_total", "Audit events written to audit_log, dropped or failed", ("result",),
+))
+
+class MetricsMiddleware:
+    """ASGI middleware recording latency per route template (not per raw path)."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        status = [500]
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+            await send(message)
+
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = scope.get("route")
+            http_request_seconds.observe(
+                scope["method"],
+                route.path if route is not None else "unmatched",
+                status[0],
+                value=time.perf_counter() - started,
+            )
+
+
+class _TimedAcquire:
+    def __init__(self, context, name):
+        self._context = context
+        self._name = name
+
+    async def __aenter__(self):
+        started = time.perf_counter()
+        connection = await self._context.__aenter__()
+        pool_acquire_seconds.observe(self._name, value=time.perf_counter() - started)
+        return connection
+
+    async def __aexit__(self, *exc_info):
+        return await self._context.__aexit__(*exc_info)
+
+    def __await__(self):
+        return self.__aenter__().__await__()
+
+
+class InstrumentedPool:
+    """Proxy for an asyncpg pool that times acquire(); everything else passes through."""
+
+    def __init__(self, pool, name="primary"):
+        self._pool = pool
+        self._name = name
+
+    def acquire(self, *args, **kwargs):
+        return _TimedAcquire(self._pool.acquire(*args, **kwargs), self._name)
+
+    def __getattr__(self, name):
+        return getattr(self._pool, name)
+
+
+_watched_pools = {}
+
+
+def _pool_sizes():
+    values = {}
+    for name, pool in _watched_pools.items():
+        size = pool.get_size()
+        values[(name, "in_use")] = size - pool.get_idle_size()
+        values[(name, "size")] = size
+        values[(name, "max")] = pool.get_max_size()
+    return values
+
+
+registry.register(Gauge(
+    "cascadia_db_pool_connections", "Connection pool usage", ("pool", "state"), callback=_pool_sizes,
+))
+replica_lag_seconds = registry.register(Gauge(
+    "cascadia_db_replica_lag_seconds", "Replay lag of the read replica at the last check",
+))
+
+
+def watch_pool(pool, name="primary"):
+    _watched_pools[name] = pool
+
+
+_whitespace = re.compile(r"\s+")
+_statement_keys = {}
+
+
+def _statement_key(query):
+    key = _statement_keys.get(query)
+    if key is None:
+        if len(_statement_keys) >= MAX_STATEMENTS:
+            return "other"
+        key = _statement_keys[query] = _whitespace.sub(" ", query).strip()[:STATEMENT_LENGTH]
+    return key
+
+
+def record_query(record):
+    """asyncpg query logger callback (Connection.add_query_logger)."""
+    db_query_seconds.observe(
+        _statement_key(record.query),
+        "error" if record.exception is not None else "ok",
+        value=record.elapsed,
+    )
+
+
+def instrument_module(module, hooks=None):
+    """Wrap every async function defined in `module` with a latency histogram.
+
+    `hooks` maps function names to callables invoked as hook(arguments,
+    result, elapsed) after a successful call, with the call's arguments bound
+    by parameter name; a failing hook is logged and does not fail the call. Calls inside the module go
+    through the module globals, so they are timed too.
+    """
+    service = module.__name__.rsplit(".", 1)[-1]
+    hooks = hooks or {}
+    for name, func in list(vars(module).items()):
+        if not inspect.iscoroutinefunction(func) or func.__module__ != module.__name__:
+            continue
+        if getattr(func, "__instrumented__", False):
+            continue
+        setattr(module, name, _timed(service, name, func, hooks.get(name)))
+
+
+def _timed(service, name, func, hook):
+    signature = inspect.signature(func)
+
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        started = time.perf_counter()
+        try:
+            result = await func(*args, **kwargs)
+        except BaseException:
+            service_call_seconds.observe(service, name, "error", value=time.perf_counter() - started)
+            raise
+        elapsed = time.perf_counter() - started
+        service_call_seconds.observe(service, name, "ok", value=elapsed)
+        if hook is not None:
+            try:
+                bound = signature.bind(*args, **kwargs)
+                bound.apply_defaults()
+                hook(bound.arguments, result, elapsed)
+            except Exception:
+                logger.exception("Metrics hook for %s.%s failed", service, name)
+        return result
+
+    wrapper.__instrumented__ = True
+    return wrapper
+
+
+def record_merge_batch(arguments, result, elapsed):
+    """Hook for ingestion_service._merge_batch."""
+    table, rows = arguments["table"], arguments["rows"]
+    ingest_batch_rows.observe(table, value=len(rows))
+    ingest_rows_total.inc(table, "inserted", amount=result["inserted"])
+    ingest_rows_total.inc(table, "updated", amount=result["updated"])
+    if elapsed > 0:
+        ingest_rows_per_second.set(table, value=round(len(rows) / elapsed, 1))
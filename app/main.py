@@ -1,16 +1,37 @@
 from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse
+from .core import metrics
 from .core.config import settings
 from .core.database import db
 from .api.v1.router import api_router
+from .services import audit, budget_cube, dashboard_service, ingest_jobs, ingestion_service, partitions, reorder_runs, reorder_service
 
 app = FastAPI(title="Cascadia Retail API")
+app.add_middleware(metrics.MetricsMiddleware)
+
+metrics.instrument_module(dashboard_service)
+metrics.instrument_module(ingestion_service, hooks={"_merge_batch": metrics.record_merge_batch})
+metrics.instrument_module(reorder_service)
 
 @app.on_event("startup")
 async def startup_event():
     await db.connect()
+    await audit.start()
+    await ingest_jobs.start()
+    await partitions.start()
+    await budget_cube.start()
 
 @app.on_event("shutdown")
 async def shutdown_event():
+    await budget_cube.shutdown()
+    await partitions.shutdown()
+    await ingest_jobs.shutdown()
+    await reorder_runs.shutdown()
+    await audit.shutdown()
     await db.disconnect()
 
+@app.get("/metrics", include_in_schema=False)
+async def prometheus_metrics():
+    return PlainTextResponse(metrics.registry.render(), media_type="text/plain; version=0.0.4")
+
 app.include_router(api_router, prefix="/api/v1")
@@ -1,8 +1,10 @@
-from datetime import date
-from typing import List
-from pydantic import BaseModel, validator, constr, condecimal, PositiveInt
+import json
+from datetime import date, datetime
+from typing import Any, Dict, List, Optional
+from pydantic import BaseModel, validator, conint, constr, condecimal, PositiveInt
 
-SkuStr = constr(regex=r"^[A-Za-z0-9_-]{1,20}$")
+SKU_PATTERN = r"^[A-Za-z0-9_-]{1,20}$"
+SkuStr = constr(regex=SKU_PATTERN)
 
 class SalesRecord(BaseModel):
     store_id: int
@@ -29,11 +31,12 @@ class InventoryRecord(BaseModel):
             raise ValueError("last_updated cannot be in the future")
         return v
 
-class SalesIngestion(BaseModel):
-    records: List[SalesRecord]
+class InventorySnapshotRecord(InventoryRecord):
+    # A snapshot states every position, so an explicit zero on hand is allowed
+    quantity: conint(ge=0)
 
-class InventoryIngestion(BaseModel):
-    records: List[InventoryRecord]
+class InventorySnapshot(BaseModel):
+    records: List[InventorySnapshotRecord]
 
 class SalesSummary(BaseModel):
     store_id: int
@@ -49,3 +52,57 @@ class ReorderRecommendation(BaseModel):
     sku: SkuStr
     store_id: int
     recommended_qty: int
+
+class ReorderRun(BaseModel):
+    run_id: int
+    status: str
+    params: Dict[str, Any]
+    store_count: int
+    stores_done: int
+    position_count: int
+    recommended_count: int
+    timings: Optional[Dict[str, float]]
+    error: Optional[str]
+    created_at: datetime
+    updated_at: Optional[datetime]
+    completed_at: Optional[datetime]
+
+    @validator("params", "timings", pre=True)
+    def decode_json(cls, v):
+        return json.loads(v) if isinstance(v, str) else v
+
+class SalesBudgetRollup(BaseModel):
+    store_name: str
+    store_id: Optional[int]
+    bucket_start: date
+    fiscal_year: int
+    days_count: int
+    total_actual_sales: float
+    total_budget_forecast: Optional[float]
+    total_variance_amount: float
+    avg_variance_percent: Optional[float]
+
+class BudgetVariance(BaseModel):
+    store_name: Optional[str]
+    store_id: Optional[int]
+    bucket_start: date
+    fiscal_year: Optional[int]
+    days_count: int
+    total_actual_sales: float
+    total_budget_forecast: Optional[float]
+    total_variance_amount: float
+    variance_percent: Optional[float]
+
+class SalesVelocity(BaseModel):
+    store_id: int
+    sku: str
+    as_of: date
+    units_7d: int
+    units_28d: int
+    units_91d: int
+    revenue_7d: float
+    revenue_28d: float
+    revenue_91d: float
+    weekly_units: float
+    dow_units_91d: List[int]
+    last_sale_date: Optional[date]
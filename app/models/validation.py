@@ -0,0 +1,155 @@
+"""Columnar validation of ingestion batches, matching the per-row Pydantic models."""
+from datetime import date
+from decimal import Decimal
+from typing import NamedTuple
+
+import numpy as np
+import pandas as pd
+from pydantic import ValidationError
+
+from .schemas import SKU_PATTERN, InventoryRecord, InventorySnapshotRecord, SalesRecord
+
+REJECT = "reject"
+QUARANTINE = "quarantine"
+ERROR_COLUMNS = ["row", "field", "reason"]
+
+_INT_PATTERN = r"-?[0-9]{1,18}"
+_DECIMAL_PATTERN = r"[0-9]{1,20}(\.[0-9]{1,20})?"
+_DATE_PATTERN = r"[0-9]{4}-[0-9]{2}-[0-9]{2}"
+_STRING_KINDS = ("string", "empty", "mixed", "mixed-integer")
+
+
+class BatchValidationError(ValueError):
+    def __init__(self, errors: pd.DataFrame):
+        first = errors.iloc[0]
+        super().__init__(
+            f"{len(errors)} invalid value(s); first at row {first['row']}: {first['field']}: {first['reason']}"
+        )
+        self.errors = errors
+
+
+class ValidationResult(NamedTuple):
+    valid: pd.DataFrame
+    errors: pd.DataFrame
+
+
+def _matches(column: pd.Series, pattern: str) -> np.ndarray:
+    # Object columns of decoded JSON may hold no strings at all (numbers and None)
+    if column.dtype != object or pd.api.types.infer_dtype(column, skipna=True) not in _STRING_KINDS:
+        return np.zeros(len(column), dtype=bool)
+    return column.str.fullmatch(pattern).eq(True).to_numpy(dtype=bool, copy=True)
+
+
+def _place(ok: np.ndarray, accepted) -> np.ndarray:
+    values = np.empty(len(ok), dtype=object)
+    values[ok] = np.fromiter(accepted, dtype=object, count=int(ok.sum()))
+    return values
+
+
+def _int_column(column: pd.Series, today: date):
+    if pd.api.types.is_integer_dtype(column.dtype):
+        return column.to_numpy(dtype=object), np.ones(len(column), dtype=bool)
+    ok = _matches(column, _INT_PATTERN)
+    return _place(ok, column.to_numpy()[ok].astype("int64").tolist()), ok
+
+
+def _positive_int_column(column: pd.Series, today: date):
+    values, ok = _int_column(column, today)
+    ok &= np.where(ok, values, 0).astype("int64") > 0
+    return values, ok
+
+
+def _non_negative_int_column(column: pd.Series, today: date):
+    values, ok = _int_column(column, today)
+    ok &= np.where(ok, values, 0).astype("int64") >= 0
+    return values, ok
+
+
+def _sku_column(column: pd.Series, today: date):
+    return column.to_numpy(dtype=object), _matches(column, SKU_PATTERN)
+
+
+def _positive_decimal_column(column: pd.Series, today: date):
+    if pd.api.types.is_integer_dtype(column.dtype) or pd.api.types.is_float_dtype(column.dtype):
+        # JSON numbers; Pydantic converts them through str() as well
+        numbers = column.to_numpy()
+        ok = np.isfinite(numbers) & (numbers > 0)
+        return _place(ok, (Decimal(str(v)) for v in numbers[ok].tolist())), ok
+    ok = _matches(column, _DECIMAL_PATTERN)
+    ok &= pd.to_numeric(column.where(ok, "0")).to_numpy() > 0
+    return _place(ok, (Decimal(v) for v in column.to_numpy()[ok])), ok
+
+
+def _past_date_column(column: pd.Series, today: date):
+    ok = _matches(column, _DATE_PATTERN)
+    parsed = pd.to_datetime(column.where(ok), format="%Y-%m-%d", errors="coerce")
+    ok &= parsed.notna().to_numpy()
+    ok &= (parsed <= pd.Timestamp(today)).to_numpy()
+    return _place(ok, parsed[ok].dt.date), ok
+
+
+RULES = {
+    SalesRecord: {
+        "store_id": _int_column,
+        "sku": _sku_column,
+        "quantity": _positive_int_column,
+        "price": _positive_decimal_column,
+        "sale_date": _past_date_column,
+    },
+    InventoryRecord: {
+        "store_id": _int_column,
+        "sku": _sku_column,
+        "quantity": _positive_int_column,
+        "last_updated": _past_date_column,
+    },
+    InventorySnapshotRecord: {
+        "store_id": _int_column,
+        "sku": _sku_column,
+        "quantity": _non_negative_int_column,
+        "last_updated": _past_date_column,
+    },
+}
+
+
+def validate_batch(frame: pd.DataFrame, model, mode: str = REJECT) -> ValidationResult:
+    """Validate a batch of raw values (one column per field) against `model`'s rules.
+
+    `frame`'s index is used as the row identifier in the error report. In
+    reject mode any error raises BatchValidationError; in quarantine mode the
+    bad rows are dropped from `valid` and listed in `errors`.
+    """
+    if mode not in (REJECT, QUARANTINE):
+        raise ValueError(f"unknown validation mode: {mode}")
+    rules = RULES[model]
+    today = date.today()
+    valid = pd.DataFrame(index=frame.index)
+    fast = np.ones(len(frame), dtype=bool)
+    for field, rule in rules.items():
+        if field not in frame:
+            fast[:] = False
+            valid[field] = None
+            continue
+        values, ok = rule(frame[field], today)
+        valid[field] = values
+        fast &= ok
+
+    rejected = []
+    errors = []
+    if not fast.all():
+        present = [f for f in rules if f in frame]
+        slow = frame.loc[~fast, present]
+        for row, raw in zip(slow.index, slow.to_dict("records")):
+            try:
+                record = model(**{k: v for k, v in raw.items() if v is not None})
+            except ValidationError as exc:
+                rejected.append(row)
+                for error in exc.errors():
+                    errors.append((row, ".".join(str(p) for p in error["loc"]), error["msg"]))
+                continue
+            for field in rules:
+                valid.at[row, field] = getattr(record, field)
+
+    error_frame = pd.DataFrame(errors, columns=ERROR_COLUMNS)
+    if errors and mode == REJECT:
+        raise BatchValidationError(error_frame)
+    return ValidationResult(valid.drop(index=rejected), error_frame)
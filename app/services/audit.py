@@ -1,4 +1,145 @@
+"""Audit events, written to audit_log by a background batch writer.
+
+Callers enqueue events with record() or the run() context manager and
+never wait on the database, so auditing adds nothing to the time an
+ingestion transaction is open. The writer flushes a batch once
+`audit_batch_size` events are waiting or `audit_flush_seconds` after the
+first event of the batch, and drains the queue on shutdown. When the
+bounded queue is full, new events are dropped and counted rather than
+blocking the caller; every event also goes to the application log, so a
+dropped or unwritten event is still on record there.
+"""
+import asyncio
+import json
+import time
+from contextlib import contextmanager
+from datetime import date, datetime, timezone
+
+from ..core import metrics
+from ..core.config import settings
+from ..core.database import db
 from ..core.logging import logger
 
-async def log_change(action: str, details: dict):
-    logger.info("AUDIT %s - %s", action, details)
+SUCCESS = "success"
+FAILURE = "failure"
+
+COLUMNS = (
+    "action", "file_name", "ingestion_date", "record_count", "status", "error_log",
+    "details", "timings", "started_at", "completed_at",
+)
+
+_queue = asyncio.Queue(maxsize=settings.audit_queue_size)
+_writer_task = None
+_dropped = 0
+
+
+def record(action, record_count=None, status=SUCCESS, error=None, file_name=None, details=None,
+           timings=None, started_at=None):
+    """Queue one audit event without waiting; drops it if the queue is full."""
+    global _dropped
+    completed_at = datetime.now(timezone.utc)
+    logger.info("AUDIT %s %s - %s", action, status, details or {})
+    event = (
+        action, file_name, date.today(), record_count, status, error,
+        json.dumps(details or {}, default=str), json.dumps(timings or {}),
+        started_at or completed_at, completed_at,
+    )
+    try:
+        _queue.put_nowait(event)
+    except asyncio.QueueFull:
+        _dropped += 1
+        metrics.audit_events_total.inc("dropped")
+        if _dropped == 1 or _dropped % 1000 == 0:
+            logger.warning("Audit queue full, %s events dropped so far", _dropped)
+
+
+class Run:
+    """One audited operation: its details, record count and per-stage timings."""
+
+    def __init__(self, action, record_count=None, file_name=None):
+        self.action = action
+        self.record_count = record_count
+        self.file_name = file_name
+        self.details = {}
+        self.timings = {}
+        self.started_at = datetime.now(timezone.utc)
+        self._started = self._last = time.perf_counter()
+
+    def lap(self, stage):
+        """Add the time since the previous lap (or the start) to `stage`."""
+        now = time.perf_counter()
+        self.timings[stage] = round(self.timings.get(stage, 0.0) + now - self._last, 6)
+        self._last = now
+
+    def _record(self, status, error=None):
+        self.timings["total"] = round(time.perf_counter() - self._started, 6)
+        record(
+            self.action, self.record_count, status, error, self.file_name, self.details,
+            self.timings, self.started_at,
+        )
+
+
+@contextmanager
+def run(action, record_count=None, file_name=None):
+    """Audit the enclosed block as success, or as failure if it raises.
+
+    Open it outside any transaction: the event is queued when the block
+    exits.
+    """
+    audited = Run(action, record_count, file_name)
+    try:
+        yield audited
+    except Exception as exc:
+        audited._record(FAILURE, str(exc))
+        raise
+    audited._record(SUCCESS)
+
+
+async def _flush(events):
+    try:
+        async with db.pool.acquire() as conn:
+            await conn.copy_records_to_table("audit_log", records=events, columns=COLUMNS)
+        metrics.audit_events_total.inc("written", amount=len(events))
+    except Exception:
+        metrics.audit_events_total.inc("failed", amount=len(events))
+        logger.exception("Failed to write %s audit events", len(events))
+
+
+async def _writer():
+    loop = asyncio.get_running_loop()
+    stopping = False
+    while not stopping:
+        event = await _queue.get()
+        if event is None:
+            break
+        batch = [event]
+        deadline = loop.time() + settings.audit_flush_seconds
+        while len(batch) < settings.audit_batch_size:
+            try:
+                event = await asyncio.wait_for(_queue.get(), deadline - loop.time())
+            except asyncio.TimeoutError:
+                break
+            if event is None:
+                stopping = True
+                break
+            batch.append(event)
+        await _flush(batch)
+
+
+async def start():
+    global _writer_task
+    _writer_task = asyncio.create_task(_writer())
+
+
+async def shutdown():
+    """Flush what is queued; call before the database pool closes."""
+    global _writer_task
+    if _writer_task is None:
+        return
+    await _queue.put(None)
+    try:
+        await asyncio.wait_for(_writer_task, settings.audit_shutdown_timeout)
+    except asyncio.TimeoutError:
+        logger.warning("Audit writer did not flush within %ss, %s events lost", settings.audit_shutdown_timeout,
+                       _queue.qsize())
+    _writer_task = None
@@ -0,0 +1,249 @@
+"""In-memory store x day cube of actual and budget sales, reloaded on rollup NOTIFY."""
+import asyncio
+import time
+from datetime import date, timedelta
+
+import asyncpg
+import numpy as np
+
+from ..core.cache import cache
+from ..core.config import settings
+from ..core.database import db
+from ..core.logging import logger
+
+ROLLUP_CHANNEL = "sales_budget_rollup"
+GRAINS = ("day", "week", "month", "fiscal_year")
+
+CUBE_QUERY = """
+    SELECT store_name, MAX(store_id) AS store_id, bucket_start,
+           MAX(fiscal_year) AS fiscal_year,
+           SUM(days_count)::int AS days_count,
+           SUM(total_actual_sales)::float8 AS actual,
+           SUM(total_budget_forecast)::float8 AS budget,
+           COUNT(total_budget_forecast)::int AS budget_days
+    FROM sales_budget_rollup
+    WHERE grain = 'day'
+    GROUP BY store_name, bucket_start
+"""
+
+_cube = None
+_reload = asyncio.Event()
+_tasks = []
+
+
+class CubeNotLoaded(Exception):
+    pass
+
+
+def _fill_gaps(fiscal_year):
+    """Give days without rollup rows (0) the fiscal year of the day before, or after at the start.
+
+    Otherwise a gap would split its fiscal year into two runs of keys.
+    """
+    known = fiscal_year > 0
+    if not known.any():
+        return fiscal_year
+    last_known = np.maximum.accumulate(np.where(known, np.arange(len(fiscal_year)), 0))
+    filled = fiscal_year[last_known]
+    first = int(np.argmax(known))
+    filled[:first] = fiscal_year[first]
+    return filled
+
+
+def _nullable(values, present):
+    """Python values, None where `present` is False."""
+    values = values.astype(object)
+    values[~present] = None
+    return values.tolist()
+
+
+class BudgetCube:
+    def __init__(self, rows, loaded_at=None):
+        self.loaded_at = loaded_at
+        self.store_names = sorted({row["store_name"] for row in rows})
+        store_index = {name: i for i, name in enumerate(self.store_names)}
+        self.store_ids = np.full(len(self.store_names), -1, dtype=np.int64)
+
+        if rows:
+            self.first = min(row["bucket_start"] for row in rows)
+            days = (max(row["bucket_start"] for row in rows) - self.first).days + 1
+        else:
+            self.first = date.today()
+            days = 0
+        self.days = days
+        shape = (len(self.store_names), days)
+        self.actual = np.zeros(shape)
+        self.budget = np.zeros(shape)
+        self.actual_days = np.zeros(shape, dtype=np.int32)
+        self.budget_days = np.zeros(shape, dtype=np.int32)
+        self.fiscal_year = np.zeros(days, dtype=np.int32)
+
+        if rows:
+            stores = np.array([store_index[row["store_name"]] for row in rows])
+            offsets = np.array([(row["bucket_start"] - self.first).days for row in rows])
+            self.actual[stores, offsets] = [row["actual"] for row in rows]
+            self.budget[stores, offsets] = [row["budget"] or 0.0 for row in rows]
+            self.actual_days[stores, offsets] = [row["days_count"] for row in rows]
+            self.budget_days[stores, offsets] = [row["budget_days"] for row in rows]
+            np.maximum.at(self.fiscal_year, offsets, [row["fiscal_year"] for row in rows])
+            ids = np.array([-1 if row["store_id"] is None else row["store_id"] for row in rows])
+            np.maximum.at(self.store_ids, stores, ids)
+        self.fiscal_year = _fill_gaps(self.fiscal_year)
+
+        # Bucket key of every day for each grain; a bucket is a run of equal keys
+        ordinals = self.first.toordinal() + np.arange(days)
+        months = np.array(
+            [(d.year * 12 + d.month - 1) for d in (self.first + timedelta(days=int(i)) for i in range(days))],
+            dtype=np.int64,
+        )
+        self._keys = {
+            "day": ordinals,
+            # date.fromordinal(1) is a Monday, so weeks start on Mondays like date_trunc('week')
+            "week": (ordinals - 1) // 7,
+            "month": months,
+            "fiscal_year": self.fiscal_year.astype(np.int64),
+        }
+
+    @property
+    def nbytes(self):
+        return sum(a.nbytes for a in (self.actual, self.budget, self.actual_days, self.budget_days))
+
+    def _bucket_start(self, grain, key, first_day):
+        if grain == "week":
+            return date.fromordinal(int(key) * 7 + 1)
+        if grain == "month":
+            return date(int(key) // 12, int(key) % 12 + 1, 1)
+        return self.first + timedelta(days=int(first_day))
+
+    def _store_rows(self, store_ids=None, store_names=None):
+        selected = np.ones(len(self.store_names), dtype=bool)
+        if store_ids:
+            selected &= np.isin(self.store_ids, store_ids)
+        if store_names:
+            selected &= np.isin(np.array(self.store_names, dtype=object), store_names)
+        return np.flatnonzero(selected)
+
+    def variance(self, grain, store_ids=None, store_names=None, start_date=None, end_date=None, by_store=True):
+        """Actual, budget and variance per bucket (and per store unless `by_store` is False).
+
+        Matches sales_budget_rollup: days_count counts actual store-days and
+        the budget total is None for buckets without any budget day.
+        """
+        if grain not in GRAINS:
+            raise ValueError(f"unknown grain {grain!r}")
+        stores = self._store_rows(store_ids, store_names)
+        lo = 0 if start_date is None else max((start_date - self.first).days, 0)
+        hi = self.days if end_date is None else min((end_date - self.first).days + 1, self.days)
+        if hi <= lo or not len(stores):
+            return []
+
+        arrays = [a[stores, lo:hi] for a in (self.actual, self.budget, self.actual_days, self.budget_days)]
+        if not by_store:
+            arrays = [a.sum(axis=0, keepdims=True) for a in arrays]
+        keys = self._keys[grain][lo:hi]
+        starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+        actual, budget, actual_days, budget_days = (np.add.reduceat(a, starts, axis=1) for a in arrays)
+        fiscal_years = np.maximum.reduceat(self.fiscal_year[lo:hi], starts)
+        variance = actual - budget
+        with np.errstate(divide="ignore", invalid="ignore"):
+            percent = np.where(budget > 0, variance / budget * 100, np.nan)
+
+        bucket_starts = np.array([self._bucket_start(grain, keys[s], lo + s) for s in starts], dtype=object)
+        # Newest bucket first, stores by name within a bucket (store_names is sorted), like the rollup endpoint
+        rows, buckets = np.nonzero(actual_days)
+        order = np.lexsort((rows, -buckets))
+        rows, buckets = rows[order], buckets[order]
+        cell = (rows, buckets)
+        has_budget = budget_days[cell] > 0
+        if by_store:
+            names = np.array(self.store_names, dtype=object)[stores[rows]].tolist()
+            ids = self.store_ids[stores[rows]]
+            store_ids = _nullable(ids, ids >= 0)
+        else:
+            names = store_ids = [None] * len(rows)
+        columns = {
+            "store_name": names,
+            "store_id": store_ids,
+            "bucket_start": bucket_starts[buckets].tolist(),
+            "fiscal_year": _nullable(fiscal_years[buckets], fiscal_years[buckets] != 0),
+            "days_count": actual_days[cell].tolist(),
+            "total_actual_sales": actual[cell].tolist(),
+            "total_budget_forecast": _nullable(budget[cell], has_budget),
+            "total_variance_amount": variance[cell].tolist(),
+            "variance_percent": _nullable(percent[cell], has_budget & (budget[cell] > 0)),
+        }
+        return [dict(zip(columns, values)) for values in zip(*columns.values())]
+
+
+def get_cube():
+    if _cube is None:
+        raise CubeNotLoaded("budget variance cube is not loaded yet")
+    return _cube
+
+
+async def load():
+    """Read the day-grain rollup and swap in a new cube; returns it."""
+    global _cube
+    started = time.perf_counter()
+    async with db.pool.acquire() as conn:
+        rows = await conn.fetch(CUBE_QUERY)
+    cube = BudgetCube([dict(row) for row in rows], loaded_at=time.time())
+    _cube = cube
+    logger.info(
+        "Loaded budget cube: %s stores x %s days (%s bytes) in %.3fs",
+        len(cube.store_names), cube.days, cube.nbytes, time.perf_counter() - started,
+    )
+    return cube
+
+
+def _on_notify(connection, pid, channel, payload):
+    _reload.set()
+
+
+async def _reloader():
+    while True:
+        await _reload.wait()
+        _reload.clear()
+        cache.invalidate("sales_budget_rollup")
+        try:
+            await load()
+        except Exception:
+            logger.exception("Budget cube reload failed")
+
+
+async def _listen():
+    reconnect = False
+    while True:
+        conn = None
+        try:
+            conn = await asyncpg.connect(settings.database_url)
+            await conn.add_listener(ROLLUP_CHANNEL, _on_notify)
+            if reconnect or _cube is None:
+                _reload.set()
+            reconnect = True
+            # A query now and then notices a dropped connection
+            while True:
+                await asyncio.sleep(settings.budget_cube_keepalive_seconds)
+                await conn.execute("SELECT 1")
+        except (OSError, asyncpg.PostgresError, asyncpg.InterfaceError) as exc:
+            logger.warning("Budget cube listener disconnected: %s", exc)
+        finally:
+            if conn is not None and not conn.is_closed():
+                await conn.close()
+        await asyncio.sleep(settings.budget_cube_keepalive_seconds)
+
+
+async def start():
+    try:
+        await load()
+    except (OSError, asyncpg.PostgresError) as exc:
+        logger.warning("Budget cube not loaded at startup: %s", exc)
+    _tasks.append(asyncio.create_task(_reloader()))
+    _tasks.append(asyncio.create_task(_listen()))
+
+
+async def shutdown():
+    for task in _tasks:
+        task.cancel()
+    await asyncio.gather(*_tasks, return_exceptions=True)
+    _tasks.clear()
@@ -0,0 +1,45 @@
+"""ingest_checkpoint rows for resumable, chunked ingestion; only unfinished loads keep a row."""
+import json
+
+
+async def load(conn, target, source):
+    """Return (committed_rows, counts, status) for a source, or None if it was never started."""
+    row = await conn.fetchrow(
+        "SELECT committed_rows, counts, status FROM ingest_checkpoint WHERE target = $1 AND source_fingerprint = $2",
+        target, source,
+    )
+    if row is None:
+        return None
+    return row["committed_rows"], json.loads(row["counts"]), row["status"]
+
+
+async def save(conn, target, source, committed_rows, counts):
+    """Record progress; call it inside the chunk's transaction so rows and offset commit together."""
+    await conn.execute(
+        """
+        INSERT INTO ingest_checkpoint (target, source_fingerprint, committed_rows, counts)
+        VALUES ($1, $2, $3, $4::jsonb)
+        ON CONFLICT (target, source_fingerprint) DO UPDATE SET
+            committed_rows = EXCLUDED.committed_rows, counts = EXCLUDED.counts,
+            status = 'running', error = NULL, updated_at = NOW()
+        """,
+        target, source, committed_rows, json.dumps(counts),
+    )
+
+
+async def fail(conn, target, source, error):
+    await conn.execute(
+        """
+        INSERT INTO ingest_checkpoint (target, source_fingerprint, status, error)
+        VALUES ($1, $2, 'failed', $3)
+        ON CONFLICT (target, source_fingerprint) DO UPDATE SET
+            status = EXCLUDED.status, error = EXCLUDED.error, updated_at = NOW()
+        """,
+        target, source, error,
+    )
+
+
+async def clear(conn, target, source):
+    await conn.execute(
+        "DELETE FROM ingest_checkpoint WHERE target = $1 AND source_fingerprint = $2", target, source,
+    )
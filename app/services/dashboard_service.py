@@ -1,11 +1,142 @@
+from ..core.cache import cached
 from ..core.database import db
 
-async def get_sales_summary():
-    async with db.pool.acquire() as conn:
-        rows = await conn.fetch("SELECT store_id, SUM(price*quantity) as total_sales, SUM(quantity) as total_units FROM sales GROUP BY store_id")
+@cached("sales")
+async def get_sales_summary(start_date=None, end_date=None):
+    # Only the bounds that were given go into the query, as plain comparisons
+    # on sale_date, so the planner prunes the monthly partitions outside them
+    conditions = []
+    args = []
+    if start_date is not None:
+        args.append(start_date)
+        conditions.append(f"sale_date >= ${len(args)}")
+    if end_date is not None:
+        args.append(end_date)
+        conditions.append(f"sale_date <= ${len(args)}")
+    where = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+    async with db.acquire_read() as conn:
+        rows = await conn.fetch_prepared(
+            f"SELECT store_id, SUM(price*quantity) as total_sales, SUM(quantity) as total_units FROM sales{where} GROUP BY store_id",
+            *args,
+        )
         return [dict(row) for row in rows]
 
-async def get_inventory_status():
-    async with db.pool.acquire() as conn:
-        rows = await conn.fetch("SELECT store_id, sku, quantity FROM inventory")
+INVENTORY_STREAM_FIRST_FETCH = 100
+INVENTORY_STREAM_FETCH = 2000
+
+def _inventory_status_query(store_id=None, sku_prefix=None, min_quantity=None, max_quantity=None,
+                            after=None, limit=None, as_of=None):
+    """Build the inventory-status query with only the filters that were given.
+
+    Rows come back in (store_id, sku) order so the (store_id, sku) index can
+    serve both the filters and the keyset condition; `after` is the last
+    (store_id, sku) of the previous page. With `as_of` the positions are
+    reconstructed from inventory_history as they stood on that date.
+    """
+    conditions = []
+    args = []
+
+    def arg(value):
+        args.append(value)
+        return f"${len(args)}"
+
+    source = "inventory" if as_of is None else f"inventory_as_of({arg(as_of)})"
+
+    if store_id is not None:
+        conditions.append(f"store_id = {arg(store_id)}")
+    if sku_prefix:
+        conditions.append(f"left(sku, {len(sku_prefix)}) = {arg(sku_prefix)}")
+    if min_quantity is not None:
+        conditions.append(f"quantity >= {arg(min_quantity)}")
+    if max_quantity is not None:
+        conditions.append(f"quantity <= {arg(max_quantity)}")
+    if after is not None:
+        after_store_id, after_sku = after
+        conditions.append(f"(store_id, sku) > ({arg(after_store_id)}, {arg(after_sku)})")
+
+    query = f"SELECT store_id, sku, quantity FROM {source}"
+    if conditions:
+        query += " WHERE " + " AND ".join(conditions)
+    query += " ORDER BY store_id, sku"
+    if limit is not None:
+        query += f" LIMIT {arg(limit)}"
+    return query, args
+
+@cached("inventory", store_arg="store_id")
+async def get_inventory_status(store_id=None, sku_prefix=None, min_quantity=None, max_quantity=None,
+                               after=None, limit=None, as_of=None):
+    query, args = _inventory_status_query(store_id, sku_prefix, min_quantity, max_quantity, after, limit, as_of)
+    async with db.acquire_read() as conn:
+        rows = await conn.fetch(query, *args)
+        return [dict(row) for row in rows]
+
+async def stream_inventory_status(store_id=None, sku_prefix=None, min_quantity=None, max_quantity=None,
+                                  after=None, limit=None, as_of=None):
+    """Yield lists of inventory rows as a server-side cursor fetches them.
+
+    The first fetch is small so the first row goes out quickly. The pooled
+    connection is held until the generator is exhausted or closed.
+    """
+    query, args = _inventory_status_query(store_id, sku_prefix, min_quantity, max_quantity, after, limit, as_of)
+    async with db.acquire_read() as conn:
+        async with conn.transaction():
+            cursor = await conn.cursor(query, *args)
+            size = INVENTORY_STREAM_FIRST_FETCH
+            while True:
+                rows = await cursor.fetch(size)
+                if not rows:
+                    break
+                yield [dict(row) for row in rows]
+                size = INVENTORY_STREAM_FETCH
+
+@cached("sales", store_arg="store_id")
+async def get_sales_velocity(store_id=None, sku_prefix=None, after=None, limit=1000):
+    conditions = []
+    args = []
+    if store_id is not None:
+        args.append(store_id)
+        conditions.append(f"v.store_id = ${len(args)}")
+    if sku_prefix:
+        args.append(sku_prefix)
+        conditions.append(f"left(v.sku, {len(sku_prefix)}) = ${len(args)}")
+    if after is not None:
+        args.extend(after)
+        conditions.append(f"(v.store_id, v.sku) > (${len(args) - 1}, ${len(args)})")
+    args.append(limit)
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    async with db.acquire_read() as conn:
+        rows = await conn.fetch(
+            f"""
+            SELECT v.store_id, v.sku, st.as_of,
+                   v.units_7d, v.units_28d, v.units_91d,
+                   v.revenue_7d, v.revenue_28d, v.revenue_91d,
+                   v.units_28d / 4.0 AS weekly_units,
+                   v.dow_units_91d, v.last_sale_date
+            FROM sales_velocity v
+            CROSS JOIN sales_velocity_state st
+            {where}
+            ORDER BY v.store_id, v.sku
+            LIMIT ${len(args)}
+            """,
+            *args,
+        )
+        return [dict(row) for row in rows]
+
+@cached("sales_budget_rollup", store_arg="store_id")
+async def get_sales_budget_rollup(grain, store_id=None, start_date=None, end_date=None):
+    async with db.acquire_read() as conn:
+        rows = await conn.fetch_prepared(
+            """
+            SELECT store_name, store_id, bucket_start, fiscal_year, days_count,
+                   total_actual_sales, total_budget_forecast, total_variance_amount,
+                   variance_percent_sum / NULLIF(variance_percent_count, 0) AS avg_variance_percent
+            FROM sales_budget_rollup
+            WHERE grain = $1
+              AND ($2::int IS NULL OR store_id = $2)
+              AND ($3::date IS NULL OR bucket_start >= $3)
+              AND ($4::date IS NULL OR bucket_start <= $4)
+            ORDER BY bucket_start DESC, store_name
+            """,
+            grain, store_id, start_date, end_date,
+        )
         return [dict(row) for row in rows]
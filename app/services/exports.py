@@ -0,0 +1,185 @@
+"""Streaming Parquet and Arrow IPC exports of sales and budget history."""
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from ..core.config import settings
+from ..core.database import db
+
+PARQUET = "parquet"
+ARROW = "arrow"
+MEDIA_TYPES = {
+    PARQUET: "application/vnd.apache.parquet",
+    ARROW: "application/vnd.apache.arrow.stream",
+}
+FILE_EXTENSIONS = {PARQUET: "parquet", ARROW: "arrows"}
+
+TIMESTAMP = pa.timestamp("us", tz="UTC")
+
+# dataset -> (table, date column, store_name column or None, [(select expression, name, type)])
+DATASETS = {
+    "historical_daily_sales": (
+        "historical_daily_sales", "sale_date", "store_name",
+        [
+            ("id", "id", pa.int64()),
+            ("store_name", "store_name", pa.string()),
+            ("sale_date", "sale_date", pa.date32()),
+            ("day_of_week", "day_of_week", pa.string()),
+            ("day_number", "day_number", pa.int32()),
+            ("fiscal_year", "fiscal_year", pa.int32()),
+            ("sales_amount", "sales_amount", pa.decimal128(12, 2)),
+            ("data_type", "data_type", pa.string()),
+            ("created_at", "created_at", TIMESTAMP),
+            ("updated_at", "updated_at", TIMESTAMP),
+            ("metadata::text", "metadata", pa.string()),
+        ],
+    ),
+    "budget_forecasts": (
+        "budget_forecasts", "forecast_date", "store_name",
+        [
+            ("id", "id", pa.int64()),
+            ("store_name", "store_name", pa.string()),
+            ("forecast_date", "forecast_date", pa.date32()),
+            ("day_of_week", "day_of_week", pa.string()),
+            ("day_number", "day_number", pa.int32()),
+            ("fiscal_year", "fiscal_year", pa.int32()),
+            ("forecast_amount", "forecast_amount", pa.decimal128(12, 2)),
+            ("forecast_type", "forecast_type", pa.string()),
+            ("variance_adjustment", "variance_adjustment", pa.decimal128(5, 4)),
+            ("created_at", "created_at", TIMESTAMP),
+            ("updated_at", "updated_at", TIMESTAMP),
+            ("metadata::text", "metadata", pa.string()),
+        ],
+    ),
+    "salessummary": (
+        "salessummary", "date", None,
+        [
+            ("store_id", "store_id", pa.int32()),
+            ("sku", "sku", pa.string()),
+            ("date", "date", pa.date32()),
+            ("units_sold::bigint", "units_sold", pa.int64()),
+            ("total_sales::numeric(14,2)", "total_sales", pa.decimal128(14, 2)),
+        ],
+    ),
+}
+
+
+class ExportError(ValueError):
+    pass
+
+
+def export_schema(dataset):
+    _, _, _, columns = DATASETS[dataset]
+    return pa.schema([pa.field(name, type_) for _, name, type_ in columns])
+
+
+def _export_query(dataset, start_date=None, end_date=None, store_id=None, store_name=None):
+    """Build the export query with only the filters that were given.
+
+    Date bounds are plain comparisons on the table's date column, so
+    partitioned tables only scan the months in range. store_id matches the
+    budget tables through store_name_mapping.
+    """
+    if dataset not in DATASETS:
+        raise ExportError(f"unknown export {dataset!r}")
+    table, date_column, name_column, columns = DATASETS[dataset]
+    conditions = []
+    args = []
+
+    def arg(value):
+        args.append(value)
+        return f"${len(args)}"
+
+    if start_date is not None:
+        conditions.append(f"{date_column} >= {arg(start_date)}")
+    if end_date is not None:
+        conditions.append(f"{date_column} <= {arg(end_date)}")
+    if store_id is not None:
+        if name_column is None:
+            conditions.append(f"store_id = {arg(store_id)}")
+        else:
+            conditions.append(
+                f"{name_column} IN (SELECT excel_store_name FROM store_name_mapping WHERE store_id = {arg(store_id)})"
+            )
+    if store_name is not None:
+        if name_column is None:
+            raise ExportError(f"{dataset} is keyed by store_id, not store_name")
+        conditions.append(f"{name_column} = {arg(store_name)}")
+
+    query = f"SELECT {', '.join(expression for expression, _, _ in columns)} FROM {table}"
+    if conditions:
+        query += " WHERE " + " AND ".join(conditions)
+    query += f" ORDER BY {date_column}"
+    return query, args
+
+
+def _record_batch(rows, schema):
+    return pa.RecordBatch.from_arrays(
+        [pa.array([row[i] for row in rows], type=field.type) for i, field in enumerate(schema)],
+        schema=schema,
+    )
+
+
+class _ChunkSink:
+    """Write-only file object that hands back what was written since the last drain."""
+
+    def __init__(self):
+        self._chunks = []
+        self.closed = False
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self):
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def _open_writer(fmt, sink, schema):
+    if fmt == PARQUET:
+        return pq.ParquetWriter(pa.PythonFile(sink, mode="w"), schema, compression="zstd")
+    return pa.ipc.new_stream(pa.PythonFile(sink, mode="w"), schema)
+
+
+def stream_export(dataset, fmt=PARQUET, start_date=None, end_date=None, store_id=None, store_name=None,
+                  batch_rows=None):
+    """Return an async iterator over the encoded export, one byte chunk per fetched batch.
+
+    Raises ExportError for an unknown dataset or format, or a filter the
+    dataset does not have, before anything is read.
+    """
+    query, args = _export_query(dataset, start_date, end_date, store_id, store_name)
+    if fmt not in MEDIA_TYPES:
+        raise ExportError(f"unknown export format {fmt!r}")
+    return _stream(query, args, export_schema(dataset), fmt, batch_rows or settings.export_batch_rows)
+
+
+async def _stream(query, args, schema, fmt, batch_rows):
+    # The read connection is held until the generator is exhausted or closed
+    sink = _ChunkSink()
+    writer = _open_writer(fmt, sink, schema)
+    try:
+        async with db.acquire_read() as conn:
+            async with conn.transaction(isolation="repeatable_read", readonly=True):
+                cursor = await conn.cursor(query, *args)
+                while True:
+                    rows = await cursor.fetch(batch_rows)
+                    if not rows:
+                        break
+                    writer.write_batch(_record_batch(rows, schema))
+                    chunk = sink.drain()
+                    if chunk:
+                        yield chunk
+        writer.close()
+        writer = None
+        yield sink.drain()
+    finally:
+        if writer is not None:
+            writer.close()
@@ -0,0 +1,232 @@
+"""Background ingestion jobs spooled to disk and drained by a fixed set of workers."""
+import asyncio
+import json
+import os
+import time
+import uuid
+from datetime import datetime, timezone
+
+from ..core.config import settings
+from ..core.logging import logger
+from ..models.validation import BatchValidationError
+from ..utils.csv_stream import CsvFormatError
+from . import ingestion_service
+
+QUEUED = "queued"
+RUNNING = "running"
+COMPLETED = "completed"
+FAILED = "failed"
+
+READ_CHUNK_SIZE = 1 << 20
+MAX_JOB_ERRORS = 100
+
+_queue = asyncio.Queue()
+_jobs = {}
+_workers = []
+_waiting = 0
+
+# Handlers are looked up on ingestion_service at call time so wrappers
+# installed after import (metrics) apply
+JOB_HANDLERS = {
+    ("sales", "csv"): "insert_sales_csv",
+    ("inventory", "csv"): "insert_inventory_csv",
+}
+JSON_HANDLERS = {
+    "sales": "insert_sales",
+    "inventory": "insert_inventory",
+}
+
+
+class QueueFull(Exception):
+    pass
+
+
+def _now():
+    return datetime.now(timezone.utc).isoformat()
+
+
+def _path(job_id, suffix):
+    return os.path.join(settings.ingest_spool_dir, f"{job_id}.{suffix}")
+
+
+def _save(job):
+    path = _path(job["job_id"], "json")
+    with open(path + ".tmp", "w") as f:
+        json.dump(job, f, default=str)
+    os.replace(path + ".tmp", path)
+
+
+async def submit(kind, fmt, mode, chunks, file_name=None):
+    """Spool an upload and queue it; returns the job's metadata.
+
+    The job is audited under `file_name`, or under its job id when the
+    upload is unnamed.
+    """
+    global _waiting
+    if _waiting >= settings.ingest_queue_size:
+        raise QueueFull(f"{_waiting} ingestion jobs are already waiting")
+    _waiting += 1
+    job_id = uuid.uuid4().hex
+    body = _path(job_id, "body")
+    try:
+        size = 0
+        f = await asyncio.to_thread(open, body, "wb")
+        try:
+            async for chunk in chunks:
+                await asyncio.to_thread(f.write, chunk)
+                size += len(chunk)
+        finally:
+            await asyncio.to_thread(f.close)
+    except BaseException:
+        _waiting -= 1
+        if os.path.exists(body):
+            os.remove(body)
+        raise
+
+    job = {
+        "job_id": job_id, "kind": kind, "format": fmt, "mode": mode, "status": QUEUED,
+        "bytes": size, "created_at": _now(), "started_at": None, "finished_at": None,
+        "rows_processed": 0, "inserted": 0, "updated": 0, "rejected": 0,
+        "rows_per_second": None, "errors": [], "error": None,
+        "source_fingerprint": f"job:{job_id}", "file_name": file_name or f"job:{job_id}",
+    }
+    await asyncio.to_thread(_save, job)
+    _jobs[job_id] = job
+    _queue.put_nowait(job_id)
+    return job
+
+
+def _load(job_id):
+    if not os.path.exists(_path(job_id, "json")):
+        return None
+    with open(_path(job_id, "json")) as f:
+        return json.load(f)
+
+
+async def get_job(job_id):
+    job = _jobs.get(job_id)
+    if job is None:
+        job = await asyncio.to_thread(_load, job_id)
+    return job
+
+
+def _read_file(path):
+    with open(path, "rb") as f:
+        return f.read()
+
+
+async def _read_body(job_id):
+    f = await asyncio.to_thread(open, _path(job_id, "body"), "rb")
+    try:
+        while True:
+            chunk = await asyncio.to_thread(f.read, READ_CHUNK_SIZE)
+            if not chunk:
+                return
+            yield chunk
+    finally:
+        await asyncio.to_thread(f.close)
+
+
+async def _record_progress(job, started, totals):
+    job["rows_processed"] = totals["ingested"] + totals["rejected"]
+    job["inserted"] = totals["inserted"]
+    job["updated"] = totals["updated"]
+    job["rejected"] = totals["rejected"]
+    elapsed = time.perf_counter() - started
+    job["rows_per_second"] = round(job["rows_processed"] / elapsed, 1) if elapsed > 0 else None
+    await asyncio.to_thread(_save, job)
+
+
+async def _process(job):
+    started = time.perf_counter()
+    job.update(status=RUNNING, started_at=_now())
+    await asyncio.to_thread(_save, job)
+    try:
+        if job["format"] == "csv":
+            handler = getattr(ingestion_service, JOB_HANDLERS[(job["kind"], "csv")])
+            result = await handler(
+                _read_body(job["job_id"]), job["mode"],
+                progress=lambda totals: _record_progress(job, started, totals),
+                source=job.get("source_fingerprint"), file_name=job.get("file_name"),
+            )
+        else:
+            handler = getattr(ingestion_service, JSON_HANDLERS[job["kind"]])
+            body = await asyncio.to_thread(_read_file, _path(job["job_id"], "body"))
+            records = ingestion_service.decode_records(body)
+            result = await handler(
+                records, job["mode"], source=job.get("source_fingerprint"), file_name=job.get("file_name"),
+            )
+        job["errors"] = result["errors"][:MAX_JOB_ERRORS]
+        await _record_progress(job, started, result)
+        job["status"] = COMPLETED
+    except BatchValidationError as exc:
+        job.update(status=FAILED, error=str(exc), errors=exc.errors.head(MAX_JOB_ERRORS).to_dict("records"))
+    except (ingestion_service.InvalidPayload, CsvFormatError) as exc:
+        job.update(status=FAILED, error=str(exc))
+    except Exception as exc:
+        logger.exception("Ingestion job %s failed", job["job_id"])
+        job.update(status=FAILED, error=str(exc))
+    job["finished_at"] = _now()
+    await asyncio.to_thread(_finish, job)
+    # Finished jobs are served from their metadata file
+    _jobs.pop(job["job_id"], None)
+    logger.info("Ingestion job %s %s: %s rows", job["job_id"], job["status"], job["rows_processed"])
+
+
+def _finish(job):
+    _save(job)
+    if os.path.exists(_path(job["job_id"], "body")):
+        os.remove(_path(job["job_id"], "body"))
+
+
+async def _worker():
+    global _waiting
+    while True:
+        job_id = await _queue.get()
+        _waiting = max(_waiting - 1, 0)
+        try:
+            await _process(_jobs[job_id])
+        finally:
+            _queue.task_done()
+
+
+def _recover():
+    """Queue jobs a previous process left unfinished and drop expired finished ones."""
+    global _waiting
+    cutoff = time.time() - settings.ingest_job_retention_hours * 3600
+    recovered = []
+    for name in os.listdir(settings.ingest_spool_dir):
+        if not name.endswith(".json"):
+            continue
+        path = os.path.join(settings.ingest_spool_dir, name)
+        with open(path) as f:
+            job = json.load(f)
+        if job["status"] in (QUEUED, RUNNING) and os.path.exists(_path(job["job_id"], "body")):
+            job["status"] = QUEUED
+            recovered.append(job)
+        elif job["status"] in (QUEUED, RUNNING):
+            job.update(status=FAILED, error="spooled upload is missing", finished_at=_now())
+            _save(job)
+        elif os.path.getmtime(path) < cutoff:
+            os.remove(path)
+    for job in sorted(recovered, key=lambda j: j["created_at"]):
+        _jobs[job["job_id"]] = job
+        _queue.put_nowait(job["job_id"])
+        _waiting += 1
+    if recovered:
+        logger.info("Requeued %s unfinished ingestion jobs", len(recovered))
+
+
+async def start():
+    os.makedirs(settings.ingest_spool_dir, exist_ok=True)
+    _recover()
+    for _ in range(settings.ingest_workers):
+        _workers.append(asyncio.create_task(_worker()))
+
+
+async def shutdown():
+    """Stop the workers; interrupted jobs stay spooled and rerun on the next start."""
+    for task in _workers:
+        task.cancel()
+    await asyncio.gather(*_workers, return_exceptions=True)
+    _workers.clear()
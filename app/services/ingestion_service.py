@@ -1,30 +1,440 @@
+import orjson
+import pandas as pd
+
+from ..core.cache import cache
+from ..core.config import settings
 from ..core.database import db
-from ..models.schemas import SalesRecord, InventoryRecord
-from ..services.audit import log_change
-
-async def insert_sales(records):
-    async with db.pool.acquire() as conn:
-        async with conn.transaction():
-            for record in records:
-                await conn.execute(
-                    "INSERT INTO sales (store_id, sku, quantity, price, sale_date) VALUES ($1, $2, $3, $4, $5)",
-                    record.store_id,
-                    record.sku,
-                    record.quantity,
-                    record.price,
-                    record.sale_date,
-                )
-            await log_change("insert_sales", {"count": len(records)})
-
-async def insert_inventory(records):
-    async with db.pool.acquire() as conn:
-        async with conn.transaction():
-            for record in records:
-                await conn.execute(
-                    "INSERT INTO inventory (store_id, sku, quantity, last_updated) VALUES ($1, $2, $3, $4)",
-                    record.store_id,
-                    record.sku,
-                    record.quantity,
-                    record.last_updated,
-                )
-            await log_change("insert_inventory", {"count": len(records)})
+from ..core.logging import logger
+from ..models.schemas import SalesRecord, InventoryRecord, InventorySnapshotRecord
+from ..models.validation import REJECT, validate_batch
+from ..services import audit, checkpoints, sales_velocity
+from ..utils.csv_stream import iter_batches, iter_csv_rows
+
+SALES_COLUMNS = ("store_id", "sku", "quantity", "price", "sale_date")
+SALES_KEY = ("store_id", "sku", "sale_date")
+INVENTORY_COLUMNS = ("store_id", "sku", "quantity", "last_updated")
+INVENTORY_KEY = ("store_id", "sku")
+MAX_REPORTED_ERRORS = 1000
+
+
+class InvalidPayload(ValueError):
+    pass
+
+
+def decode_records(body):
+    """The `records` array of a JSON ingestion body, decoded but not yet validated."""
+    try:
+        payload = orjson.loads(body)
+    except orjson.JSONDecodeError as exc:
+        raise InvalidPayload(f"invalid JSON: {exc}")
+    records = payload.get("records") if isinstance(payload, dict) else None
+    if not isinstance(records, list) or not all(isinstance(record, dict) for record in records):
+        raise InvalidPayload('expected {"records": [...]} with one object per record')
+    return records
+
+
+async def _merge_batch(conn, table, columns, key, rows, velocity=False):
+    """COPY rows into a temp staging table and merge them into `table` in one statement.
+
+    Must run inside a transaction; the staging table is reused for every
+    batch in that transaction and dropped on commit.
+    Duplicate keys within a batch resolve to the last occurrence, matching
+    what the old row-by-row INSERT loop would have left behind.
+    With `velocity`, sales_velocity is updated for the merged keys in the
+    same transaction. Inventory merges also append the positions whose
+    quantity they add or change to inventory_history, as the snapshot path
+    does, so inventory_as_of() covers both.
+    Returns a dict with inserted and updated counts.
+    """
+    staging = f"_stage_{table}"
+    column_list = ", ".join(columns)
+    key_list = ", ".join(key)
+    updates = ", ".join(f"{c} = EXCLUDED.{c}" for c in columns if c not in key)
+
+    await conn.execute(
+        f"CREATE TEMP TABLE IF NOT EXISTS {staging} ON COMMIT DROP AS "
+        f"SELECT {column_list}, 0::bigint AS _seq FROM {table} WITH NO DATA"
+    )
+    await conn.execute(f"TRUNCATE {staging}")
+    await conn.copy_records_to_table(
+        staging,
+        records=((*row, seq) for seq, row in enumerate(rows)),
+        columns=(*columns, "_seq"),
+    )
+    if velocity:
+        as_of = await sales_velocity.advance(conn, staging)
+        await sales_velocity.apply_staged(conn, staging, as_of, -1)
+    history = ""
+    if table == "inventory":
+        # previous reads the positions as they were before this statement
+        history = f""",
+        previous AS (
+            SELECT i.store_id, i.sku, i.quantity FROM inventory i
+            JOIN (SELECT DISTINCT store_id, sku FROM {staging}) s USING (store_id, sku)
+        ),
+        history AS (
+            INSERT INTO inventory_history (store_id, sku, as_of, quantity, change)
+            SELECT m.store_id, m.sku, m.last_updated::date, m.quantity,
+                   CASE WHEN m.inserted THEN 'added' ELSE 'changed' END
+            FROM merged m
+            LEFT JOIN previous p USING (store_id, sku)
+            WHERE p.quantity IS DISTINCT FROM m.quantity
+            ON CONFLICT (store_id, sku, as_of) DO UPDATE SET
+                quantity = EXCLUDED.quantity, change = EXCLUDED.change, recorded_at = NOW()
+        )"""
+    result = await conn.fetchrow(
+        f"""
+        WITH merged AS (
+            INSERT INTO {table} ({column_list})
+            SELECT DISTINCT ON ({key_list}) {column_list}
+            FROM {staging}
+            ORDER BY {key_list}, _seq DESC
+            ON CONFLICT ({key_list}) DO UPDATE SET {updates}
+            RETURNING {column_list}, (xmax = 0) AS inserted
+        ){history}
+        SELECT COUNT(*) FILTER (WHERE inserted) AS inserted,
+               COUNT(*) FILTER (WHERE NOT inserted) AS updated
+        FROM merged
+        """
+    )
+    if velocity:
+        await sales_velocity.apply_staged(conn, staging, as_of, 1)
+    return {"inserted": result["inserted"], "updated": result["updated"]}
+
+
+async def _skip(rows, count):
+    async for row in rows:
+        if count > 0:
+            count -= 1
+            continue
+        yield row
+
+
+async def _ingest_resumable(batches, table, columns, key, action, source, prepare, velocity=False, progress=None,
+                            file_name=None):
+    """Merge `batches` into `table` one transaction per batch, checkpointing after each.
+
+    `batches` is an async iterator factory taking the number of source rows
+    to skip; `prepare` turns a batch into (rows, errors frame or None). Each
+    batch commits together with its ingest_checkpoint update, so a failure
+    loses at most one batch and resubmitting the same `source` resumes after
+    the last committed one. The checkpoint is cleared once the load
+    completes, so `source` names one submission: sending the same source
+    after it completed loads it again from the first row.
+    """
+    errors = []
+    with audit.run(action, file_name=file_name) as run:
+        run.details["source"] = source
+        async with db.acquire_bulk() as conn:
+            run.lap("acquire")
+            checkpoint = await checkpoints.load(conn, table, source)
+            committed, totals, _ = checkpoint or (0, {"ingested": 0, "inserted": 0, "updated": 0, "rejected": 0}, None)
+            resumed_from = committed
+            run.details["resumed_from"] = resumed_from
+            try:
+                async for batch in batches(committed):
+                    run.lap("read")
+                    stores = set()
+                    async with conn.transaction():
+                        rows, batch_errors = prepare(batch)
+                        if batch_errors is not None:
+                            totals["rejected"] += batch_errors["row"].nunique()
+                            errors.extend(batch_errors.head(MAX_REPORTED_ERRORS - len(errors)).to_dict("records"))
+                        run.lap("validate")
+                        if rows:
+                            counts = await _merge_batch(conn, table, columns, key, rows, velocity)
+                            stores.update(row[0] for row in rows)
+                            totals["ingested"] += len(rows)
+                            totals["inserted"] += counts["inserted"]
+                            totals["updated"] += counts["updated"]
+                        run.lap("merge")
+                        committed += len(batch)
+                        await checkpoints.save(conn, table, source, committed, totals)
+                    run.lap("commit")
+                    run.record_count = totals["ingested"]
+                    run.details.update(totals)
+                    if stores:
+                        cache.invalidate(table, stores)
+                    if progress:
+                        await progress(totals)
+            except Exception as exc:
+                try:
+                    await checkpoints.fail(conn, table, source, str(exc))
+                except Exception:
+                    # A broken connection cannot record the failure; keep the original error
+                    logger.exception("Could not mark checkpoint %s/%s failed", table, source)
+                raise
+            await checkpoints.clear(conn, table, source)
+    return {**totals, "errors": errors, "resumed_from": resumed_from}
+
+
+def _record_batches(records, size):
+    async def batches(skip):
+        for start in range(skip, len(records), size):
+            yield list(enumerate(records[start:start + size], start))
+    return batches
+
+
+def _valid_rows(frame, model, columns, mode):
+    result = validate_batch(frame, model, mode)
+    rows = list(zip(*(result.valid[c].tolist() for c in columns)))
+    return rows, result.errors
+
+
+def _validated_rows(batch, model, columns, mode):
+    lines, raw = zip(*batch)
+    return _valid_rows(pd.DataFrame(list(raw), index=list(lines), dtype=object), model, columns, mode)
+
+
+def _validated_records(batch, model, columns, mode):
+    """Like _validated_rows for decoded JSON objects, which keep their JSON types."""
+    index, raw = zip(*batch)
+    frame = pd.DataFrame.from_records(list(raw), columns=list(columns), index=list(index))
+    for column in columns:
+        missing = frame[column].isna()
+        if missing.any():
+            # Absent (or null) fields must reach the per-row path as absent, not NaN
+            frame[column] = frame[column].astype(object).where(~missing, None)
+    return _valid_rows(frame, model, columns, mode)
+
+
+async def _ingest_records(records, table, model, columns, key, action, mode, velocity=False, source=None,
+                          file_name=None):
+    """Validate decoded JSON records column-wise and merge them in one transaction.
+
+    Rows are identified by their position in `records` in the error
+    report; `mode` works as for CSV uploads. With a `source` fingerprint
+    the records commit in checkpointed batches (see _ingest_resumable).
+    """
+    batches = _record_batches(records, settings.ingest_batch_size)
+    if source is not None:
+        return await _ingest_resumable(
+            batches, table, columns, key, action, source,
+            lambda batch: _validated_records(batch, model, columns, mode), velocity=velocity, file_name=file_name,
+        )
+    with audit.run(action, record_count=len(records), file_name=file_name) as run:
+        rows, errors = _validated_records(list(enumerate(records)), model, columns, mode) if records else ([], None)
+        run.lap("validate")
+        counts = {"inserted": 0, "updated": 0}
+        async with db.acquire_bulk() as conn:
+            run.lap("acquire")
+            if rows:
+                async with conn.transaction():
+                    counts = await _merge_batch(conn, table, columns, key, rows, velocity)
+                    run.lap("merge")
+            run.lap("commit")
+        totals = {"ingested": len(rows), **counts, "rejected": 0 if errors is None else errors["row"].nunique()}
+        run.record_count = totals["ingested"]
+        run.details.update(totals)
+    cache.invalidate(table, {row[0] for row in rows})
+    reported = [] if errors is None else errors.head(MAX_REPORTED_ERRORS).to_dict("records")
+    return {**totals, "errors": reported}
+
+
+async def insert_sales(records, mode=REJECT, source=None, file_name=None):
+    """Validate and merge decoded JSON sales records."""
+    return await _ingest_records(
+        records, "sales", SalesRecord, SALES_COLUMNS, SALES_KEY, "insert_sales", mode, velocity=True, source=source,
+        file_name=file_name,
+    )
+
+
+async def insert_inventory(records, mode=REJECT, source=None, file_name=None):
+    """Validate and merge decoded JSON inventory records."""
+    return await _ingest_records(
+        records, "inventory", InventoryRecord, INVENTORY_COLUMNS, INVENTORY_KEY, "insert_inventory", mode,
+        source=source, file_name=file_name,
+    )
+
+
+async def _ingest_csv(chunks, table, model, columns, key, action, mode, velocity=False, progress=None,
+                      source=None, file_name=None):
+    """Stream a CSV body into `table` batch by batch inside a single transaction.
+
+    Only one batch of parsed rows is alive at a time. In reject mode any
+    invalid row aborts the whole upload, as with the JSON endpoints; in
+    quarantine mode bad rows are skipped and reported by line number.
+    `progress`, if given, is awaited with the running totals after each batch.
+    With a `source` fingerprint each batch commits on its own and the upload
+    is resumable (see _ingest_resumable); an invalid row in reject mode then
+    stops the upload after the batches before it.
+    """
+    if source is not None:
+        def batches(skip):
+            return iter_batches(_skip(iter_csv_rows(chunks), skip), settings.ingest_batch_size)
+        return await _ingest_resumable(
+            batches, table, columns, key, action, source,
+            lambda batch: _validated_rows(batch, model, columns, mode), velocity=velocity, progress=progress,
+            file_name=file_name,
+        )
+    totals = {"ingested": 0, "inserted": 0, "updated": 0, "rejected": 0}
+    errors = []
+    stores = set()
+    with audit.run(action, file_name=file_name) as run:
+        async with db.acquire_bulk() as conn:
+            run.lap("acquire")
+            async with conn.transaction():
+                async for batch in iter_batches(iter_csv_rows(chunks), settings.ingest_batch_size):
+                    run.lap("read")
+                    rows, batch_errors = _validated_rows(batch, model, columns, mode)
+                    totals["rejected"] += batch_errors["row"].nunique()
+                    errors.extend(batch_errors.head(MAX_REPORTED_ERRORS - len(errors)).to_dict("records"))
+                    run.lap("validate")
+                    if rows:
+                        counts = await _merge_batch(conn, table, columns, key, rows, velocity)
+                        stores.update(row[0] for row in rows)
+                        totals["ingested"] += len(rows)
+                        totals["inserted"] += counts["inserted"]
+                        totals["updated"] += counts["updated"]
+                    run.lap("merge")
+                    if progress:
+                        await progress(totals)
+            run.lap("commit")
+        run.record_count = totals["ingested"]
+        run.details.update(totals)
+    cache.invalidate(table, stores)
+    return {**totals, "errors": errors}
+
+
+async def insert_sales_csv(chunks, mode=REJECT, progress=None, source=None, file_name=None):
+    return await _ingest_csv(
+        chunks, "sales", SalesRecord, SALES_COLUMNS, SALES_KEY, "insert_sales_csv", mode,
+        velocity=True, progress=progress, source=source, file_name=file_name,
+    )
+
+
+async def insert_inventory_csv(chunks, mode=REJECT, progress=None, source=None, file_name=None):
+    return await _ingest_csv(
+        chunks, "inventory", InventoryRecord, INVENTORY_COLUMNS, INVENTORY_KEY, "insert_inventory_csv", mode,
+        progress=progress, source=source, file_name=file_name,
+    )
+
+
+SNAPSHOT_STAGING = "_stage_inventory_snapshot"
+
+
+async def _stage_snapshot(conn, rows, seq):
+    """COPY snapshot rows into the snapshot staging table; must run inside a transaction."""
+    await conn.execute(
+        f"CREATE TEMP TABLE IF NOT EXISTS {SNAPSHOT_STAGING} ON COMMIT DROP AS "
+        f"SELECT {', '.join(INVENTORY_COLUMNS)}, 0::bigint AS _seq FROM inventory WITH NO DATA"
+    )
+    await conn.copy_records_to_table(
+        SNAPSHOT_STAGING,
+        records=((*row, seq + i) for i, row in enumerate(rows)),
+        columns=(*INVENTORY_COLUMNS, "_seq"),
+    )
+
+
+async def _apply_snapshot(conn, as_of):
+    """Diff the staged snapshot against inventory in one statement and write only the differences.
+
+    The snapshot is complete for every store it contains: positions of those
+    stores that it leaves out are removed. Stores absent from the snapshot
+    are not touched. Every difference is also appended to inventory_history
+    under `as_of` (the snapshot's latest last_updated when None).
+    Returns a dict with added, changed, removed and unchanged counts.
+    """
+    result = await conn.fetchrow(
+        f"""
+        WITH incoming AS (
+            SELECT DISTINCT ON (store_id, sku) store_id, sku, quantity
+            FROM {SNAPSHOT_STAGING}
+            ORDER BY store_id, sku, _seq DESC
+        ),
+        snapshot_date AS (
+            SELECT COALESCE($1::date, MAX(last_updated)::date) AS as_of FROM {SNAPSHOT_STAGING}
+        ),
+        existing AS (
+            SELECT store_id, sku, quantity FROM inventory
+            WHERE store_id IN (SELECT DISTINCT store_id FROM {SNAPSHOT_STAGING})
+        ),
+        diff AS (
+            SELECT COALESCE(n.store_id, o.store_id) AS store_id, COALESCE(n.sku, o.sku) AS sku, n.quantity,
+                   CASE WHEN o.sku IS NULL THEN 'added' WHEN n.sku IS NULL THEN 'removed' ELSE 'changed' END AS change
+            FROM incoming n
+            FULL JOIN existing o ON o.store_id = n.store_id AND o.sku = n.sku
+            WHERE n.sku IS NULL OR o.sku IS NULL OR n.quantity IS DISTINCT FROM o.quantity
+        ),
+        upserted AS (
+            INSERT INTO inventory (store_id, sku, quantity, last_updated)
+            SELECT d.store_id, d.sku, d.quantity, s.as_of FROM diff d, snapshot_date s
+            WHERE d.change <> 'removed'
+            ON CONFLICT (store_id, sku) DO UPDATE SET
+                quantity = EXCLUDED.quantity, last_updated = EXCLUDED.last_updated
+        ),
+        removed AS (
+            DELETE FROM inventory i USING diff d
+            WHERE d.change = 'removed' AND i.store_id = d.store_id AND i.sku = d.sku
+        ),
+        history AS (
+            INSERT INTO inventory_history (store_id, sku, as_of, quantity, change)
+            SELECT d.store_id, d.sku, s.as_of, d.quantity, d.change FROM diff d, snapshot_date s
+            ON CONFLICT (store_id, sku, as_of) DO UPDATE SET
+                quantity = EXCLUDED.quantity, change = EXCLUDED.change, recorded_at = NOW()
+        )
+        SELECT COUNT(*) FILTER (WHERE change = 'added') AS added,
+               COUNT(*) FILTER (WHERE change = 'changed') AS changed,
+               COUNT(*) FILTER (WHERE change = 'removed') AS removed,
+               (SELECT COUNT(*) FROM incoming) AS incoming
+        FROM diff
+        """,
+        as_of,
+    )
+    counts = {key: result[key] for key in ("added", "changed", "removed")}
+    counts["unchanged"] = result["incoming"] - counts["added"] - counts["changed"]
+    return counts
+
+
+async def insert_inventory_snapshot(records, as_of=None, file_name=None):
+    """Apply a full inventory snapshot, writing only new, changed and removed positions."""
+    rows = [
+        (r.store_id, r.sku, r.quantity, r.last_updated)
+        for r in records
+    ]
+    with audit.run("insert_inventory_snapshot", record_count=len(records), file_name=file_name) as run:
+        async with db.acquire_bulk() as conn:
+            run.lap("acquire")
+            async with conn.transaction():
+                await _stage_snapshot(conn, rows, 0)
+                run.lap("stage")
+                counts = await _apply_snapshot(conn, as_of)
+                run.lap("diff")
+            run.lap("commit")
+        run.details.update(counts)
+    cache.invalidate("inventory", {r.store_id for r in records})
+    return counts
+
+
+async def insert_inventory_snapshot_csv(chunks, as_of=None, progress=None, file_name=None):
+    """Stream a CSV snapshot into staging batch by batch, then apply it with one diff.
+
+    Any invalid row rejects the whole snapshot: a skipped row would read as
+    a position missing from the snapshot and be removed. Only the set-based
+    diff at the end writes to inventory.
+    """
+    totals = {"ingested": 0}
+    stores = set()
+    with audit.run("insert_inventory_snapshot_csv", file_name=file_name) as run:
+        async with db.acquire_bulk() as conn:
+            run.lap("acquire")
+            async with conn.transaction():
+                async for batch in iter_batches(iter_csv_rows(chunks), settings.ingest_batch_size):
+                    run.lap("read")
+                    rows, _ = _validated_rows(batch, InventorySnapshotRecord, INVENTORY_COLUMNS, REJECT)
+                    run.lap("validate")
+                    if rows:
+                        await _stage_snapshot(conn, rows, totals["ingested"])
+                        stores.update(row[0] for row in rows)
+                        totals["ingested"] += len(rows)
+                    run.lap("stage")
+                    if progress:
+                        await progress(totals)
+                if totals["ingested"]:
+                    totals.update(await _apply_snapshot(conn, as_of))
+                run.lap("diff")
+            run.lap("commit")
+        run.record_count = totals["ingested"]
+        run.details.update(totals)
+    cache.invalidate("inventory", stores)
+    return totals
@@ -0,0 +1,241 @@
+"""Monthly partition management for the sales fact tables."""
+import asyncio
+from datetime import date
+
+from ..core.cache import cache
+from ..core.config import settings
+from ..core.database import db
+from ..core.logging import logger
+
+FACT_TABLES = {
+    "sales": "sale_date",
+    "salessummary": "date",
+    "historical_daily_sales": "sale_date",
+}
+# Cache tables whose results read each fact table
+CACHE_TABLES = {
+    "sales": ("sales",),
+    "salessummary": (),
+    "historical_daily_sales": ("sales_budget_rollup",),
+}
+ARCHIVE_SCHEMA = "archive"
+# Arbitrary key for pg_try_advisory_lock so one process maintains at a time
+MAINTENANCE_LOCK = 7_301_017
+
+PARTITIONS_QUERY = """
+    SELECT c.relname AS partition,
+           substring(pg_get_expr(c.relpartbound, c.oid) FROM 'FROM \\(''([0-9-]+)''\\)')::date AS month,
+           c.reltuples::bigint AS estimated_rows,
+           pg_total_relation_size(c.oid) AS bytes
+    FROM pg_inherits i
+    JOIN pg_class c ON c.oid = i.inhrelid
+    WHERE i.inhparent = $1::regclass
+    ORDER BY month NULLS FIRST
+"""
+
+_task = None
+
+
+def _check_table(table):
+    if table not in FACT_TABLES:
+        raise ValueError(f"{table} is not a partitioned fact table")
+
+
+def _month_start(day):
+    return day.replace(day=1)
+
+
+def _add_months(month, months):
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(table, month):
+    return f"{table}_p{month:%Y_%m}"
+
+
+async def is_partitioned(conn, table):
+    return await conn.fetchval(
+        "SELECT relkind = 'p' FROM pg_class WHERE oid = to_regclass($1)", table
+    ) or False
+
+
+async def list_partitions(conn, table):
+    """Attached partitions of `table` in month order; the default partition has month None."""
+    _check_table(table)
+    rows = await conn.fetch(PARTITIONS_QUERY, table)
+    return [dict(row) for row in rows]
+
+
+async def ensure_partitions(conn, table, months_ahead=None):
+    """Create missing partitions up to `months_ahead` months after the current one.
+
+    Months that already have rows in the default partition get their own
+    partition too, and those rows are moved into it. Returns the number of
+    partitions created.
+    """
+    _check_table(table)
+    months_ahead = settings.partition_months_ahead if months_ahead is None else months_ahead
+    column = FACT_TABLES[table]
+    current = _month_start(date.today())
+    default = await conn.fetchval(
+        "SELECT partdefid::regclass::text FROM pg_partitioned_table WHERE partrelid = $1::regclass AND partdefid <> 0",
+        table,
+    )
+    first = current
+    if default is not None:
+        oldest = await conn.fetchval(f"SELECT MIN({column}) FROM {default}")
+        if oldest is not None:
+            first = min(first, _month_start(oldest))
+    last = _add_months(current, months_ahead)
+    return await conn.fetchval("SELECT ensure_month_partitions($1, $2, $3)", table, first, last)
+
+
+async def detach_partition(conn, table, month):
+    """Detach `table`'s partition for `month`; the rows stay in a standalone table."""
+    _check_table(table)
+    name = partition_name(table, _month_start(month))
+    await conn.execute(f"ALTER TABLE {table} DETACH PARTITION {name}")
+    return name
+
+
+async def archive_partition(conn, table, month):
+    """Detach `table`'s partition for `month` and move it to the archive schema.
+
+    The archived table keeps its rows and check constraints but not its
+    indexes. Call compact_archived() afterwards, outside a transaction, to
+    rewrite it.
+    """
+    name = await detach_partition(conn, table, month)
+    await conn.execute(f"CREATE SCHEMA IF NOT EXISTS {ARCHIVE_SCHEMA}")
+    await conn.execute(f"ALTER TABLE {name} SET SCHEMA {ARCHIVE_SCHEMA}")
+    indexes = await conn.fetch(
+        """
+        SELECT x.indexrelid::regclass::text AS index, con.conname
+        FROM pg_index x
+        LEFT JOIN pg_constraint con ON con.conindid = x.indexrelid AND con.conrelid = x.indrelid
+        WHERE x.indrelid = $1::regclass
+        """,
+        f"{ARCHIVE_SCHEMA}.{name}",
+    )
+    for row in indexes:
+        if row["conname"] is not None:
+            await conn.execute(f'ALTER TABLE {ARCHIVE_SCHEMA}.{name} DROP CONSTRAINT "{row["conname"]}"')
+        else:
+            await conn.execute(f"DROP INDEX {row['index']}")
+    return f"{ARCHIVE_SCHEMA}.{name}"
+
+
+async def compact_archived(conn, archived):
+    """Rewrite an archived partition densely, into the archive tablespace if one is set."""
+    if settings.partition_archive_tablespace:
+        await conn.execute(f'ALTER TABLE {archived} SET TABLESPACE "{settings.partition_archive_tablespace}"')
+        await conn.execute(f"ANALYZE {archived}")
+    else:
+        await conn.execute(f"VACUUM (FULL, ANALYZE) {archived}")
+
+
+async def attach_partition(conn, table, month):
+    """Attach a detached or archived month of `table` again.
+
+    Rows for that month that arrived in the default partition meanwhile are
+    moved into it first.
+    """
+    _check_table(table)
+    month = _month_start(month)
+    name = partition_name(table, month)
+    if await conn.fetchval("SELECT to_regclass($1)", name) is None:
+        archived = f"{ARCHIVE_SCHEMA}.{name}"
+        if await conn.fetchval("SELECT to_regclass($1)", archived) is None:
+            raise LookupError(f"no detached or archived partition {name}")
+        await conn.execute(f"ALTER TABLE {archived} SET SCHEMA public")
+    column = FACT_TABLES[table]
+    next_month = _add_months(month, 1)
+    default = await conn.fetchval(
+        "SELECT partdefid::regclass::text FROM pg_partitioned_table WHERE partrelid = $1::regclass AND partdefid <> 0",
+        table,
+    )
+    if default is not None:
+        await conn.execute(
+            f"""
+            WITH moved AS (DELETE FROM {default} WHERE {column} >= $1 AND {column} < $2 RETURNING *)
+            INSERT INTO {name} SELECT * FROM moved
+            """,
+            month, next_month,
+        )
+    await conn.execute(
+        f"ALTER TABLE {table} ATTACH PARTITION {name} FOR VALUES FROM ('{month}') TO ('{next_month}')"
+    )
+    return name
+
+
+async def _maintain_table(conn, table):
+    result = {"created": 0, "detached": [], "archived": []}
+    async with conn.transaction():
+        result["created"] = await ensure_partitions(conn, table)
+        if settings.partition_retention_months > 0:
+            cutoff = _add_months(_month_start(date.today()), -settings.partition_retention_months)
+            for partition in await list_partitions(conn, table):
+                if partition["month"] is None or partition["month"] >= cutoff:
+                    continue
+                if settings.partition_archive:
+                    result["archived"].append(await archive_partition(conn, table, partition["month"]))
+                else:
+                    result["detached"].append(await detach_partition(conn, table, partition["month"]))
+    # VACUUM cannot run inside a transaction block
+    for archived in result["archived"]:
+        await compact_archived(conn, archived)
+    if result["detached"] or result["archived"]:
+        for cache_table in CACHE_TABLES[table]:
+            cache.invalidate(cache_table)
+    return result
+
+
+async def maintain():
+    """Run one maintenance pass over every migrated fact table.
+
+    Returns {table: {"created", "detached", "archived"}}, or None when
+    another process holds the maintenance lock.
+    """
+    async with db.pool.acquire() as conn:
+        if not await conn.fetchval("SELECT pg_try_advisory_lock($1)", MAINTENANCE_LOCK):
+            return None
+        try:
+            results = {}
+            for table in FACT_TABLES:
+                if not await is_partitioned(conn, table):
+                    continue
+                results[table] = await _maintain_table(conn, table)
+            return results
+        finally:
+            await conn.execute("SELECT pg_advisory_unlock($1)", MAINTENANCE_LOCK)
+
+
+async def _run_periodically():
+    while True:
+        try:
+            results = await maintain()
+        except Exception:
+            logger.exception("Partition maintenance failed")
+        else:
+            for table, result in (results or {}).items():
+                if result["created"] or result["detached"] or result["archived"]:
+                    logger.info(
+                        "Partitions of %s: %s created, detached %s, archived %s",
+                        table, result["created"], result["detached"], result["archived"],
+                    )
+        await asyncio.sleep(settings.partition_maintenance_interval)
+
+
+async def start():
+    global _task
+    if settings.partition_maintenance_interval > 0:
+        _task = asyncio.create_task(_run_periodically())
+
+
+async def shutdown():
+    global _task
+    if _task is not None:
+        _task.cancel()
+        await asyncio.gather(_task, return_exceptions=True)
+        _task = None
@@ -0,0 +1,92 @@
+"""Vectorized reorder quantities over aligned per-position NumPy arrays."""
+from typing import NamedTuple
+
+import numpy as np
+
+ABC_CLASSES = np.array(["A", "B", "C"])
+ABC_THRESHOLDS = (0.80, 0.95)
+DEFAULT_WEEKS_OF_SUPPLY = {"A": 3.0, "B": 2.0, "C": 1.0}
+
+NO_EXCEPTION = 0
+DO_NOT_REORDER = 1
+LTO = 2
+STRIKE = 3
+EXCEPTION_NAMES = np.array([None, "do_not_reorder", "lto", "strike"], dtype=object)
+
+# reorderrule.logic_reference values (case-insensitive) that map to an exception
+RULE_EXCEPTIONS = {
+    "do_not_reorder": DO_NOT_REORDER,
+    "dnr": DO_NOT_REORDER,
+    "lto": LTO,
+    "strike": STRIKE,
+}
+
+
+class ReorderResult(NamedTuple):
+    weekly_velocity: np.ndarray
+    abc_class: np.ndarray
+    target_qty: np.ndarray
+    recommended_qty: np.ndarray
+    cases: np.ndarray
+
+
+def abc_classes(store_ids: np.ndarray, revenue: np.ndarray, thresholds=ABC_THRESHOLDS) -> np.ndarray:
+    """Index into ABC_CLASSES for each position, ranked by revenue within its store.
+
+    A position's class is decided by the share of store revenue ranked
+    above it, so a store's best seller is always A.
+    """
+    n = len(store_ids)
+    classes = np.full(n, 2, dtype=np.int8)
+    if n == 0:
+        return classes
+    order = np.lexsort((-revenue, store_ids))
+    sorted_revenue = revenue[order]
+    sorted_stores = store_ids[order]
+    starts = np.empty(n, dtype=bool)
+    starts[0] = True
+    np.not_equal(sorted_stores[1:], sorted_stores[:-1], out=starts[1:])
+    group = np.cumsum(starts) - 1
+
+    totals = np.bincount(group, weights=sorted_revenue)
+    before = np.cumsum(sorted_revenue) - sorted_revenue
+    before -= before[starts][group]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        share_before = np.where(totals[group] > 0, before / totals[group], 1.0)
+
+    ranked = np.where(share_before < thresholds[0], 0, np.where(share_before < thresholds[1], 1, 2))
+    ranked[sorted_revenue <= 0] = 2
+    classes[order] = ranked
+    return classes
+
+
+def compute_reorder(
+    store_ids: np.ndarray,
+    on_hand: np.ndarray,
+    units_sold: np.ndarray,
+    revenue: np.ndarray,
+    min_qty: np.ndarray,
+    multiplier: np.ndarray,
+    units_per_case: np.ndarray,
+    exception: np.ndarray,
+    window_days: int,
+    weeks_of_supply=None,
+) -> ReorderResult:
+    """Compute order quantities for every position; all inputs are aligned 1-D arrays."""
+    weeks_of_supply = {**DEFAULT_WEEKS_OF_SUPPLY, **(weeks_of_supply or {})}
+    cover = np.array([weeks_of_supply[c] for c in ABC_CLASSES], dtype=float)
+
+    velocity = units_sold.astype(float) / (window_days / 7.0)
+    classes = abc_classes(store_ids, revenue.astype(float))
+
+    min_qty = min_qty.astype(np.int64)
+    target = np.ceil(velocity * cover[classes] * multiplier - 1e-9).astype(np.int64)
+    target = np.maximum(target, min_qty)
+    target[exception == LTO] = min_qty[exception == LTO]
+
+    need = np.maximum(target - on_hand.astype(np.int64), 0)
+    need[(exception == DO_NOT_REORDER) | (exception == STRIKE)] = 0
+
+    case_size = np.where(units_per_case > 0, units_per_case, 1).astype(np.int64)
+    cases = -(-need // case_size)
+    return ReorderResult(velocity, ABC_CLASSES[classes], target, cases * case_size, cases)
@@ -0,0 +1,165 @@
+"""Reorder runs sharded by store across a process pool, written as run snapshots."""
+import asyncio
+import functools
+import json
+import multiprocessing
+import time
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+
+from ..core.cache import cache
+from ..core.config import settings
+from ..core.database import db
+from ..core.logging import logger
+from . import reorder_service, sales_velocity
+from .reorder_engine import DEFAULT_WEEKS_OF_SUPPLY, compute_reorder
+
+_executor = None
+_active = {}
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(
+            max_workers=settings.reorder_workers,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+    return _executor
+
+
+async def start_run(window_days=None, weeks_of_supply=None):
+    """Create a reorder run and compute it in the background; returns the run's id and status.
+
+    If a run is already in progress it is returned instead of starting another.
+    Runs that stopped reporting progress (e.g. the process died) are marked failed.
+    """
+    window_days = window_days or settings.reorder_window_days
+    weeks_of_supply = {**DEFAULT_WEEKS_OF_SUPPLY, **(weeks_of_supply or {})}
+    params = {"window_days": window_days, "weeks_of_supply": weeks_of_supply}
+
+    async with db.pool.acquire() as conn:
+        async with conn.transaction():
+            # Serializes concurrent triggers, including from other API processes
+            await conn.execute("LOCK TABLE reorder_run IN SHARE ROW EXCLUSIVE MODE")
+            await conn.execute(
+                """
+                UPDATE reorder_run
+                SET status = 'failed', error = 'abandoned: no progress reported', updated_at = NOW()
+                WHERE status = 'running' AND updated_at < NOW() - make_interval(mins => $1)
+                """,
+                settings.reorder_stale_minutes,
+            )
+            running = await conn.fetchrow(
+                "SELECT run_id, store_count, stores_done FROM reorder_run WHERE status = 'running' "
+                "ORDER BY run_id DESC LIMIT 1"
+            )
+            if running:
+                return {**dict(running), "status": "running"}
+
+            if window_days in sales_velocity.WINDOWS:
+                await sales_velocity.advance(conn)
+            stores = await reorder_service.list_stores(conn)
+            run_id = await conn.fetchval(
+                """
+                INSERT INTO reorder_run (status, params, store_count, stores_done, updated_at)
+                VALUES ('running', $1::jsonb, $2, 0, NOW())
+                RETURNING run_id
+                """,
+                json.dumps(params), len(stores),
+            )
+
+    _active[run_id] = asyncio.create_task(_execute(run_id, stores, window_days, weeks_of_supply))
+    return {"run_id": run_id, "status": "running", "store_count": len(stores), "stores_done": 0}
+
+
+async def _execute(run_id, stores, window_days, weeks_of_supply):
+    started = time.perf_counter()
+    timings = defaultdict(float)
+    slots = asyncio.Semaphore(settings.reorder_workers)
+    try:
+        async with db.pool.acquire() as conn:
+            products = await reorder_service.load_products(conn)
+        results = await asyncio.gather(
+            *(
+                _run_store(run_id, store_id, window_days, weeks_of_supply, products, slots, timings)
+                for store_id in stores
+            ),
+            return_exceptions=True,
+        )
+        failures = [r for r in results if isinstance(r, BaseException)]
+        if failures:
+            raise failures[0]
+
+        timings["wall_seconds"] = time.perf_counter() - started
+        await _finish(run_id, "completed", timings)
+        db.note_write()
+        cache.invalidate("reorder_run")
+        logger.info("Reorder run %s completed for %s stores in %.1fs", run_id, len(stores), timings["wall_seconds"])
+    except asyncio.CancelledError:
+        await _finish(run_id, "failed", timings, "cancelled")
+        raise
+    except Exception as exc:
+        logger.exception("Reorder run %s failed", run_id)
+        await _finish(run_id, "failed", timings, str(exc))
+    finally:
+        _active.pop(run_id, None)
+
+
+async def _run_store(run_id, store_id, window_days, weeks_of_supply, products, slots, timings):
+    async with slots:
+        mark = time.perf_counter()
+        async with db.pool.acquire() as conn:
+            positions = await reorder_service.load_store_positions(conn, store_id, window_days, products)
+        timings["load_seconds"] += time.perf_counter() - mark
+
+        mark = time.perf_counter()
+        result = await asyncio.get_running_loop().run_in_executor(
+            _get_executor(),
+            functools.partial(
+                compute_reorder, *reorder_service.engine_inputs(positions), window_days, weeks_of_supply
+            ),
+        )
+        timings["compute_seconds"] += time.perf_counter() - mark
+
+        mark = time.perf_counter()
+        async with db.pool.acquire() as conn:
+            async with conn.transaction():
+                _, ordered = await reorder_service.insert_run_lines(conn, run_id, positions, result)
+                await conn.execute(
+                    """
+                    UPDATE reorder_run
+                    SET stores_done = stores_done + 1,
+                        position_count = position_count + $2,
+                        recommended_count = recommended_count + $3,
+                        updated_at = NOW()
+                    WHERE run_id = $1
+                    """,
+                    run_id, len(positions), ordered,
+                )
+        timings["persist_seconds"] += time.perf_counter() - mark
+
+
+async def _finish(run_id, status, timings, error=None):
+    async with db.pool.acquire() as conn:
+        await conn.execute(
+            """
+            UPDATE reorder_run
+            SET status = $2, error = $3, timings = $4::jsonb, updated_at = NOW(),
+                completed_at = CASE WHEN $2 = 'completed' THEN NOW() END
+            WHERE run_id = $1
+            """,
+            run_id, status, error, json.dumps({k: round(v, 3) for k, v in timings.items()}),
+        )
+
+
+async def shutdown():
+    """Cancel in-flight runs and stop the worker processes."""
+    global _executor
+    for task in list(_active.values()):
+        task.cancel()
+    if _active:
+        await asyncio.gather(*_active.values(), return_exceptions=True)
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
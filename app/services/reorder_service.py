@@ -1,6 +1,166 @@
+import io
+
+import numpy as np
+import pandas as pd
+
+from ..core.cache import cached
 from ..core.database import db
+from . import sales_velocity
+from .reorder_engine import (
+    DO_NOT_REORDER,
+    EXCEPTION_NAMES,
+    NO_EXCEPTION,
+    RULE_EXCEPTIONS,
+)
 
-async def get_reorder_recommendations():
+KEY = ["store_id", "sku"]
+
+STORES_QUERY = """
+    SELECT store_id FROM inventory
+    UNION SELECT store_id FROM reorderpolicy
+    UNION SELECT store_id FROM sales_velocity
+    ORDER BY store_id
+"""
+INVENTORY_QUERY = "SELECT store_id, sku, quantity AS on_hand FROM inventory WHERE store_id = $1"
+SALES_QUERY = """
+    SELECT store_id, sku, SUM(quantity) AS units_sold, SUM(quantity * price) AS revenue
+    FROM sales
+    WHERE store_id = $1 AND sale_date > CURRENT_DATE - $2::int
+    GROUP BY store_id, sku
+"""
+# Windows kept in sales_velocity are read from there instead of scanning sales
+VELOCITY_QUERY = """
+    SELECT store_id, sku, units_{days}d AS units_sold, revenue_{days}d AS revenue
+    FROM sales_velocity
+    WHERE store_id = $1 AND units_{days}d <> 0
+"""
+POLICY_QUERY = """
+    SELECT p.store_id, p.sku, p.min_qty, p.reorder_multiplier, p.do_not_reorder, r.logic_reference
+    FROM reorderpolicy p
+    LEFT JOIN reorderrule r ON r.rule_id = p.assigned_rule_id
+    WHERE p.store_id = $1
+"""
+PRODUCT_QUERY = "SELECT sku, units_per_case FROM product"
+
+RUN_LINE_COLUMNS = (
+    "run_id", "store_id", "sku", "on_hand", "weekly_velocity", "abc_class",
+    "target_qty", "recommended_qty", "cases", "exception",
+)
+
+
+async def _fetch_frame(conn, query, *args):
+    """Pull a query result with COPY ... TO STDOUT and parse it in one pass."""
+    buffer = io.BytesIO()
+    await conn.copy_from_query(query, *args, output=buffer, format="csv", header=True)
+    buffer.seek(0)
+    frame = pd.read_csv(
+        buffer, dtype={"sku": str, "logic_reference": str}, true_values=["t"], false_values=["f"]
+    )
+    if "store_id" in frame:
+        frame["store_id"] = frame["store_id"].astype(np.int64)
+    return frame
+
+
+async def list_stores(conn):
+    return [row["store_id"] for row in await conn.fetch(STORES_QUERY)]
+
+
+async def load_products(conn):
+    return (await _fetch_frame(conn, PRODUCT_QUERY)).drop_duplicates("sku")
+
+
+async def load_store_positions(conn, store_id, window_days, products):
+    """One consistent read of a store's inventory, trailing sales and policies, aligned into one frame."""
+    async with conn.transaction(isolation="repeatable_read", readonly=True):
+        inventory = await _fetch_frame(conn, INVENTORY_QUERY, store_id)
+        if window_days in sales_velocity.WINDOWS:
+            sales = await _fetch_frame(conn, VELOCITY_QUERY.format(days=window_days), store_id)
+        else:
+            sales = await _fetch_frame(conn, SALES_QUERY, store_id, window_days)
+        policy = await _fetch_frame(conn, POLICY_QUERY, store_id)
+
+    positions = (
+        inventory.merge(sales, on=KEY, how="outer")
+        .merge(policy, on=KEY, how="outer")
+        .merge(products, on="sku", how="left")
+    )
+    positions = positions.fillna({
+        "on_hand": 0, "units_sold": 0, "revenue": 0, "min_qty": 0,
+        "reorder_multiplier": 1, "do_not_reorder": False, "units_per_case": 1,
+    })
+    rule = (
+        positions["logic_reference"].str.strip().str.lower().map(RULE_EXCEPTIONS)
+        .fillna(NO_EXCEPTION).astype(np.int8)
+    )
+    positions["exception"] = np.where(
+        positions["do_not_reorder"].astype(bool), DO_NOT_REORDER, rule
+    ).astype(np.int8)
+    return positions
+
+
+def engine_inputs(positions):
+    """Positional arguments for reorder_engine.compute_reorder, minus window and cover."""
+    return (
+        positions["store_id"].to_numpy(),
+        positions["on_hand"].to_numpy(),
+        positions["units_sold"].to_numpy(),
+        positions["revenue"].to_numpy(),
+        positions["min_qty"].to_numpy(),
+        positions["reorder_multiplier"].to_numpy(dtype=float),
+        positions["units_per_case"].to_numpy(),
+        positions["exception"].to_numpy(),
+    )
+
+
+async def insert_run_lines(conn, run_id, positions, result):
+    """Write positions that order or hit an exception; returns (lines written, lines ordering)."""
+    flagged = (result.recommended_qty > 0) | (positions["exception"].to_numpy() != NO_EXCEPTION)
+    lines = zip(
+        [run_id] * int(flagged.sum()),
+        positions["store_id"].to_numpy()[flagged].astype(np.int64).tolist(),
+        positions["sku"].to_numpy()[flagged].tolist(),
+        positions["on_hand"].to_numpy()[flagged].astype(np.int64).tolist(),
+        result.weekly_velocity[flagged].tolist(),
+        result.abc_class[flagged].tolist(),
+        result.target_qty[flagged].tolist(),
+        result.recommended_qty[flagged].tolist(),
+        result.cases[flagged].tolist(),
+        EXCEPTION_NAMES[positions["exception"].to_numpy()[flagged]].tolist(),
+    )
+    await conn.copy_records_to_table("reorder_run_line", records=lines, columns=RUN_LINE_COLUMNS)
+    return int(flagged.sum()), int((result.recommended_qty > 0).sum())
+
+
+async def get_run(run_id):
     async with db.pool.acquire() as conn:
-        rows = await conn.fetch("SELECT store_id, sku, 10 as recommended_qty FROM inventory WHERE quantity < 5")
+        row = await conn.fetchrow(
+            """
+            SELECT run_id, status, params, store_count, stores_done, position_count,
+                   recommended_count, timings, error, created_at, updated_at, completed_at
+            FROM reorder_run
+            WHERE run_id = $1
+            """,
+            run_id,
+        )
+        return dict(row) if row else None
+
+
+@cached("reorder_run")
+async def get_reorder_recommendations():
+    """Recommendations from the latest completed reorder run."""
+    async with db.acquire_read() as conn:
+        rows = await conn.fetch(
+            """
+            SELECT store_id, sku, recommended_qty
+            FROM reorder_run_line
+            WHERE run_id = (
+                SELECT run_id FROM reorder_run
+                WHERE status = 'completed'
+                ORDER BY run_id DESC
+                LIMIT 1
+            )
+              AND recommended_qty > 0
+            ORDER BY store_id, sku
+            """
+        )
         return [dict(row) for row in rows]
@@ -0,0 +1,102 @@
+"""Incremental maintenance of the sales_velocity feature table."""
+from ..core.database import db
+
+WINDOWS = (7, 28, 91)
+VELOCITY_COLUMNS = (
+    "units_7d", "units_28d", "units_91d",
+    "revenue_7d", "revenue_28d", "revenue_91d",
+    "dow_units_91d", "last_sale_date",
+)
+
+
+def _signed_sums():
+    units = [
+        f"$2::int * COALESCE(SUM(s.quantity) FILTER (WHERE s.sale_date > $1::date - {days}), 0)"
+        for days in WINDOWS
+    ]
+    revenue = [
+        f"$2::int * COALESCE(SUM(s.quantity * s.price) FILTER (WHERE s.sale_date > $1::date - {days}), 0)"
+        for days in WINDOWS
+    ]
+    dow = ",\n                     ".join(
+        f"$2::int * COALESCE(SUM(s.quantity) FILTER "
+        f"(WHERE s.sale_date > $1::date - 91 AND EXTRACT(ISODOW FROM s.sale_date) = {day}), 0)"
+        for day in range(1, 8)
+    )
+    return ",\n               ".join([*units, *revenue, f"ARRAY[{dow}]::bigint[]", "MAX(s.sale_date)"])
+
+
+def _delta_query(staging):
+    sums = ", ".join(f"{c} = v.{c} + EXCLUDED.{c}" for c in VELOCITY_COLUMNS[:6])
+    return f"""
+        WITH touched AS (
+            SELECT DISTINCT store_id, sku, sale_date FROM {staging}
+        )
+        INSERT INTO sales_velocity AS v (store_id, sku, {", ".join(VELOCITY_COLUMNS)})
+        SELECT s.store_id, s.sku,
+               {_signed_sums()}
+        FROM sales s
+        JOIN touched t ON t.store_id = s.store_id AND t.sku = s.sku AND t.sale_date = s.sale_date
+        WHERE s.sale_date <= $1::date
+        GROUP BY s.store_id, s.sku
+        ON CONFLICT (store_id, sku) DO UPDATE SET
+            {sums},
+            dow_units_91d = ARRAY(
+                SELECT a + b FROM unnest(v.dow_units_91d, EXCLUDED.dow_units_91d) AS pair(a, b)
+            ),
+            last_sale_date = GREATEST(v.last_sale_date, EXCLUDED.last_sale_date),
+            updated_at = NOW()
+    """
+
+
+async def advance(conn, staging=None):
+    """Move the window end to today (or the batch's latest sale_date) and return it."""
+    if staging is None:
+        return await conn.fetchval("SELECT advance_sales_velocity(CURRENT_DATE)")
+    return await conn.fetchval(
+        f"SELECT advance_sales_velocity(GREATEST(CURRENT_DATE, (SELECT MAX(sale_date) FROM {staging})))"
+    )
+
+
+async def apply_staged(conn, staging, as_of, sign):
+    """Add (sign=1) or subtract (sign=-1) the sales rows matching the staged keys."""
+    await conn.execute(_delta_query(staging), as_of, sign)
+
+
+async def get_as_of(conn):
+    return await conn.fetchval("SELECT as_of FROM sales_velocity_state")
+
+
+async def verify(limit=20):
+    """Recompute velocity from raw sales and diff it against the maintained table.
+
+    Returns (as_of, mismatch_count, first `limit` mismatches as dicts).
+    """
+    expected = ", ".join(f"e.{c}" for c in VELOCITY_COLUMNS)
+    actual = ", ".join(f"v.{c}" for c in VELOCITY_COLUMNS)
+    async with db.pool.acquire() as conn:
+        async with conn.transaction(isolation="repeatable_read", readonly=True):
+            as_of = await get_as_of(conn)
+            if as_of is None:
+                return None, 0, []
+            rows = await conn.fetch(
+                f"""
+                SELECT COALESCE(e.store_id, v.store_id) AS store_id,
+                       COALESCE(e.sku, v.sku) AS sku,
+                       to_jsonb(e) - 'store_id' - 'sku' AS expected,
+                       to_jsonb(v) - 'store_id' - 'sku' - 'updated_at' AS actual
+                FROM compute_sales_velocity($1) e
+                FULL JOIN sales_velocity v ON v.store_id = e.store_id AND v.sku = e.sku
+                WHERE ({expected}) IS DISTINCT FROM ({actual})
+                ORDER BY 1, 2
+                """,
+                as_of,
+            )
+    return as_of, len(rows), [dict(row) for row in rows[:limit]]
+
+
+async def rebuild():
+    """Recompute the whole table as of today; returns the number of rows written."""
+    async with db.pool.acquire() as conn:
+        async with conn.transaction():
+            return await conn.fetchval("SELECT rebuild_sales_velocity(CURRENT_DATE)")
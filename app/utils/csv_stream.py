@@ -0,0 +1,99 @@
+import codecs
+import csv
+import zlib
+
+GZIP_MAGIC = b"\x1f\x8b"
+
+
+class CsvFormatError(ValueError):
+    def __init__(self, line: int, message: str):
+        super().__init__(f"line {line}: {message}")
+        self.line = line
+
+
+async def _decompressed(chunks):
+    """Pass chunks through, gunzipping them if the stream starts with the gzip magic."""
+    inflater = None
+    head = b""
+    async for chunk in chunks:
+        if head is not None:
+            head += chunk
+            if len(head) < len(GZIP_MAGIC):
+                continue
+            chunk, head = head, None
+            if chunk.startswith(GZIP_MAGIC):
+                inflater = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        if not chunk:
+            continue
+        if inflater is None:
+            yield chunk
+        else:
+            data = inflater.decompress(chunk)
+            if data:
+                yield data
+    if head:
+        yield head
+    if inflater is not None:
+        tail = inflater.flush()
+        if tail:
+            yield tail
+
+
+async def _records(chunks):
+    """Yield complete CSV records as text, holding back partial lines between chunks.
+
+    A record is only released once its double quotes balance, so quoted fields
+    that contain newlines survive chunk boundaries.
+    """
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    pending = ""
+    async for chunk in _decompressed(chunks):
+        pending += decoder.decode(chunk)
+        start = scan = 0
+        while True:
+            end = pending.find("\n", scan)
+            if end == -1:
+                break
+            candidate = pending[start:end + 1]
+            if candidate.count('"') % 2 == 0:
+                yield candidate
+                start = end + 1
+            scan = end + 1
+        pending = pending[start:]
+    pending += decoder.decode(b"", final=True)
+    if pending.strip():
+        yield pending
+
+
+async def iter_csv_rows(chunks):
+    """Parse an async stream of (optionally gzipped) CSV bytes into dicts keyed by header.
+
+    Yields (line_number, row) pairs without ever holding more than one
+    chunk of the body in memory.
+    """
+    header = None
+    line = 0
+    async for record in _records(chunks):
+        line += 1
+        values = next(csv.reader([record]), [])
+        if not values or all(not v.strip() for v in values):
+            continue
+        if header is None:
+            header = [h.strip() for h in values]
+            continue
+        if len(values) != len(header):
+            raise CsvFormatError(line, f"expected {len(header)} fields, got {len(values)}")
+        yield line, dict(zip(header, values))
+    if header is None:
+        raise CsvFormatError(line, "missing header row")
+
+
+async def iter_batches(rows, size: int):
+    batch = []
+    async for row in rows:
+        batch.append(row)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
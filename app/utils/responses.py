@@ -0,0 +1,137 @@
+"""List responses encoded straight from service rows, with format and compression negotiation."""
+import csv
+import gzip
+import io
+import json
+from datetime import date, datetime
+from decimal import Decimal
+
+import orjson
+from fastapi import HTTPException, status
+from fastapi.responses import Response
+
+from ..core.config import settings
+
+try:
+    import brotli
+except ImportError:  # br is only offered when brotli is installed
+    brotli = None
+
+try:
+    import msgpack
+except ImportError:  # MessagePack is only offered when msgpack is installed
+    msgpack = None
+
+FORMAT_PATTERN = "^(json|csv|msgpack)$"
+# For endpoints that can also stream newline-delimited JSON
+STREAM_FORMAT_PATTERN = "^(json|ndjson|csv|msgpack)$"
+MEDIA_TYPES = {
+    "json": "application/json",
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv; charset=utf-8",
+    "msgpack": "application/msgpack",
+}
+ACCEPTED_MEDIA_TYPES = {
+    "application/json": "json",
+    "text/csv": "csv",
+    "application/msgpack": "msgpack",
+    "application/x-msgpack": "msgpack",
+}
+GZIP_LEVEL = 5
+BROTLI_QUALITY = 4
+
+
+def _available(fmt):
+    return fmt != "msgpack" or msgpack is not None
+
+
+def _quality(params):
+    for param in params.split(";"):
+        name, _, value = param.strip().partition("=")
+        if name == "q":
+            try:
+                return float(value)
+            except ValueError:
+                return 0.0
+    return 1.0
+
+
+def negotiate(request, format=None):
+    """Pick json, csv or msgpack: an explicit `format` wins, then the best Accept match, then JSON."""
+    if format is not None:
+        if not _available(format):
+            raise HTTPException(status_code=status.HTTP_406_NOT_ACCEPTABLE, detail=f"{format} is not available")
+        return format
+    best, best_quality = "json", 0.0
+    for part in request.headers.get("accept", "").split(","):
+        media_type, _, params = part.partition(";")
+        fmt = ACCEPTED_MEDIA_TYPES.get(media_type.strip().lower())
+        quality = _quality(params)
+        if fmt is not None and _available(fmt) and quality > best_quality:
+            best, best_quality = fmt, quality
+    return best
+
+
+def _json_default(value):
+    if isinstance(value, Decimal):
+        return float(value)
+    raise TypeError(f"cannot serialize {type(value).__name__}")
+
+
+def _msgpack_default(value):
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    raise TypeError(f"cannot serialize {type(value).__name__}")
+
+
+def _csv_value(value):
+    if value is None:
+        return ""
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    if isinstance(value, (list, dict)):
+        return json.dumps(value)
+    return value
+
+
+def encode_rows(rows, fmt, columns):
+    """Encode a list of row dicts; `columns` orders the CSV header (and covers an empty result)."""
+    if fmt == "csv":
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(columns)
+        writer.writerows([_csv_value(row.get(c)) for c in columns] for row in rows)
+        return buffer.getvalue().encode()
+    if fmt == "ndjson":
+        return b"".join(orjson.dumps(row, default=_json_default) + b"\n" for row in rows)
+    if fmt == "msgpack":
+        return msgpack.packb(rows, default=_msgpack_default)
+    return orjson.dumps(rows, default=_json_default)
+
+
+def _compress(request, body):
+    """Return (body, content-encoding or None)."""
+    if len(body) < settings.response_compress_min_bytes:
+        return body, None
+    accepted = {
+        coding.partition(";")[0].strip().lower()
+        for coding in request.headers.get("accept-encoding", "").split(",")
+        if _quality(coding.partition(";")[2]) > 0
+    }
+    if brotli is not None and "br" in accepted:
+        return brotli.compress(body, quality=BROTLI_QUALITY), "br"
+    if "gzip" in accepted:
+        return gzip.compress(body, compresslevel=GZIP_LEVEL), "gzip"
+    return body, None
+
+
+def rows_response(request, rows, model, format=None, headers=None):
+    """Negotiated, optionally compressed response for a list of `model` rows."""
+    fmt = negotiate(request, format)
+    body, encoding = _compress(request, encode_rows(rows, fmt, list(model.__fields__)))
+    headers = {**(headers or {}), "Vary": "Accept, Accept-Encoding"}
+    if encoding is not None:
+        headers["Content-Encoding"] = encoding
+    return Response(body, media_type=MEDIA_TYPES[fmt], headers=headers)
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Benchmark list-response serialization: the old Pydantic path against
+encoding service rows directly (app.utils.responses).
+
+The old path builds a model per row, lets FastAPI validate the list
+against response_model again, runs jsonable_encoder and dumps the result
+with the standard json module. The new path encodes the row dicts as they
+come from the service, as JSON, CSV and MessagePack.
+
+Usage: python -m benchmarks.bench_responses [--rows 100000] [--model velocity]
+"""
+import argparse
+import json
+import random
+import time
+from datetime import date, timedelta
+from decimal import Decimal
+from typing import List
+
+from fastapi.encoders import jsonable_encoder
+from pydantic import parse_obj_as
+
+from app.models.schemas import InventoryStatus, SalesVelocity
+from app.utils import responses
+
+
+def inventory_rows(n: int, rng: random.Random):
+    return [
+        {"store_id": rng.randint(1, 20), "sku": f"SKU{i:06d}", "quantity": rng.randint(0, 500)}
+        for i in range(n)
+    ]
+
+
+def velocity_rows(n: int, rng: random.Random):
+    as_of = date.today() - timedelta(days=1)
+    rows = []
+    for i in range(n):
+        units = [rng.randint(0, 40) for _ in range(7)]
+        rows.append({
+            "store_id": rng.randint(1, 20),
+            "sku": f"SKU{i:06d}",
+            "as_of": as_of,
+            "units_7d": rng.randint(0, 70),
+            "units_28d": rng.randint(0, 280),
+            "units_91d": sum(units),
+            "revenue_7d": Decimal(f"{rng.uniform(0, 2000):.2f}"),
+            "revenue_28d": Decimal(f"{rng.uniform(0, 8000):.2f}"),
+            "revenue_91d": Decimal(f"{rng.uniform(0, 26000):.2f}"),
+            "weekly_units": Decimal(rng.randint(0, 280)) / Decimal("4.0"),
+            "dow_units_91d": units,
+            "last_sale_date": as_of - timedelta(days=rng.randint(0, 30)),
+        })
+    return rows
+
+
+MODELS = {
+    "inventory": (InventoryStatus, inventory_rows),
+    "velocity": (SalesVelocity, velocity_rows),
+}
+
+
+def pydantic_path(model, rows):
+    models = [model(**row) for row in rows]
+    validated = parse_obj_as(List[model], models)
+    return json.dumps(jsonable_encoder(validated)).encode()
+
+
+def timed(fn, *args):
+    started = time.perf_counter()
+    body = fn(*args)
+    return time.perf_counter() - started, len(body)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--model", choices=sorted(MODELS), default="velocity")
+    args = parser.parse_args()
+
+    model, make_rows = MODELS[args.model]
+    rows = make_rows(args.rows, random.Random(42))
+    columns = list(model.__fields__)
+
+    results = [("pydantic + json", *timed(pydantic_path, model, rows))]
+    formats = ["json", "csv"] + (["msgpack"] if responses.msgpack is not None else [])
+    for fmt in formats:
+        results.append((f"direct {fmt}", *timed(responses.encode_rows, rows, fmt, columns)))
+
+    baseline = results[0][1]
+    print(f"rows={args.rows} model={model.__name__}")
+    for name, seconds, size in results:
+        print(f"{name:16} {seconds:8.3f}s  {seconds / args.rows * 1e6:8.2f} us/row  "
+              f"{size / 1e6:7.1f} MB  {baseline / seconds:6.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+Benchmark the columnar batch validator against per-row Pydantic validation.
+
+Usage: python -m benchmarks.bench_validation [--rows 200000] [--bad-ratio 0.01]
+"""
+import argparse
+import random
+import time
+from datetime import date, timedelta
+
+import pandas as pd
+
+from app.models.schemas import SalesRecord
+from app.models.validation import QUARANTINE, validate_batch
+
+
+def make_rows(n: int, bad_ratio: float, seed: int = 42):
+    rng = random.Random(seed)
+    start = date.today() - timedelta(days=365)
+    rows = []
+    for _ in range(n):
+        row = {
+            "store_id": str(rng.randint(1, 20)),
+            "sku": f"SKU{rng.randint(1, 50000):06d}",
+            "quantity": str(rng.randint(1, 40)),
+            "price": f"{rng.uniform(1, 200):.2f}",
+            "sale_date": (start + timedelta(days=rng.randint(0, 364))).isoformat(),
+        }
+        if rng.random() < bad_ratio:
+            row[rng.choice(list(row))] = rng.choice(["", "-1", "bad sku!", "2999-01-01"])
+        rows.append(row)
+    return rows
+
+
+def per_row(rows):
+    valid, errors = [], []
+    for i, row in enumerate(rows):
+        try:
+            valid.append(SalesRecord(**row))
+        except ValueError as exc:
+            errors.append((i, str(exc)))
+    return len(valid), len(errors)
+
+
+def columnar(rows):
+    result = validate_batch(pd.DataFrame(rows, dtype=object), SalesRecord, QUARANTINE)
+    return len(result.valid), result.errors["row"].nunique()
+
+
+def timed(fn, rows):
+    started = time.perf_counter()
+    outcome = fn(rows)
+    return time.perf_counter() - started, outcome
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--bad-ratio", type=float, default=0.01)
+    args = parser.parse_args()
+
+    rows = make_rows(args.rows, args.bad_ratio)
+    row_secs, row_outcome = timed(per_row, rows)
+    col_secs, col_outcome = timed(columnar, rows)
+    if row_outcome != col_outcome:
+        raise SystemExit(f"outcome mismatch: per-row {row_outcome} vs columnar {col_outcome}")
+
+    print(f"rows={args.rows} valid={row_outcome[0]} rejected={row_outcome[1]}")
+    print(f"per-row pydantic: {row_secs:8.3f}s  {args.rows / row_secs:12,.0f} rows/s")
+    print(f"columnar:         {col_secs:8.3f}s  {args.rows / col_secs:12,.0f} rows/s")
+    print(f"speedup:          {row_secs / col_secs:8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""
+Compare two benchmark result files from benchmarks.run.
+
+Timed results are compared on p50 where there is one (dashboard
+endpoints), otherwise on total seconds. Exits 1 if any result got slower
+by more than --threshold percent.
+
+Usage: python -m benchmarks.compare baseline.json candidate.json [--threshold 10]
+"""
+import argparse
+import json
+
+
+def _metric(result):
+    return result.get("p50", result["seconds"])
+
+
+def compare(baseline, candidate, threshold):
+    """Return (rows, regressions); rows are (name, before, after, change %) with None for missing sides."""
+    rows, regressions = [], []
+    names = list(baseline["results"]) + [n for n in candidate["results"] if n not in baseline["results"]]
+    for name in names:
+        before = baseline["results"].get(name)
+        after = candidate["results"].get(name)
+        before = _metric(before) if before else None
+        after = _metric(after) if after else None
+        change = (after - before) / before * 100 if before and after is not None else None
+        rows.append((name, before, after, change))
+        if change is not None and change > threshold:
+            regressions.append(name)
+    return rows, regressions
+
+
+def _seconds(value):
+    return f"{value:10.4f}" if value is not None else f"{'-':>10}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare two benchmark result files")
+    parser.add_argument("baseline")
+    parser.add_argument("candidate")
+    parser.add_argument("--threshold", type=float, default=10.0, help="Percent slowdown counted as a regression")
+    args = parser.parse_args()
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.candidate) as f:
+        candidate = json.load(f)
+    if baseline["meta"]["params"] != candidate["meta"]["params"]:
+        print("warning: runs used different parameters; timings are not directly comparable")
+
+    print(f"baseline {baseline['meta']['commit']}  candidate {candidate['meta']['commit']}")
+    rows, regressions = compare(baseline, candidate, args.threshold)
+    for name, before, after, change in rows:
+        flag = "  REGRESSION" if name in regressions else ""
+        change = f"{change:+8.1f}%" if change is not None else f"{'-':>9}"
+        print(f"{name:75} {_seconds(before)} {_seconds(after)} {change}{flag}")
+    if regressions:
+        raise SystemExit(f"{len(regressions)} result(s) slower by more than {args.threshold:g}%")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,250 @@
+#!/usr/bin/env python3
+"""
+End-to-end benchmark against a local Postgres with synthetic data.
+
+Seeds reference rows for the synthetic stores and SKUs, then times
+insert_sales / insert_inventory in ingestion-sized batches, the budget
+workbook import, the dashboard endpoints (cold and warm cache) and a full
+reorder run. Results go to a JSON file; compare two of them with
+benchmarks.compare.
+
+Point DATABASE_URL at a scratch database that has the pipeline schema
+loaded: the run deletes and rewrites the synthetic stores' sales,
+inventory and policies, and the budget import writes the workbook store
+names. It refuses to run with ENV=prod.
+
+Usage: python -m benchmarks.run [--stores 10] [--skus 2000] [--days 91] [--output bench.json]
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import statistics
+import subprocess
+import tempfile
+import time
+from datetime import datetime, timezone
+
+import orjson
+
+from app.core.cache import cache
+from app.core.config import settings
+from app.core.database import db
+from app.main import app
+from app.services import ingestion_service, reorder_runs, reorder_service
+
+from benchmarks.synthetic import generate, write_budget_workbook
+
+REFERENCE_TABLES = (
+    ("store", ("store_id", "name"), "stores"),
+    ("product", ("sku", "product_name", "units_per_case"), "products"),
+    ("reorderrule", ("rule_id", "rule_name", "logic_reference"), "rules"),
+    ("reorderpolicy", ("store_id", "sku", "min_qty", "reorder_multiplier", "assigned_rule_id", "do_not_reorder"),
+     "policy"),
+)
+DASHBOARD_PATHS = (
+    "/api/v1/dashboard/sales-summary",
+    "/api/v1/dashboard/inventory-status?store_id={store}&limit=1000",
+    "/api/v1/dashboard/inventory-status?store_id={store}&format=ndjson",
+    "/api/v1/dashboard/sales-velocity?store_id={store}&limit=1000",
+    "/api/v1/dashboard/sales-budget?grain=week",
+    "/api/v1/reorder/recommendations",
+)
+
+
+def _records(frame):
+    # Decoded JSON objects, as the API hands them to the service
+    return orjson.loads(orjson.dumps(frame.to_dict("records")))
+
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def _seed(conn, dataset):
+    store_ids = dataset.stores["store_id"].tolist()
+    async with conn.transaction():
+        for table in ("sales", "inventory", "reorderpolicy", "sales_velocity"):
+            await conn.execute(f"DELETE FROM {table} WHERE store_id = ANY($1::int[])", store_ids)
+        for table, columns, attr in REFERENCE_TABLES:
+            frame = getattr(dataset, attr)[list(columns)]
+            await conn.execute(
+                f"CREATE TEMP TABLE bench_{table} ON COMMIT DROP AS "
+                f"SELECT {', '.join(columns)} FROM {table} WITH NO DATA"
+            )
+            # to_dict gives Python scalars, which asyncpg's encoders require
+            await conn.copy_records_to_table(
+                f"bench_{table}", records=[tuple(row.values()) for row in frame.to_dict("records")],
+                columns=columns,
+            )
+            await conn.execute(
+                f"INSERT INTO {table} ({', '.join(columns)}) SELECT * FROM bench_{table} ON CONFLICT DO NOTHING"
+            )
+
+
+async def _time_batches(insert, records, batch_size):
+    started = time.perf_counter()
+    for i in range(0, len(records), batch_size):
+        await insert(records[i:i + batch_size])
+    seconds = time.perf_counter() - started
+    return {"seconds": seconds, "rows": len(records), "rows_per_second": len(records) / seconds}
+
+
+async def _asgi_get(path):
+    """Issue one GET straight into the ASGI app; returns (status, body bytes)."""
+    raw_path, _, query = path.partition("?")
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+        "scheme": "http", "path": raw_path, "raw_path": raw_path.encode(), "query_string": query.encode(),
+        "root_path": "", "headers": [(b"host", b"benchmark")], "client": ("127.0.0.1", 0),
+        "server": ("benchmark", 80),
+    }
+    status, body = [None], []
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            status[0] = message["status"]
+        elif message["type"] == "http.response.body":
+            body.append(message.get("body", b""))
+
+    await app(scope, receive, send)
+    return status[0], b"".join(body)
+
+
+def _summary(samples):
+    ordered = sorted(samples)
+    return {
+        "seconds": statistics.fmean(ordered),
+        "p50": statistics.median(ordered),
+        "p95": ordered[min(len(ordered) - 1, round(0.95 * (len(ordered) - 1)))],
+        "min": ordered[0],
+        "samples": len(ordered),
+    }
+
+
+async def _time_endpoint(path, repeat):
+    cold, warm = [], []
+    size = 0
+    for _ in range(repeat):
+        for samples, clear in ((cold, True), (warm, False)):
+            if clear:
+                cache.clear()
+            started = time.perf_counter()
+            status, body = await _asgi_get(path)
+            samples.append(time.perf_counter() - started)
+            if status != 200:
+                raise RuntimeError(f"GET {path} returned {status}: {body[:200]!r}")
+            size = len(body)
+    return {"cold": {**_summary(cold), "bytes": size}, "warm": {**_summary(warm), "bytes": size}}
+
+
+async def _time_reorder_run():
+    started = time.perf_counter()
+    run = await reorder_runs.start_run()
+    while run["status"] == "running":
+        await asyncio.sleep(0.05)
+        run = await reorder_service.get_run(run["run_id"])
+    if run["status"] != "completed":
+        raise RuntimeError(f"reorder run {run['run_id']} {run['status']}: {run.get('error')}")
+    timings = json.loads(run["timings"]) if isinstance(run["timings"], str) else run["timings"]
+    return {
+        "seconds": time.perf_counter() - started,
+        "rows": run["position_count"],
+        "rows_per_second": run["position_count"] / timings["wall_seconds"],
+        "timings": timings,
+    }
+
+
+def _time_budget_import(dataset, seed):
+    # Imported here: the importer configures file logging at import time
+    from import_sales_budget_data import SalesBudgetImporter
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = write_budget_workbook(os.path.join(tmp, "budget.xlsx"), dataset, seed)
+        started = time.perf_counter()
+        if not SalesBudgetImporter(path, settings.database_url).run_import():
+            raise RuntimeError("budget import failed, see sales_budget_import.log")
+        return {"seconds": time.perf_counter() - started}
+
+
+async def run(args):
+    dataset = generate(args.stores, args.skus, args.days, args.seed, args.store_offset)
+    results = {}
+    await db.connect()
+    try:
+        async with db.pool.acquire() as conn:
+            await _seed(conn, dataset)
+        cache.clear()
+
+        sales = _records(dataset.sales)
+        inventory = _records(dataset.inventory)
+        results["ingest.sales"] = await _time_batches(ingestion_service.insert_sales, sales, args.batch_size)
+        results["ingest.inventory"] = await _time_batches(
+            ingestion_service.insert_inventory, inventory, args.batch_size,
+        )
+        results["import.budget_workbook"] = await asyncio.to_thread(_time_budget_import, dataset, args.seed)
+        results["reorder.run"] = await _time_reorder_run()
+
+        store = int(dataset.stores["store_id"].iloc[0])
+        for path in DASHBOARD_PATHS:
+            path = path.format(store=store)
+            timed = await _time_endpoint(path, args.repeat)
+            for phase, result in timed.items():
+                results[f"GET {path} [{phase}]"] = result
+    finally:
+        await reorder_runs.shutdown()
+        await db.disconnect()
+
+    return {
+        "meta": {
+            "commit": _git_commit(),
+            "started_at": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "cpus": os.cpu_count(),
+            "params": vars(args),
+            "rows": {
+                name: len(getattr(dataset, name)) for name in ("stores", "products", "sales", "inventory", "policy")
+            },
+        },
+        "results": results,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the end-to-end benchmark suite")
+    parser.add_argument("--stores", type=int, default=10)
+    parser.add_argument("--skus", type=int, default=2000)
+    parser.add_argument("--days", type=int, default=91)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--store-offset", type=int, default=900, help="First synthetic store_id")
+    parser.add_argument("--batch-size", type=int, default=settings.ingest_batch_size)
+    parser.add_argument("--repeat", type=int, default=5, help="Requests per dashboard endpoint and cache state")
+    parser.add_argument("--output", default="bench-results.json")
+    args = parser.parse_args()
+
+    if settings.env == "prod":
+        raise SystemExit("refusing to run benchmarks with ENV=prod")
+    report = asyncio.run(run(args))
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2, default=str)
+
+    for name, result in report["results"].items():
+        line = f"{name:75} {result.get('p50', result['seconds']):9.4f}s"
+        if "rows_per_second" in result:
+            line += f"  {result['rows_per_second']:12,.0f} rows/s"
+        print(line)
+    print(f"wrote {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,173 @@
+"""
+Seeded synthetic retail data for the benchmarks.
+
+Sales for N stores x M SKUs x D days are Poisson draws whose rate is the
+product of a Zipf-like SKU popularity, a log-normal store size, a
+day-of-week profile and an annual cycle. So a few SKUs and stores carry
+most of the volume and Fridays/Saturdays are busiest, as in the real
+data. The same seed always gives the same frames.
+
+    python -m benchmarks.synthetic --stores 10 --skus 2000 --days 91 --workbook /tmp/budget.xlsx
+"""
+import argparse
+from dataclasses import dataclass
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+
+# Sunday first, matching the workbook's day numbers
+DAY_NAMES = ["Sunday", "Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday"]
+DOW_PROFILE = np.array([0.85, 0.70, 0.75, 0.85, 1.05, 1.45, 1.35])
+# Excel headers the budget importer recognises
+BUDGET_STORES = [
+    "Colwood", "Quadra", "Crown", "Uptown", "Langford", "Eagle Creek", "Nanoose",
+    "Parksville", "Caddy Bay", "Port A", "Royal B", "Allandale", "Bear",
+]
+BUDGET_SHEET = "FCST FY26"
+BUDGET_FIRST_STORE_COLUMN = 6
+BUDGET_DATA_START_ROW = 3
+RULES = [(1, "Standard", "standard"), (2, "Limited time offer", "lto"), (3, "Strike list", "strike")]
+
+
+@dataclass
+class Dataset:
+    stores: pd.DataFrame
+    products: pd.DataFrame
+    sales: pd.DataFrame
+    inventory: pd.DataFrame
+    policy: pd.DataFrame
+    rules: pd.DataFrame
+
+
+def generate(stores=10, skus=2000, days=91, seed=42, store_offset=900, end=None):
+    """Build a Dataset; sales cover the `days` days ending the day before `end` (default today)."""
+    rng = np.random.default_rng(seed)
+    end = end or date.today()
+    store_ids = np.arange(store_offset, store_offset + stores, dtype=np.int64)
+    sku_codes = np.array([f"BENCH{i:06d}" for i in range(skus)], dtype=object)
+
+    # Zipf-like popularity over a shuffled SKU order, in units per average day
+    popularity = 1.0 / np.arange(1, skus + 1) ** 1.1
+    popularity = rng.permutation(popularity / popularity.mean() * 0.6)
+    store_scale = rng.lognormal(0.0, 0.5, stores)
+    unit_price = np.round(rng.lognormal(2.8, 0.7, skus), 2).clip(0.99, None)
+    units_per_case = rng.choice([1, 6, 12, 24], skus, p=[0.2, 0.4, 0.3, 0.1])
+
+    dates = [end - timedelta(days=days - i) for i in range(days)]
+    frames = []
+    for day in dates:
+        season = 1.0 + 0.25 * np.sin(2 * np.pi * (day.timetuple().tm_yday - 80) / 365.25)
+        rate = np.outer(store_scale, popularity) * DOW_PROFILE[(day.weekday() + 1) % 7] * season
+        quantity = rng.poisson(rate)
+        store_idx, sku_idx = np.nonzero(quantity)
+        price = unit_price[sku_idx] * rng.choice([1.0, 1.0, 1.0, 0.9], len(sku_idx))
+        frames.append(pd.DataFrame({
+            "store_id": store_ids[store_idx],
+            "sku": sku_codes[sku_idx],
+            "quantity": quantity[store_idx, sku_idx],
+            "price": np.round(price, 2),
+            "sale_date": day,
+        }))
+    sales = pd.concat(frames, ignore_index=True)
+
+    weekly = np.outer(store_scale, popularity) * 7
+    on_hand = np.maximum(1, np.round(weekly * rng.uniform(0.2, 4.0, weekly.shape))).astype(np.int64)
+    inventory = pd.DataFrame({
+        "store_id": np.repeat(store_ids, skus),
+        "sku": np.tile(sku_codes, stores),
+        "quantity": on_hand.ravel(),
+        "last_updated": end - timedelta(days=1),
+    })
+
+    # Roughly a third of positions carry a policy, a few flagged or on an exception rule
+    has_policy = rng.random(stores * skus) < 0.35
+    count = int(has_policy.sum())
+    policy = pd.DataFrame({
+        "store_id": inventory["store_id"].to_numpy()[has_policy],
+        "sku": inventory["sku"].to_numpy()[has_policy],
+        "min_qty": rng.integers(0, 12, count),
+        "reorder_multiplier": rng.choice([1.0, 1.0, 1.25, 1.5], count),
+        "assigned_rule_id": rng.choice([1, 2, 3], count, p=[0.94, 0.04, 0.02]),
+        "do_not_reorder": rng.random(count) < 0.02,
+    })
+
+    return Dataset(
+        stores=pd.DataFrame({"store_id": store_ids, "name": [f"Benchmark store {s}" for s in store_ids]}),
+        products=pd.DataFrame({
+            "sku": sku_codes,
+            "product_name": [f"Benchmark product {s}" for s in sku_codes],
+            "units_per_case": units_per_case,
+        }),
+        sales=sales,
+        inventory=inventory,
+        policy=policy,
+        rules=pd.DataFrame(RULES, columns=["rule_id", "rule_name", "logic_reference"]),
+    )
+
+
+def budget_sheet(dataset, seed=42):
+    """The 'FCST FY26' sheet as the importer reads it (header=None).
+
+    Row 0 holds store names over their FY25 actual column, row 1 the
+    variance adjustment, row 2 sub-headers; data starts on row 3 with day
+    number, day name, FY25 date, FY26 date, FY26 day number and day name,
+    then an actual and a forecast column per store. Synthetic store i feeds
+    the i-th workbook store, so at most len(BUDGET_STORES) are written.
+    """
+    rng = np.random.default_rng(seed + 1)
+    names = BUDGET_STORES[:len(dataset.stores)]
+    sales = dataset.sales.assign(amount=dataset.sales["quantity"] * dataset.sales["price"])
+    daily = sales.pivot_table(index="sale_date", columns="store_id", values="amount", aggfunc="sum", fill_value=0.0)
+    daily = daily.reindex(columns=dataset.stores["store_id"][:len(names)], fill_value=0.0)
+
+    width = BUDGET_FIRST_STORE_COLUMN + 2 * len(names)
+    header = [[None] * width for _ in range(BUDGET_DATA_START_ROW)]
+    header[2][:BUDGET_FIRST_STORE_COLUMN] = ["Day", "Day Name", "FY25 Date", "FY26 Date", "Day", "Day Name"]
+    adjustments = np.round(rng.uniform(-0.08, 0.08, len(names)), 3)
+    for i, name in enumerate(names):
+        column = BUDGET_FIRST_STORE_COLUMN + 2 * i
+        header[0][column] = name
+        header[1][column] = float(adjustments[i])
+        header[2][column:column + 2] = ["FY25 Actual", "FY26 Budget"]
+
+    rows = []
+    growth = rng.normal(1.04, 0.03, len(names))
+    for sale_date, actuals in daily.iterrows():
+        # 364 days later falls on the same weekday
+        forecast_date = sale_date + timedelta(days=364)
+        day_number = (sale_date.weekday() + 1) % 7 + 1
+        row = [day_number, DAY_NAMES[day_number - 1], pd.Timestamp(sale_date), pd.Timestamp(forecast_date),
+               day_number, DAY_NAMES[day_number - 1]]
+        forecasts = actuals.to_numpy() * growth * rng.normal(1.0, 0.05, len(names))
+        for actual, forecast in zip(actuals.to_numpy(), forecasts):
+            row.extend([round(float(actual), 2), round(float(forecast), 2)])
+        rows.append(row)
+    return pd.DataFrame(header + rows)
+
+
+def write_budget_workbook(path, dataset, seed=42):
+    budget_sheet(dataset, seed).to_excel(path, sheet_name=BUDGET_SHEET, header=False, index=False)
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate synthetic benchmark data")
+    parser.add_argument("--stores", type=int, default=10)
+    parser.add_argument("--skus", type=int, default=2000)
+    parser.add_argument("--days", type=int, default=91)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--workbook", help="Also write a budget workbook to this path")
+    args = parser.parse_args()
+
+    dataset = generate(args.stores, args.skus, args.days, args.seed)
+    for name in ("stores", "products", "sales", "inventory", "policy"):
+        print(f"{name:10} {len(getattr(dataset, name)):>12,} rows")
+    by_dow = dataset.sales.groupby(pd.to_datetime(dataset.sales["sale_date"]).dt.day_name())["quantity"].sum()
+    print("units by weekday:", by_dow.reindex(DAY_NAMES).to_dict())
+    if args.workbook:
+        print("workbook:", write_budget_workbook(args.workbook, dataset, args.seed))
+
+
+if __name__ == "__main__":
+    main()
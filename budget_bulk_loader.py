@@ -0,0 +1,268 @@
+#!/usr/bin/env python3
+"""
+Set-based bulk loader for historical_daily_sales and budget_forecasts
+Streams records into a temp staging table with COPY and merges each batch
+with a single INSERT ... ON CONFLICT, reporting rejected rows by row number
+Rows are keyed on store_key (store_name_mapping.id), resolved from store_name
+once per run by StoreKeyCache
+Given a checkpoint source, every batch commits together with its offset in
+ingest_checkpoint, so an interrupted load resumes after the last committed
+batch and a completed one is skipped until the caller's run succeeds and
+clears the checkpoints
+"""
+
+import io
+import json
+import logging
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BATCH_SIZE = 50000
+
+# Reject rules mirror the target column types so that no row can fail inside
+# the merge itself; DECIMAL(12,2) holds < 1e10 and DECIMAL(5,4) holds < 10.
+HISTORICAL_TARGET = {
+    'table': 'historical_daily_sales',
+    'staging': 'stage_historical_daily_sales',
+    'columns': ['store_name', 'store_key', 'sale_date', 'day_of_week', 'day_number',
+                'fiscal_year', 'sales_amount', 'data_type'],
+    'staging_types': ['TEXT', 'INTEGER', 'DATE', 'TEXT', 'INTEGER', 'INTEGER', 'NUMERIC', 'TEXT'],
+    'key': ['store_key', 'sale_date', 'fiscal_year', 'data_type'],
+    'updates': ['sales_amount', 'day_of_week', 'day_number'],
+    'reject_rules': [
+        ("store_name IS NULL OR store_name = ''", 'missing store_name'),
+        ('sale_date IS NULL', 'missing sale_date'),
+        ('fiscal_year IS NULL', 'missing fiscal_year'),
+        ('sales_amount IS NULL', 'missing sales_amount'),
+        ('abs(sales_amount) >= 1e10', 'sales_amount out of range for DECIMAL(12,2)'),
+        ("data_type IS NULL OR data_type NOT IN ('actual', 'forecast')", 'invalid data_type'),
+    ],
+}
+
+FORECAST_TARGET = {
+    'table': 'budget_forecasts',
+    'staging': 'stage_budget_forecasts',
+    'columns': ['store_name', 'store_key', 'forecast_date', 'day_of_week', 'day_number',
+                'fiscal_year', 'forecast_amount', 'variance_adjustment', 'forecast_type'],
+    'staging_types': ['TEXT', 'INTEGER', 'DATE', 'TEXT', 'INTEGER', 'INTEGER', 'NUMERIC', 'NUMERIC', 'TEXT'],
+    'key': ['store_key', 'forecast_date', 'fiscal_year', 'forecast_type'],
+    'updates': ['forecast_amount', 'variance_adjustment', 'day_of_week', 'day_number'],
+    'reject_rules': [
+        ("store_name IS NULL OR store_name = ''", 'missing store_name'),
+        ('forecast_date IS NULL', 'missing forecast_date'),
+        ('fiscal_year IS NULL', 'missing fiscal_year'),
+        ('forecast_amount IS NULL', 'missing forecast_amount'),
+        ('abs(forecast_amount) >= 1e10', 'forecast_amount out of range for DECIMAL(12,2)'),
+        ('abs(variance_adjustment) >= 10', 'variance_adjustment out of range for DECIMAL(5,4)'),
+        ("forecast_type IS NULL OR forecast_type NOT IN ('daily', 'weekly', 'monthly', 'annual')",
+         'invalid forecast_type'),
+    ],
+}
+
+
+class LoadResult(NamedTuple):
+    inserted: int
+    updated: int
+    rejected: List[Tuple[int, str]]
+
+
+class StoreKeyCache:
+    """Workbook store name -> store_name_mapping.id, read once and kept for the run"""
+
+    def __init__(self, conn):
+        self.conn = conn
+        self._keys = None
+
+    def resolve(self, names) -> Dict[str, int]:
+        """Return keys for `names`, adding mapping rows for names not seen before"""
+        cursor = self.conn.cursor()
+        try:
+            if self._keys is None:
+                cursor.execute("SELECT excel_store_name, id FROM store_name_mapping")
+                self._keys = dict(cursor.fetchall())
+            missing = sorted({name for name in names if isinstance(name, str) and name} - self._keys.keys())
+            if missing:
+                cursor.execute(
+                    "INSERT INTO store_name_mapping (excel_store_name) SELECT unnest(%s::text[]) "
+                    "ON CONFLICT (excel_store_name) DO UPDATE SET excel_store_name = EXCLUDED.excel_store_name "
+                    "RETURNING excel_store_name, id",
+                    (missing,)
+                )
+                self._keys.update(cursor.fetchall())
+                logger.info(f"Added store mappings for {', '.join(missing)}")
+        finally:
+            cursor.close()
+        return self._keys
+
+
+class BudgetBulkLoader:
+    def __init__(self, conn, batch_size: int = DEFAULT_BATCH_SIZE, store_keys: StoreKeyCache = None):
+        self.conn = conn
+        self.batch_size = batch_size
+        self.store_keys = store_keys or StoreKeyCache(conn)
+
+    def load_historical(self, frame: pd.DataFrame, checkpoint: Optional[str] = None) -> LoadResult:
+        """Merge historical sales records (process_data_rows output) into historical_daily_sales"""
+        return self._load(HISTORICAL_TARGET, frame, checkpoint)
+
+    def load_forecasts(self, frame: pd.DataFrame, checkpoint: Optional[str] = None) -> LoadResult:
+        """Merge forecast records (process_data_rows output) into budget_forecasts"""
+        return self._load(FORECAST_TARGET, frame, checkpoint)
+
+    def _load(self, target: Dict, frame: pd.DataFrame, checkpoint: Optional[str] = None) -> LoadResult:
+        """Load `frame` in batches
+
+        Without a checkpoint everything runs inside the caller's transaction
+        and the caller commits. With one, each batch is committed here along
+        with its checkpoint row; rejected rows of earlier runs are only
+        counted, not listed again.
+        """
+        inserted = updated = 0
+        rejected = []
+        start = 0
+        if checkpoint is not None:
+            state = self._checkpoint_state(target, checkpoint)
+            if state is not None:
+                start, counts, status = state
+                if status == 'completed':
+                    logger.info(f"{target['table']}: {checkpoint} already loaded, skipping")
+                    return LoadResult(counts['inserted'], counts['updated'], [])
+                inserted, updated = counts['inserted'], counts['updated']
+                logger.info(f"{target['table']}: resuming {checkpoint} at row {start} of {len(frame)}")
+        keys = self.store_keys.resolve(frame['store_name'].unique())
+        frame = frame.assign(store_key=frame['store_name'].map(keys).astype('Int64'))
+        cursor = self.conn.cursor()
+        try:
+            self._create_staging(cursor, target)
+            for start in range(start, len(frame), self.batch_size):
+                batch = frame.iloc[start:start + self.batch_size]
+                batch_inserted, batch_updated, batch_rejected = self._merge_batch(cursor, target, batch)
+                inserted += batch_inserted
+                updated += batch_updated
+                rejected.extend(batch_rejected)
+                if checkpoint is not None:
+                    self._save_checkpoint(cursor, target, checkpoint, start + len(batch), inserted, updated)
+                    self.conn.commit()
+                    # ON COMMIT DROP took the staging table with it
+                    self._create_staging(cursor, target)
+            if checkpoint is not None:
+                self._finish_checkpoint(cursor, target, checkpoint, 'completed')
+                self.conn.commit()
+        except Exception as e:
+            if checkpoint is not None:
+                self.conn.rollback()
+                self._finish_checkpoint(cursor, target, checkpoint, 'failed', str(e))
+                self.conn.commit()
+            raise
+        finally:
+            cursor.close()
+        return LoadResult(inserted, updated, rejected)
+
+    def clear_checkpoints(self, checkpoint: Optional[str] = None):
+        """Forget both targets' checkpoints for a source (or for every source) so the next load starts from row 0
+
+        Runs clear all of them once they succeed: a later run must write its
+        rows again even for a sheet loaded before, since other sheets may
+        have overwritten them in between.
+        """
+        cursor = self.conn.cursor()
+        try:
+            cursor.execute(
+                "DELETE FROM ingest_checkpoint WHERE target = ANY(%s) AND (%s IS NULL OR source_fingerprint = %s)",
+                ([HISTORICAL_TARGET['table'], FORECAST_TARGET['table']], checkpoint, checkpoint)
+            )
+        finally:
+            cursor.close()
+
+    def _checkpoint_state(self, target: Dict, checkpoint: str) -> Optional[Tuple[int, Dict, str]]:
+        cursor = self.conn.cursor()
+        try:
+            cursor.execute(
+                "SELECT committed_rows, counts, status FROM ingest_checkpoint "
+                "WHERE target = %s AND source_fingerprint = %s",
+                (target['table'], checkpoint)
+            )
+            return cursor.fetchone()
+        finally:
+            cursor.close()
+
+    def _save_checkpoint(self, cursor, target: Dict, checkpoint: str, committed_rows: int, inserted: int,
+                         updated: int):
+        cursor.execute(
+            "INSERT INTO ingest_checkpoint (target, source_fingerprint, committed_rows, counts) "
+            "VALUES (%s, %s, %s, %s::jsonb) "
+            "ON CONFLICT (target, source_fingerprint) DO UPDATE SET "
+            "committed_rows = EXCLUDED.committed_rows, counts = EXCLUDED.counts, "
+            "status = 'running', error = NULL, updated_at = NOW()",
+            (target['table'], checkpoint, committed_rows, json.dumps({'inserted': inserted, 'updated': updated}))
+        )
+
+    def _finish_checkpoint(self, cursor, target: Dict, checkpoint: str, status: str, error: str = None):
+        cursor.execute(
+            "INSERT INTO ingest_checkpoint (target, source_fingerprint, status, error, completed_at) "
+            "VALUES (%s, %s, %s, %s, CASE WHEN %s = 'completed' THEN NOW() END) "
+            "ON CONFLICT (target, source_fingerprint) DO UPDATE SET "
+            "status = EXCLUDED.status, error = EXCLUDED.error, "
+            "completed_at = EXCLUDED.completed_at, updated_at = NOW()",
+            (target['table'], checkpoint, status, error, status)
+        )
+
+    def _create_staging(self, cursor, target: Dict):
+        columns = ', '.join(
+            f'{name} {sql_type}' for name, sql_type in zip(target['columns'], target['staging_types'])
+        )
+        cursor.execute(
+            f"CREATE TEMP TABLE IF NOT EXISTS {target['staging']} "
+            f"(row_no BIGINT, {columns}) ON COMMIT DROP"
+        )
+
+    def _merge_batch(self, cursor, target: Dict, batch: pd.DataFrame) -> Tuple[int, int, List[Tuple[int, str]]]:
+        staging = target['staging']
+        columns = target['columns']
+        column_list = ', '.join(columns)
+        key_list = ', '.join(target['key'])
+
+        cursor.execute(f"TRUNCATE {staging}")
+        buffer = io.StringIO()
+        batch[columns].to_csv(buffer, header=False, index=True, date_format='%Y-%m-%d')
+        buffer.seek(0)
+        cursor.copy_expert(
+            f"COPY {staging} (row_no, {column_list}) FROM STDIN WITH (FORMAT csv)", buffer
+        )
+
+        reason = 'CASE ' + ' '.join(
+            f"WHEN {condition} THEN '{message}'" for condition, message in target['reject_rules']
+        ) + ' END'
+        cursor.execute(
+            f"SELECT row_no, reason FROM (SELECT row_no, {reason} AS reason FROM {staging}) checked "
+            f"WHERE reason IS NOT NULL ORDER BY row_no"
+        )
+        rejected = [(row_no, message) for row_no, message in cursor.fetchall()]
+
+        # Rows whose values did not change are left alone so updated_at and the
+        # update trigger only fire for real changes; they count as neither
+        # inserted nor updated.
+        updates = ', '.join(f'{c} = EXCLUDED.{c}' for c in target['updates'])
+        current = ', '.join(f'existing.{c}' for c in target['updates'])
+        incoming = ', '.join(f'EXCLUDED.{c}' for c in target['updates'])
+        cursor.execute(
+            f"""
+            WITH merged AS (
+                INSERT INTO {target['table']} AS existing ({column_list})
+                SELECT DISTINCT ON ({key_list}) {column_list}
+                FROM {staging}
+                WHERE ({reason}) IS NULL
+                ORDER BY {key_list}, row_no DESC
+                ON CONFLICT ({key_list}) DO UPDATE SET {updates}, updated_at = NOW()
+                WHERE ({current}) IS DISTINCT FROM ({incoming})
+                RETURNING (xmax = 0) AS inserted
+            )
+            SELECT COUNT(*) FILTER (WHERE inserted), COUNT(*) FILTER (WHERE NOT inserted)
+            FROM merged
+            """
+        )
+        inserted, updated = cursor.fetchone()
+        return inserted, updated, rejected
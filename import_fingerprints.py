@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+Content fingerprints for incremental sales & budget imports
+Tracks a fingerprint per workbook and sheet plus a hash per imported
+(store, date, fiscal_year, type) row, so a re-import only sends new or
+changed rows to the database
+"""
+
+import hashlib
+import io
+import logging
+from typing import Dict, Tuple
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+WORKBOOK = '*'
+
+# Per record kind: (date column, type column, value columns that feed the row hash)
+RECORD_KINDS = {
+    'historical': ('sale_date', 'data_type', ['day_of_week', 'day_number', 'sales_amount']),
+    'forecast': ('forecast_date', 'forecast_type', ['day_of_week', 'day_number',
+                                                    'forecast_amount', 'variance_adjustment']),
+}
+
+KEY_COLUMNS = ['store_name', 'record_date', 'fiscal_year', 'record_type']
+
+
+def file_fingerprint(path: str, chunk_size: int = 1 << 20) -> str:
+    """SHA-256 of the file contents"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def frame_fingerprint(df: pd.DataFrame) -> str:
+    """SHA-256 over the cell values of a sheet, independent of file metadata"""
+    digest = hashlib.sha256()
+    digest.update(repr(df.shape).encode())
+    digest.update(pd.util.hash_pandas_object(df.astype(str), index=True).to_numpy().tobytes())
+    return digest.hexdigest()
+
+
+class IncrementalTracker:
+    def __init__(self, conn, source_path: str):
+        self.conn = conn
+        self.source_path = source_path
+
+    def fingerprint_unchanged(self, sheet_name: str, fingerprint: str) -> bool:
+        cursor = self.conn.cursor()
+        cursor.execute(
+            "SELECT fingerprint FROM import_fingerprints WHERE source_path = %s AND sheet_name = %s",
+            (self.source_path, sheet_name)
+        )
+        row = cursor.fetchone()
+        cursor.close()
+        return row is not None and row[0] == fingerprint
+
+    def record_fingerprint(self, sheet_name: str, fingerprint: str):
+        cursor = self.conn.cursor()
+        cursor.execute("""
+            INSERT INTO import_fingerprints (source_path, sheet_name, fingerprint)
+            VALUES (%s, %s, %s)
+            ON CONFLICT (source_path, sheet_name)
+            DO UPDATE SET fingerprint = EXCLUDED.fingerprint, imported_at = NOW()
+        """, (self.source_path, sheet_name, fingerprint))
+        cursor.close()
+
+    @staticmethod
+    def _keyed(frame: pd.DataFrame, kind: str) -> pd.DataFrame:
+        date_column, type_column, value_columns = RECORD_KINDS[kind]
+        keyed = pd.DataFrame({
+            'store_name': frame['store_name'].to_numpy(),
+            'record_date': pd.to_datetime(frame[date_column]).to_numpy(),
+            'fiscal_year': frame['fiscal_year'].to_numpy(),
+            'record_type': (kind + ':' + frame[type_column].astype(str)).to_numpy(),
+            'row_hash': pd.util.hash_pandas_object(frame[value_columns], index=False)
+                          .to_numpy().view(np.int64),
+        }, index=frame.index)
+        return keyed
+
+    def diff(self, frame: pd.DataFrame, kind: str) -> Tuple[pd.DataFrame, pd.DataFrame, Dict[str, int]]:
+        """Split `frame` into rows that need loading and return their keyed hashes plus a summary"""
+        keyed = self._keyed(frame, kind)
+        cursor = self.conn.cursor()
+        cursor.execute(
+            "SELECT store_name, record_date, fiscal_year, record_type, row_hash "
+            "FROM import_row_hashes WHERE record_type LIKE %s",
+            (kind + ':%',)
+        )
+        existing = pd.DataFrame(cursor.fetchall(), columns=KEY_COLUMNS + ['previous_hash'])
+        cursor.close()
+        existing['record_date'] = pd.to_datetime(existing['record_date'])
+        existing['fiscal_year'] = existing['fiscal_year'].astype(np.int64)
+        existing['previous_hash'] = existing['previous_hash'].astype(np.int64)
+
+        # A left merge keeps keyed's row order, so the masks below line up with frame
+        joined = keyed.merge(existing, on=KEY_COLUMNS, how='left')
+        added = joined['previous_hash'].isna().to_numpy()
+        changed = ~added & (joined['previous_hash'].to_numpy() != joined['row_hash'].to_numpy())
+        pending = added | changed
+        summary = {
+            'added': int(added.sum()),
+            'changed': int(changed.sum()),
+            'unchanged': int((~pending).sum()),
+        }
+        return frame[pending], keyed[pending], summary
+
+    def record_rows(self, keyed: pd.DataFrame):
+        """Store row hashes for rows that were just loaded"""
+        if keyed.empty:
+            return
+        cursor = self.conn.cursor()
+        cursor.execute("""
+            CREATE TEMP TABLE IF NOT EXISTS stage_import_row_hashes
+            (store_name TEXT, record_date DATE, fiscal_year INTEGER, record_type TEXT, row_hash BIGINT)
+            ON COMMIT DROP
+        """)
+        cursor.execute("TRUNCATE stage_import_row_hashes")
+        buffer = io.StringIO()
+        keyed = keyed.drop_duplicates(KEY_COLUMNS, keep='last')
+        keyed[KEY_COLUMNS + ['row_hash']].to_csv(buffer, header=False, index=False, date_format='%Y-%m-%d')
+        buffer.seek(0)
+        cursor.copy_expert("COPY stage_import_row_hashes FROM STDIN WITH (FORMAT csv)", buffer)
+        cursor.execute("""
+            INSERT INTO import_row_hashes (store_name, record_date, fiscal_year, record_type, row_hash)
+            SELECT store_name, record_date, fiscal_year, record_type, row_hash
+            FROM stage_import_row_hashes
+            ON CONFLICT (store_name, record_date, fiscal_year, record_type)
+            DO UPDATE SET row_hash = EXCLUDED.row_hash, updated_at = NOW()
+        """)
+        cursor.close()
@@ -26,7 +26,7 @@ INSERT INTO historical_daily_sales (store_name, sale_date, day_of_week, day_numb
 ('Uptown', '2024-05-05', 'Sunday', 1, 2025, 10921.16, 'actual'),
 ('Uptown', '2024-05-06', 'Monday', 2, 2025, 7514.16, 'actual')
 
-ON CONFLICT (store_name, sale_date, fiscal_year, data_type) DO NOTHING;
+ON CONFLICT (store_key, sale_date, fiscal_year, data_type) DO NOTHING;
 
 -- Insert sample budget forecast data (FY2026 - forecast data)
 INSERT INTO budget_forecasts (store_name, forecast_date, day_of_week, day_number, fiscal_year, forecast_amount, variance_adjustment, forecast_type) VALUES
@@ -51,7 +51,7 @@ INSERT INTO budget_forecasts (store_name, forecast_date, day_of_week, day_number
 ('Uptown', '2025-05-04', 'Sunday', 1, 2026, 11248.79, 0.03, 'daily'),
 ('Uptown', '2025-05-05', 'Monday', 2, 2026, 7739.58, 0.03, 'daily')
 
-ON CONFLICT (store_name, forecast_date, fiscal_year, forecast_type) DO NOTHING;
+ON CONFLICT (store_key, forecast_date, fiscal_year, forecast_type) DO NOTHING;
 
 -- Verify the data was inserted
 SELECT 'Sample data inserted successfully' as status;
@@ -0,0 +1,267 @@
+-- =============================================
+-- Monthly Partitioning of the Sales Fact Tables
+-- Converts sales, salessummary and historical_daily_sales to tables
+-- range-partitioned by month on their date column
+-- =============================================
+
+-- Run after pipeline_schema.sql and sales_budget_schema.sql. The migration
+-- at the end of this file is idempotent: tables that are already
+-- partitioned (or do not exist) are skipped.
+--
+-- Each table is renamed to <table>_unpartitioned, a partitioned table with
+-- the same columns, defaults, checks, indexes, foreign keys and triggers is
+-- created in its place, and the rows are copied over; the whole table is
+-- locked for the duration, so run it in a maintenance window. Afterwards:
+--
+--   1. Re-run sales_budget_schema.sql so daily_sales_budget_view reads the
+--      partitioned historical_daily_sales (views stay bound to the renamed
+--      table; the migration lists them in NOTICEs).
+--   2. ANALYZE the new tables.
+--   3. Once the counts match, DROP the *_unpartitioned tables.
+--
+-- Unique indexes and constraints must include the date column on a
+-- partitioned table. Primary keys that lack it are widened to include it
+-- (historical_daily_sales: PRIMARY KEY (id, sale_date)); any other unique
+-- constraint without it aborts the migration. Tables referenced by foreign
+-- keys cannot be migrated this way.
+--
+-- Every table also gets a DEFAULT partition, so a row for a month without
+-- its own partition is still accepted. The API's partition manager
+-- (app/services/partitions.py) creates partitions ahead of time and moves
+-- months that land in the default partition into their own.
+
+CREATE SCHEMA IF NOT EXISTS archive;
+
+CREATE OR REPLACE FUNCTION month_partition_name(p_table TEXT, p_month DATE)
+RETURNS TEXT AS $$
+    SELECT p_table || '_p' || to_char(p_month, 'YYYY_MM');
+$$ LANGUAGE sql IMMUTABLE;
+
+-- Create the monthly partitions of p_table covering p_from..p_to that do
+-- not exist yet, moving rows for those months out of the default
+-- partition. Partitions are built as standalone tables and attached, which
+-- locks the parent less than CREATE TABLE ... PARTITION OF. Returns the
+-- number of partitions created.
+CREATE OR REPLACE FUNCTION ensure_month_partitions(p_table TEXT, p_from DATE, p_to DATE)
+RETURNS INTEGER AS $$
+DECLARE
+    v_parent REGCLASS := p_table::regclass;
+    v_schema TEXT;
+    v_relname TEXT;
+    v_column TEXT;
+    v_default OID;
+    v_month DATE := date_trunc('month', p_from)::date;
+    v_next DATE;
+    v_name TEXT;
+    v_created INTEGER := 0;
+BEGIN
+    SELECT n.nspname, c.relname, a.attname, p.partdefid
+    INTO v_schema, v_relname, v_column, v_default
+    FROM pg_partitioned_table p
+    JOIN pg_class c ON c.oid = p.partrelid
+    JOIN pg_namespace n ON n.oid = c.relnamespace
+    JOIN pg_attribute a ON a.attrelid = p.partrelid AND a.attnum = p.partattrs[0]
+    WHERE p.partrelid = v_parent;
+
+    IF v_column IS NULL THEN
+        RAISE EXCEPTION '% is not a partitioned table', p_table;
+    END IF;
+
+    WHILE v_month <= p_to LOOP
+        v_next := (v_month + INTERVAL '1 month')::date;
+        v_name := month_partition_name(v_relname, v_month);
+        IF to_regclass(format('%I.%I', v_schema, v_name)) IS NULL THEN
+            EXECUTE format(
+                'CREATE TABLE %I.%I (LIKE %s INCLUDING DEFAULTS INCLUDING CONSTRAINTS)',
+                v_schema, v_name, v_parent
+            );
+            IF v_default <> 0 THEN
+                EXECUTE format(
+                    'WITH moved AS (DELETE FROM %s WHERE %I >= $1 AND %I < $2 RETURNING *) '
+                    'INSERT INTO %I.%I SELECT * FROM moved',
+                    v_default::regclass, v_column, v_column, v_schema, v_name
+                ) USING v_month, v_next;
+            END IF;
+            EXECUTE format(
+                'ALTER TABLE %s ATTACH PARTITION %I.%I FOR VALUES FROM (%L) TO (%L)',
+                v_parent, v_schema, v_name, v_month, v_next
+            );
+            v_created := v_created + 1;
+        END IF;
+        v_month := v_next;
+    END LOOP;
+
+    RETURN v_created;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Replace p_table with a copy partitioned by month on p_column; returns
+-- the number of rows copied. The original is kept as <table>_unpartitioned.
+CREATE OR REPLACE FUNCTION partition_by_month(p_table TEXT, p_column TEXT, p_months_ahead INTEGER DEFAULT 3)
+RETURNS BIGINT AS $$
+DECLARE
+    v_old REGCLASS := to_regclass(p_table);
+    v_schema TEXT;
+    v_legacy TEXT := left(p_table, 49) || '_unpartitioned';
+    v_new TEXT;
+    v_index_oids OID[];
+    v_index_names TEXT[];
+    v_columns TEXT;
+    v_has_key BOOLEAN;
+    v_first DATE;
+    v_last DATE;
+    v_rows BIGINT;
+    v_seq TEXT;
+    r RECORD;
+BEGIN
+    IF v_old IS NULL THEN
+        RAISE NOTICE '% does not exist, skipping', p_table;
+        RETURN 0;
+    END IF;
+    IF (SELECT relkind FROM pg_class WHERE oid = v_old) = 'p' THEN
+        RAISE NOTICE '% is already partitioned, skipping', p_table;
+        RETURN 0;
+    END IF;
+    IF EXISTS (SELECT 1 FROM pg_constraint WHERE confrelid = v_old AND contype = 'f') THEN
+        RAISE EXCEPTION '% is referenced by foreign keys; drop them before partitioning', p_table;
+    END IF;
+
+    SELECT n.nspname INTO v_schema
+    FROM pg_class c JOIN pg_namespace n ON n.oid = c.relnamespace
+    WHERE c.oid = v_old;
+    v_new := format('%I.%I', v_schema, p_table);
+
+    EXECUTE format('LOCK TABLE %s IN ACCESS EXCLUSIVE MODE', v_old);
+
+    -- Index names (and so unique/primary key constraint names) are unique per
+    -- schema; move the old ones aside so the new table can reuse them
+    SELECT array_agg(indexrelid ORDER BY indexrelid), array_agg(indexrelid::regclass::text ORDER BY indexrelid)
+    INTO v_index_oids, v_index_names
+    FROM pg_index WHERE indrelid = v_old;
+    FOR i IN 1 .. coalesce(array_length(v_index_oids, 1), 0) LOOP
+        EXECUTE format(
+            'ALTER INDEX %s RENAME TO %I',
+            v_index_oids[i]::regclass,
+            left((SELECT relname FROM pg_class WHERE oid = v_index_oids[i]), 49) || '_unpartitioned'
+        );
+    END LOOP;
+    EXECUTE format('ALTER TABLE %s RENAME TO %I', v_old, v_legacy);
+
+    EXECUTE format(
+        'CREATE TABLE %s (LIKE %s INCLUDING DEFAULTS INCLUDING CONSTRAINTS INCLUDING STORAGE '
+        'INCLUDING COMMENTS INCLUDING GENERATED) PARTITION BY RANGE (%I)',
+        v_new, v_old, p_column
+    );
+
+    -- Serial columns keep their sequence; identity columns get a new one,
+    -- advanced past the copied values below
+    FOR r IN
+        SELECT a.attname, a.attidentity <> '' AS is_identity,
+               pg_get_serial_sequence(v_old::text, a.attname) AS seq
+        FROM pg_attribute a
+        WHERE a.attrelid = v_old AND a.attnum > 0 AND NOT a.attisdropped
+          AND pg_get_serial_sequence(v_old::text, a.attname) IS NOT NULL
+    LOOP
+        IF r.is_identity THEN
+            v_seq := format('%I.%I', v_schema, left(p_table || '_' || r.attname, 53) || '_part_seq');
+            EXECUTE format('CREATE SEQUENCE %s OWNED BY %s.%I', v_seq, v_new, r.attname);
+            EXECUTE format('ALTER TABLE %s ALTER COLUMN %I SET DEFAULT nextval(%L)', v_new, r.attname, v_seq);
+        ELSE
+            EXECUTE format('ALTER SEQUENCE %s OWNED BY %s.%I', r.seq, v_new, r.attname);
+        END IF;
+    END LOOP;
+
+    FOR i IN 1 .. coalesce(array_length(v_index_oids, 1), 0) LOOP
+        SELECT string_agg(quote_ident(a.attname), ', ' ORDER BY k.ord),
+               bool_or(a.attname = p_column)
+        INTO v_columns, v_has_key
+        FROM pg_index x
+        CROSS JOIN LATERAL unnest(x.indkey::int2[]) WITH ORDINALITY AS k(attnum, ord)
+        JOIN pg_attribute a ON a.attrelid = x.indrelid AND a.attnum = k.attnum
+        WHERE x.indexrelid = v_index_oids[i] AND k.ord <= x.indnkeyatts;
+
+        SELECT x.indisunique, x.indisprimary, con.contype
+        INTO r
+        FROM pg_index x
+        LEFT JOIN pg_constraint con ON con.conindid = x.indexrelid AND con.contype IN ('p', 'u')
+        WHERE x.indexrelid = v_index_oids[i];
+
+        IF r.indisunique AND NOT coalesce(v_has_key, FALSE) AND NOT r.indisprimary THEN
+            RAISE EXCEPTION 'unique index % on % does not include %', v_index_names[i], p_table, p_column;
+        ELSIF r.contype IS NOT NULL THEN
+            IF NOT coalesce(v_has_key, FALSE) THEN
+                v_columns := v_columns || ', ' || quote_ident(p_column);
+            END IF;
+            EXECUTE format(
+                'ALTER TABLE %s ADD CONSTRAINT %I %s (%s)',
+                v_new, split_part(v_index_names[i], '.', -1)::name,
+                CASE r.contype WHEN 'p' THEN 'PRIMARY KEY' ELSE 'UNIQUE' END, v_columns
+            );
+        ELSE
+            EXECUTE format(
+                'CREATE %sINDEX %I ON %s %s',
+                CASE WHEN r.indisunique THEN 'UNIQUE ' ELSE '' END,
+                split_part(v_index_names[i], '.', -1)::name, v_new,
+                substring(pg_get_indexdef(v_index_oids[i]) FROM ' USING .*$')
+            );
+        END IF;
+    END LOOP;
+
+    FOR r IN SELECT conname, pg_get_constraintdef(oid) AS def FROM pg_constraint WHERE conrelid = v_old AND contype = 'f' LOOP
+        EXECUTE format('ALTER TABLE %s ADD CONSTRAINT %I %s', v_new, r.conname, r.def);
+    END LOOP;
+
+    FOR r IN SELECT pg_get_triggerdef(oid) AS def FROM pg_trigger WHERE tgrelid = v_old AND NOT tgisinternal LOOP
+        EXECUTE regexp_replace(r.def, ' ON \S+ ', format(' ON %s ', v_new));
+    END LOOP;
+
+    EXECUTE format('SELECT date_trunc(''month'', min(%I))::date, max(%I) FROM %s', p_column, p_column, v_old)
+    INTO v_first, v_last;
+    EXECUTE format('CREATE TABLE %I.%I PARTITION OF %s DEFAULT', v_schema, left(p_table, 55) || '_default', v_new);
+    PERFORM ensure_month_partitions(
+        v_new,
+        coalesce(v_first, date_trunc('month', CURRENT_DATE)::date),
+        (greatest(v_last, CURRENT_DATE) + make_interval(months => p_months_ahead))::date
+    );
+
+    EXECUTE format('INSERT INTO %s SELECT * FROM %s', v_new, v_old);
+    GET DIAGNOSTICS v_rows = ROW_COUNT;
+
+    FOR r IN
+        SELECT a.attname FROM pg_attribute a
+        WHERE a.attrelid = v_old AND a.attidentity <> '' AND NOT a.attisdropped
+    LOOP
+        EXECUTE format(
+            'SELECT setval(pg_get_serial_sequence(%L, %L), coalesce(max(%I), 0) + 1, false) FROM %s',
+            v_new, r.attname, r.attname, v_new
+        );
+    END LOOP;
+
+    FOR r IN
+        SELECT DISTINCT v.oid::regclass AS view
+        FROM pg_depend d
+        JOIN pg_rewrite w ON w.oid = d.objid
+        JOIN pg_class v ON v.oid = w.ev_class
+        WHERE d.refobjid = v_old AND v.oid <> v_old
+    LOOP
+        RAISE NOTICE 'view % still reads %; re-create it to use the partitioned table', r.view, v_old;
+    END LOOP;
+    IF (SELECT relrowsecurity FROM pg_class WHERE oid = v_old) THEN
+        RAISE NOTICE '% has row level security; re-create its policies on %', v_old, v_new;
+    END IF;
+
+    RAISE NOTICE 'partitioned %: % rows copied, original kept as %', p_table, v_rows, v_old;
+    RETURN v_rows;
+END;
+$$ LANGUAGE plpgsql;
+
+-- =============================================
+-- Migration
+-- =============================================
+
+SELECT partition_by_month('sales', 'sale_date');
+SELECT partition_by_month('salessummary', 'date');
+SELECT partition_by_month('historical_daily_sales', 'sale_date');
+
+COMMENT ON FUNCTION ensure_month_partitions(TEXT, DATE, DATE) IS 'Create missing monthly partitions, moving their rows out of the default partition';
+COMMENT ON FUNCTION partition_by_month(TEXT, TEXT, INTEGER) IS 'One-off migration of a table to monthly range partitions';
@@ -0,0 +1,310 @@
+-- =============================================
+-- Ingestion Pipeline Schema
+-- Supporting objects for the FastAPI ingestion and dashboard service
+-- =============================================
+
+-- Merge keys for the bulk ingestion path. insert_sales / insert_inventory
+-- stage each batch with COPY and merge it with INSERT ... ON CONFLICT, which
+-- needs a unique index on the conflict target. Existing duplicate rows must be
+-- collapsed before these indexes can be built.
+CREATE UNIQUE INDEX IF NOT EXISTS ux_sales_store_sku_date
+    ON sales(store_id, sku, sale_date);
+
+CREATE UNIQUE INDEX IF NOT EXISTS ux_inventory_store_sku
+    ON inventory(store_id, sku);
+
+-- =============================================
+-- Reorder Runs
+-- =============================================
+
+-- One row per reorder engine run; params holds the sales window and
+-- weeks-of-supply per ABC class the run used
+CREATE TABLE IF NOT EXISTS reorder_run (
+    run_id BIGSERIAL PRIMARY KEY,
+    status TEXT NOT NULL DEFAULT 'completed',
+    params JSONB NOT NULL DEFAULT '{}',
+    position_count INTEGER NOT NULL DEFAULT 0,
+    recommended_count INTEGER NOT NULL DEFAULT 0,
+    timings JSONB DEFAULT '{}',
+    created_at TIMESTAMPTZ DEFAULT NOW()
+);
+
+-- Positions that were ordered or hit an exception (do_not_reorder, lto, strike)
+CREATE TABLE IF NOT EXISTS reorder_run_line (
+    run_id BIGINT NOT NULL REFERENCES reorder_run(run_id) ON DELETE CASCADE,
+    store_id INTEGER NOT NULL,
+    sku TEXT NOT NULL,
+    on_hand INTEGER NOT NULL,
+    weekly_velocity DOUBLE PRECISION NOT NULL,
+    abc_class CHAR(1) NOT NULL,
+    target_qty INTEGER NOT NULL,
+    recommended_qty INTEGER NOT NULL,
+    cases INTEGER NOT NULL,
+    exception TEXT,
+    PRIMARY KEY (run_id, store_id, sku)
+);
+
+CREATE INDEX IF NOT EXISTS idx_reorder_run_created ON reorder_run(created_at DESC);
+
+-- Progress tracking for runs computed store by store in the background;
+-- status moves from 'running' to 'completed' or 'failed'
+ALTER TABLE reorder_run ADD COLUMN IF NOT EXISTS store_count INTEGER NOT NULL DEFAULT 0;
+ALTER TABLE reorder_run ADD COLUMN IF NOT EXISTS stores_done INTEGER NOT NULL DEFAULT 0;
+ALTER TABLE reorder_run ADD COLUMN IF NOT EXISTS error TEXT;
+ALTER TABLE reorder_run ADD COLUMN IF NOT EXISTS updated_at TIMESTAMPTZ DEFAULT NOW();
+ALTER TABLE reorder_run ADD COLUMN IF NOT EXISTS completed_at TIMESTAMPTZ;
+
+CREATE INDEX IF NOT EXISTS idx_reorder_run_status ON reorder_run(status, run_id DESC);
+
+-- =============================================
+-- Sales Velocity
+-- =============================================
+
+-- Rolling per store x SKU sales over the 7/28/91 days ending at
+-- sales_velocity_state.as_of. Ingestion keeps it current: each sales batch
+-- first advances the window (subtracting days that fell out), then
+-- subtracts the old values of the rows it is about to overwrite and adds
+-- the merged values back.
+CREATE TABLE IF NOT EXISTS sales_velocity (
+    store_id INTEGER NOT NULL,
+    sku TEXT NOT NULL,
+    units_7d BIGINT NOT NULL DEFAULT 0,
+    units_28d BIGINT NOT NULL DEFAULT 0,
+    units_91d BIGINT NOT NULL DEFAULT 0,
+    revenue_7d NUMERIC NOT NULL DEFAULT 0,
+    revenue_28d NUMERIC NOT NULL DEFAULT 0,
+    revenue_91d NUMERIC NOT NULL DEFAULT 0,
+    dow_units_91d BIGINT[] NOT NULL DEFAULT ARRAY[0, 0, 0, 0, 0, 0, 0], -- Monday = 1
+    last_sale_date DATE,
+    updated_at TIMESTAMPTZ DEFAULT NOW(),
+    PRIMARY KEY (store_id, sku)
+);
+
+-- Single-row window end date; also the lock that serializes velocity updates
+CREATE TABLE IF NOT EXISTS sales_velocity_state (
+    id BOOLEAN PRIMARY KEY DEFAULT TRUE CHECK (id),
+    as_of DATE NOT NULL
+);
+
+-- Advancing the window reads only the days that leave it
+CREATE INDEX IF NOT EXISTS idx_sales_sale_date ON sales(sale_date);
+
+-- Velocity recomputed from raw sales, used for rebuilds and verification
+CREATE OR REPLACE FUNCTION compute_sales_velocity(p_as_of DATE)
+RETURNS TABLE (
+    store_id INTEGER, sku TEXT,
+    units_7d BIGINT, units_28d BIGINT, units_91d BIGINT,
+    revenue_7d NUMERIC, revenue_28d NUMERIC, revenue_91d NUMERIC,
+    dow_units_91d BIGINT[], last_sale_date DATE
+) AS $$
+    SELECT
+        s.store_id,
+        s.sku,
+        COALESCE(SUM(s.quantity) FILTER (WHERE s.sale_date > p_as_of - 7), 0)::BIGINT,
+        COALESCE(SUM(s.quantity) FILTER (WHERE s.sale_date > p_as_of - 28), 0)::BIGINT,
+        COALESCE(SUM(s.quantity) FILTER (WHERE s.sale_date > p_as_of - 91), 0)::BIGINT,
+        COALESCE(SUM(s.quantity * s.price) FILTER (WHERE s.sale_date > p_as_of - 7), 0),
+        COALESCE(SUM(s.quantity * s.price) FILTER (WHERE s.sale_date > p_as_of - 28), 0),
+        COALESCE(SUM(s.quantity * s.price) FILTER (WHERE s.sale_date > p_as_of - 91), 0),
+        ARRAY[
+            COALESCE(SUM(s.quantity) FILTER (WHERE s.sale_date > p_as_of - 91 AND EXTRACT(ISODOW FROM s.sale_date) = 1), 0),
+            COALESCE(SUM(s.quantity) FILTER (WHERE s.sale_date > p_as_of - 91 AND EXTRACT(ISODOW FROM s.sale_date) = 2), 0),
+            COALESCE(SUM(s.quantity) FILTER (WHERE s.sale_date > p_as_of - 91 AND EXTRACT(ISODOW FROM s.sale_date) = 3), 0),
+            COALESCE(SUM(s.quantity) FILTER (WHERE s.sale_date > p_as_of - 91 AND EXTRACT(ISODOW FROM s.sale_date) = 4), 0),
+            COALESCE(SUM(s.quantity) FILTER (WHERE s.sale_date > p_as_of - 91 AND EXTRACT(ISODOW FROM s.sale_date) = 5), 0),
+            COALESCE(SUM(s.quantity) FILTER (WHERE s.sale_date > p_as_of - 91 AND EXTRACT(ISODOW FROM s.sale_date) = 6), 0),
+            COALESCE(SUM(s.quantity) FILTER (WHERE s.sale_date > p_as_of - 91 AND EXTRACT(ISODOW FROM s.sale_date) = 7), 0)
+        ]::BIGINT[],
+        MAX(s.sale_date)
+    FROM sales s
+    WHERE s.sale_date <= p_as_of
+    GROUP BY s.store_id, s.sku;
+$$ LANGUAGE sql STABLE;
+
+-- Replace the whole table with a recomputation as of p_as_of
+CREATE OR REPLACE FUNCTION rebuild_sales_velocity(p_as_of DATE DEFAULT CURRENT_DATE)
+RETURNS INTEGER AS $$
+DECLARE
+    v_rows INTEGER;
+BEGIN
+    INSERT INTO sales_velocity_state (as_of) VALUES (p_as_of)
+    ON CONFLICT (id) DO UPDATE SET as_of = EXCLUDED.as_of;
+    PERFORM 1 FROM sales_velocity_state FOR UPDATE;
+
+    TRUNCATE sales_velocity;
+    INSERT INTO sales_velocity (
+        store_id, sku, units_7d, units_28d, units_91d,
+        revenue_7d, revenue_28d, revenue_91d, dow_units_91d, last_sale_date
+    )
+    SELECT * FROM compute_sales_velocity(p_as_of);
+    GET DIAGNOSTICS v_rows = ROW_COUNT;
+    RETURN v_rows;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Move the window end to p_as_of, subtracting the days that fall out of each
+-- window. Locks the state row until the caller's transaction ends and
+-- returns the (possibly unchanged) window end.
+CREATE OR REPLACE FUNCTION advance_sales_velocity(p_as_of DATE DEFAULT CURRENT_DATE)
+RETURNS DATE AS $$
+DECLARE
+    v_old DATE;
+BEGIN
+    SELECT as_of INTO v_old FROM sales_velocity_state FOR UPDATE;
+    IF v_old IS NULL THEN
+        PERFORM rebuild_sales_velocity(p_as_of);
+        RETURN p_as_of;
+    END IF;
+    IF p_as_of <= v_old THEN
+        RETURN v_old;
+    END IF;
+
+    -- A day d leaves the N-day window when old_as_of - N < d <= new_as_of - N
+    UPDATE sales_velocity v SET
+        units_7d = v.units_7d - d.units_7d,
+        units_28d = v.units_28d - d.units_28d,
+        units_91d = v.units_91d - d.units_91d,
+        revenue_7d = v.revenue_7d - d.revenue_7d,
+        revenue_28d = v.revenue_28d - d.revenue_28d,
+        revenue_91d = v.revenue_91d - d.revenue_91d,
+        dow_units_91d = ARRAY(
+            SELECT a - b FROM unnest(v.dow_units_91d, d.dow_units_91d) AS t(a, b)
+        ),
+        updated_at = NOW()
+    FROM (
+        SELECT
+            s.store_id,
+            s.sku,
+            COALESCE(SUM(s.quantity) FILTER (WHERE s.sale_date <= LEAST(v_old, p_as_of - 7) AND s.sale_date > v_old - 7), 0) AS units_7d,
+            COALESCE(SUM(s.quantity) FILTER (WHERE s.sale_date <= LEAST(v_old, p_as_of - 28) AND s.sale_date > v_old - 28), 0) AS units_28d,
+            COALESCE(SUM(s.quantity) FILTER (WHERE s.sale_date <= LEAST(v_old, p_as_of - 91)), 0) AS units_91d,
+            COALESCE(SUM(s.quantity * s.price) FILTER (WHERE s.sale_date <= LEAST(v_old, p_as_of - 7) AND s.sale_date > v_old - 7), 0) AS revenue_7d,
+            COALESCE(SUM(s.quantity * s.price) FILTER (WHERE s.sale_date <= LEAST(v_old, p_as_of - 28) AND s.sale_date > v_old - 28), 0) AS revenue_28d,
+            COALESCE(SUM(s.quantity * s.price) FILTER (WHERE s.sale_date <= LEAST(v_old, p_as_of - 91)), 0) AS revenue_91d,
+            ARRAY[
+                COALESCE(SUM(s.quantity) FILTER (WHERE s.sale_date <= LEAST(v_old, p_as_of - 91) AND EXTRACT(ISODOW FROM s.sale_date) = 1), 0),
+                COALESCE(SUM(s.quantity) FILTER (WHERE s.sale_date <= LEAST(v_old, p_as_of - 91) AND EXTRACT(ISODOW FROM s.sale_date) = 2), 0),
+                COALESCE(SUM(s.quantity) FILTER (WHERE s.sale_date <= LEAST(v_old, p_as_of - 91) AND EXTRACT(ISODOW FROM s.sale_date) = 3), 0),
+                COALESCE(SUM(s.quantity) FILTER (WHERE s.sale_date <= LEAST(v_old, p_as_of - 91) AND EXTRACT(ISODOW FROM s.sale_date) = 4), 0),
+                COALESCE(SUM(s.quantity) FILTER (WHERE s.sale_date <= LEAST(v_old, p_as_of - 91) AND EXTRACT(ISODOW FROM s.sale_date) = 5), 0),
+                COALESCE(SUM(s.quantity) FILTER (WHERE s.sale_date <= LEAST(v_old, p_as_of - 91) AND EXTRACT(ISODOW FROM s.sale_date) = 6), 0),
+                COALESCE(SUM(s.quantity) FILTER (WHERE s.sale_date <= LEAST(v_old, p_as_of - 91) AND EXTRACT(ISODOW FROM s.sale_date) = 7), 0)
+            ]::BIGINT[] AS dow_units_91d
+        FROM sales s
+        WHERE s.sale_date > v_old - 91
+          AND s.sale_date <= LEAST(v_old, p_as_of - 7)
+        GROUP BY s.store_id, s.sku
+    ) d
+    WHERE v.store_id = d.store_id AND v.sku = d.sku;
+
+    UPDATE sales_velocity_state SET as_of = p_as_of;
+    RETURN p_as_of;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Seed the table the first time this file is applied
+SELECT rebuild_sales_velocity(CURRENT_DATE)
+WHERE NOT EXISTS (SELECT 1 FROM sales_velocity_state);
+
+-- =============================================
+-- Ingestion Checkpoints
+-- =============================================
+
+-- Durable progress of unfinished chunked loads, shared with the budget
+-- importer (also created by sales_budget_schema.sql). A source (one
+-- submission or import run) is loaded into `target` in chunks; each chunk
+-- commits together with its update of this row, so retrying the source
+-- resumes after committed_rows. Rows are cleared once the load (for the
+-- importer: the whole run) completes, so a later load always starts over.
+CREATE TABLE IF NOT EXISTS ingest_checkpoint (
+    target TEXT NOT NULL,
+    source_fingerprint TEXT NOT NULL,
+    committed_rows BIGINT NOT NULL DEFAULT 0,
+    counts JSONB NOT NULL DEFAULT '{}',
+    status TEXT NOT NULL DEFAULT 'running', -- 'running', 'completed' or 'failed'
+    error TEXT,
+    started_at TIMESTAMPTZ DEFAULT NOW(),
+    updated_at TIMESTAMPTZ DEFAULT NOW(),
+    completed_at TIMESTAMPTZ,
+    PRIMARY KEY (target, source_fingerprint)
+);
+
+-- =============================================
+-- Inventory History
+-- =============================================
+
+-- Change log of inventory positions: one row per position and date on
+-- which the position appeared, changed quantity or disappeared (quantity
+-- NULL). Snapshot ingestion and the inventory upsert merge both write it
+-- (the upserts date changes by last_updated); unchanged positions write
+-- nothing, so the table grows with actual change rather than catalog size.
+CREATE TABLE IF NOT EXISTS inventory_history (
+    store_id INTEGER NOT NULL,
+    sku TEXT NOT NULL,
+    as_of DATE NOT NULL,
+    quantity INTEGER,
+    change TEXT NOT NULL, -- 'added', 'changed' or 'removed'
+    recorded_at TIMESTAMPTZ DEFAULT NOW(),
+    PRIMARY KEY (store_id, sku, as_of)
+);
+
+-- Baseline for positions that predate the history
+INSERT INTO inventory_history (store_id, sku, as_of, quantity, change)
+SELECT i.store_id, i.sku, i.last_updated::date, i.quantity, 'added'
+FROM inventory i
+WHERE NOT EXISTS (
+    SELECT 1 FROM inventory_history h WHERE h.store_id = i.store_id AND h.sku = i.sku
+);
+
+-- Inventory positions as they stood at the end of p_as_of: the latest
+-- history entry of every position on or before that date, unless it was a
+-- removal. Simple enough to be inlined, so outer filters reach the scan.
+CREATE OR REPLACE FUNCTION inventory_as_of(p_as_of DATE)
+RETURNS TABLE (store_id INTEGER, sku TEXT, quantity INTEGER) AS $$
+    SELECT latest.store_id, latest.sku, latest.quantity
+    FROM (
+        SELECT DISTINCT ON (h.store_id, h.sku) h.store_id, h.sku, h.quantity
+        FROM inventory_history h
+        WHERE h.as_of <= p_as_of
+        ORDER BY h.store_id, h.sku, h.as_of DESC
+    ) latest
+    WHERE latest.quantity IS NOT NULL
+$$ LANGUAGE sql STABLE;
+
+-- =============================================
+-- Audit Log
+-- =============================================
+
+-- One row per audited operation (ingestion calls and uploads), written in
+-- batches by the API's background audit writer. timings holds seconds per
+-- stage (acquire, read, validate, merge, commit, ..., total).
+CREATE TABLE IF NOT EXISTS audit_log (
+    id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+    action TEXT NOT NULL,
+    file_name TEXT,
+    ingestion_date DATE NOT NULL DEFAULT CURRENT_DATE,
+    record_count INTEGER,
+    status TEXT NOT NULL, -- 'success' or 'failure'
+    error_log TEXT,
+    details JSONB NOT NULL DEFAULT '{}',
+    timings JSONB NOT NULL DEFAULT '{}',
+    started_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    completed_at TIMESTAMPTZ
+);
+
+CREATE INDEX IF NOT EXISTS idx_audit_log_ingestion_date ON audit_log(ingestion_date DESC);
+CREATE INDEX IF NOT EXISTS idx_audit_log_action_started ON audit_log(action, started_at DESC);
+
+-- =============================================
+-- Comments for documentation
+-- =============================================
+COMMENT ON INDEX ux_sales_store_sku_date IS 'Conflict target for the bulk sales merge (one row per store, SKU and day)';
+COMMENT ON INDEX ux_inventory_store_sku IS 'Conflict target for the bulk inventory merge (one position per store and SKU)';
+COMMENT ON TABLE reorder_run IS 'Reorder engine runs with their parameters and stage timings';
+COMMENT ON TABLE reorder_run_line IS 'Per store x SKU reorder recommendations and exceptions for a run';
+COMMENT ON TABLE sales_velocity IS 'Rolling 7/28/91-day units, revenue and day-of-week profile per store and SKU, maintained on ingest';
+COMMENT ON TABLE sales_velocity_state IS 'End date of the sales_velocity windows';
+COMMENT ON TABLE ingest_checkpoint IS 'Committed offset and running counts of chunked, resumable loads per target and source';
+COMMENT ON TABLE inventory_history IS 'Inventory positions added, changed or removed per date, written by inventory ingestion';
+COMMENT ON FUNCTION inventory_as_of(DATE) IS 'Point-in-time inventory positions reconstructed from inventory_history';
+COMMENT ON TABLE audit_log IS 'Ingestion runs with record counts, outcome, errors and per-stage timings';
@@ -3,10 +3,22 @@
 -- For Cascadia Daily Sales & Budget Data integration
 -- =============================================
 
--- Create tables for historical sales and budget data
+-- Store mapping table to handle Excel store names to database store_id mapping
+CREATE TABLE IF NOT EXISTS store_name_mapping (
+    id SERIAL PRIMARY KEY,
+    excel_store_name TEXT UNIQUE NOT NULL,
+    database_store_name TEXT,
+    store_id INTEGER REFERENCES store(store_id),
+    is_active BOOLEAN DEFAULT TRUE,
+    created_at TIMESTAMPTZ DEFAULT NOW()
+);
+
+-- Create tables for historical sales and budget data. Rows are keyed and
+-- joined on store_key (store_name_mapping.id); store_name is kept as data
 CREATE TABLE IF NOT EXISTS historical_daily_sales (
     id BIGSERIAL PRIMARY KEY,
     store_name TEXT NOT NULL,
+    store_key INTEGER NOT NULL REFERENCES store_name_mapping(id),
     sale_date DATE NOT NULL,
     day_of_week TEXT,
     day_number INTEGER, -- 1-7 (Sunday = 1)
@@ -16,11 +28,10 @@ CREATE TABLE IF NOT EXISTS historical_daily_sales (
     created_at TIMESTAMPTZ DEFAULT NOW(),
     updated_at TIMESTAMPTZ DEFAULT NOW(),
     metadata JSONB DEFAULT '{}',
-    UNIQUE(store_name, sale_date, fiscal_year, data_type)
+    UNIQUE(store_key, sale_date, fiscal_year, data_type)
 );
 
--- Create indexes for performance
-CREATE INDEX IF NOT EXISTS idx_historical_sales_store_date ON historical_daily_sales(store_name, sale_date);
+-- Create indexes for performance (store/date lookups use the unique constraint)
 CREATE INDEX IF NOT EXISTS idx_historical_sales_fiscal_year ON historical_daily_sales(fiscal_year, data_type);
 CREATE INDEX IF NOT EXISTS idx_historical_sales_date_range ON historical_daily_sales(sale_date, data_type);
 
@@ -28,6 +39,7 @@ CREATE INDEX IF NOT EXISTS idx_historical_sales_date_range ON historical_daily_s
 CREATE TABLE IF NOT EXISTS budget_forecasts (
     id BIGSERIAL PRIMARY KEY,
     store_name TEXT NOT NULL,
+    store_key INTEGER NOT NULL REFERENCES store_name_mapping(id),
     forecast_date DATE NOT NULL,
     day_of_week TEXT,
     day_number INTEGER, -- 1-7 (Sunday = 1)
@@ -38,24 +50,13 @@ CREATE TABLE IF NOT EXISTS budget_forecasts (
     created_at TIMESTAMPTZ DEFAULT NOW(),
     updated_at TIMESTAMPTZ DEFAULT NOW(),
     metadata JSONB DEFAULT '{}',
-    UNIQUE(store_name, forecast_date, fiscal_year, forecast_type)
+    UNIQUE(store_key, forecast_date, fiscal_year, forecast_type)
 );
 
--- Create indexes for budget forecasts
-CREATE INDEX IF NOT EXISTS idx_budget_forecasts_store_date ON budget_forecasts(store_name, forecast_date);
+-- Create indexes for budget forecasts (store/date lookups use the unique constraint)
 CREATE INDEX IF NOT EXISTS idx_budget_forecasts_fiscal_year ON budget_forecasts(fiscal_year, forecast_type);
 CREATE INDEX IF NOT EXISTS idx_budget_forecasts_date_range ON budget_forecasts(forecast_date, forecast_type);
 
--- Store mapping table to handle Excel store names to database store_id mapping
-CREATE TABLE IF NOT EXISTS store_name_mapping (
-    id SERIAL PRIMARY KEY,
-    excel_store_name TEXT UNIQUE NOT NULL,
-    database_store_name TEXT,
-    store_id INTEGER REFERENCES store(store_id),
-    is_active BOOLEAN DEFAULT TRUE,
-    created_at TIMESTAMPTZ DEFAULT NOW()
-);
-
 -- Insert store mappings based on Excel headers and existing store data
 INSERT INTO store_name_mapping (excel_store_name, database_store_name) VALUES
 ('Colwood', 'Cascadia Hatley Park'), -- Assuming Colwood maps to Hatley Park
@@ -73,6 +74,180 @@ INSERT INTO store_name_mapping (excel_store_name, database_store_name) VALUES
 ('Bear', 'Bear Mountain') -- New store not in current system
 ON CONFLICT (excel_store_name) DO NOTHING;
 
+-- =============================================
+-- Integer Store Keys
+-- =============================================
+
+-- Resolve a workbook store name to its store_name_mapping id, adding a
+-- mapping row for a name seen for the first time. store_id is not used as
+-- the key because it stays NULL for stores without a store record.
+CREATE OR REPLACE FUNCTION store_key_for(p_store_name TEXT) RETURNS INTEGER AS $$
+DECLARE
+    v_key INTEGER;
+BEGIN
+    SELECT id INTO v_key FROM store_name_mapping WHERE excel_store_name = p_store_name;
+    IF v_key IS NULL THEN
+        INSERT INTO store_name_mapping (excel_store_name) VALUES (p_store_name)
+        ON CONFLICT (excel_store_name) DO UPDATE SET excel_store_name = EXCLUDED.excel_store_name
+        RETURNING id INTO v_key;
+    END IF;
+    RETURN v_key;
+END;
+$$ LANGUAGE plpgsql;
+
+-- The bulk loader resolves keys itself; this fills them for every other
+-- writer (import_*_data(), sample data, the edge function)
+CREATE OR REPLACE FUNCTION fill_store_key()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF NEW.store_key IS NULL OR (TG_OP = 'UPDATE' AND NEW.store_name IS DISTINCT FROM OLD.store_name) THEN
+        NEW.store_key := store_key_for(NEW.store_name);
+    END IF;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Migrate tables created with TEXT store_name keys: add and backfill
+-- store_key, then move the unique constraint onto it and drop the
+-- store_name index. Safe to re-run.
+CREATE OR REPLACE FUNCTION migrate_to_store_key(p_table TEXT, p_unique_columns TEXT[])
+RETURNS VOID AS $$
+DECLARE
+    v_table REGCLASS := p_table::regclass;
+    v_name_attnum SMALLINT;
+    v_key_attnum SMALLINT;
+    r RECORD;
+BEGIN
+    EXECUTE format('ALTER TABLE %s ADD COLUMN IF NOT EXISTS store_key INTEGER', v_table);
+
+    EXECUTE format(
+        'INSERT INTO store_name_mapping (excel_store_name) '
+        'SELECT DISTINCT store_name FROM %s WHERE store_key IS NULL '
+        'ON CONFLICT (excel_store_name) DO NOTHING',
+        v_table
+    );
+    -- Backfilling is not a content change, so updated_at is left alone
+    EXECUTE format('ALTER TABLE %s DISABLE TRIGGER USER', v_table);
+    EXECUTE format(
+        'UPDATE %s t SET store_key = m.id FROM store_name_mapping m '
+        'WHERE t.store_key IS NULL AND m.excel_store_name = t.store_name',
+        v_table
+    );
+    EXECUTE format('ALTER TABLE %s ENABLE TRIGGER USER', v_table);
+    EXECUTE format('ALTER TABLE %s ALTER COLUMN store_key SET NOT NULL', v_table);
+
+    SELECT attnum INTO v_name_attnum FROM pg_attribute WHERE attrelid = v_table AND attname = 'store_name';
+    SELECT attnum INTO v_key_attnum FROM pg_attribute WHERE attrelid = v_table AND attname = 'store_key';
+
+    IF NOT EXISTS (
+        SELECT 1 FROM pg_constraint WHERE conrelid = v_table AND contype = 'f' AND conkey = ARRAY[v_key_attnum]
+    ) THEN
+        EXECUTE format(
+            'ALTER TABLE %s ADD CONSTRAINT %I FOREIGN KEY (store_key) REFERENCES store_name_mapping(id)',
+            v_table, p_table || '_store_key_fkey'
+        );
+    END IF;
+
+    FOR r IN
+        SELECT conname FROM pg_constraint
+        WHERE conrelid = v_table AND contype = 'u' AND conkey[1] = v_name_attnum
+    LOOP
+        EXECUTE format('ALTER TABLE %s DROP CONSTRAINT %I', v_table, r.conname);
+    END LOOP;
+    IF NOT EXISTS (
+        SELECT 1 FROM pg_constraint WHERE conrelid = v_table AND contype = 'u' AND conkey[1] = v_key_attnum
+    ) THEN
+        EXECUTE format(
+            'ALTER TABLE %s ADD CONSTRAINT %I UNIQUE (store_key, %s)',
+            v_table, p_table || '_store_key_key',
+            (SELECT string_agg(quote_ident(c), ', ') FROM unnest(p_unique_columns) AS c)
+        );
+    END IF;
+END;
+$$ LANGUAGE plpgsql;
+
+SELECT migrate_to_store_key('historical_daily_sales', ARRAY['sale_date', 'fiscal_year', 'data_type']);
+SELECT migrate_to_store_key('budget_forecasts', ARRAY['forecast_date', 'fiscal_year', 'forecast_type']);
+DROP INDEX IF EXISTS idx_historical_sales_store_date;
+DROP INDEX IF EXISTS idx_budget_forecasts_store_date;
+
+DROP TRIGGER IF EXISTS fill_historical_sales_store_key ON historical_daily_sales;
+CREATE TRIGGER fill_historical_sales_store_key
+    BEFORE INSERT OR UPDATE OF store_name, store_key ON historical_daily_sales
+    FOR EACH ROW EXECUTE FUNCTION fill_store_key();
+
+DROP TRIGGER IF EXISTS fill_budget_forecasts_store_key ON budget_forecasts;
+CREATE TRIGGER fill_budget_forecasts_store_key
+    BEFORE INSERT OR UPDATE OF store_name, store_key ON budget_forecasts
+    FOR EACH ROW EXECUTE FUNCTION fill_store_key();
+
+-- =============================================
+-- Incremental Import Tracking
+-- =============================================
+
+-- Content fingerprints per workbook ('*') and per sheet; an unchanged
+-- fingerprint lets an incremental import skip the file or sheet entirely
+CREATE TABLE IF NOT EXISTS import_fingerprints (
+    source_path TEXT NOT NULL,
+    sheet_name TEXT NOT NULL,
+    fingerprint TEXT NOT NULL,
+    imported_at TIMESTAMPTZ DEFAULT NOW(),
+    PRIMARY KEY (source_path, sheet_name)
+);
+
+-- Hash of the value columns of every imported row, keyed by workbook store name
+-- (record_type is 'historical:<data_type>' or 'forecast:<forecast_type>')
+CREATE TABLE IF NOT EXISTS import_row_hashes (
+    store_name TEXT NOT NULL,
+    record_date DATE NOT NULL,
+    fiscal_year INTEGER NOT NULL,
+    record_type TEXT NOT NULL,
+    row_hash BIGINT NOT NULL,
+    updated_at TIMESTAMPTZ DEFAULT NOW(),
+    PRIMARY KEY (store_name, record_date, fiscal_year, record_type)
+);
+
+-- Committed offset and counts of each chunked load, so a failed import
+-- resumes where it stopped; cleared when an import run completes (also
+-- created by pipeline_schema.sql)
+CREATE TABLE IF NOT EXISTS ingest_checkpoint (
+    target TEXT NOT NULL,
+    source_fingerprint TEXT NOT NULL,
+    committed_rows BIGINT NOT NULL DEFAULT 0,
+    counts JSONB NOT NULL DEFAULT '{}',
+    status TEXT NOT NULL DEFAULT 'running', -- 'running', 'completed' or 'failed'
+    error TEXT,
+    started_at TIMESTAMPTZ DEFAULT NOW(),
+    updated_at TIMESTAMPTZ DEFAULT NOW(),
+    completed_at TIMESTAMPTZ,
+    PRIMARY KEY (target, source_fingerprint)
+);
+
+-- =============================================
+-- Sales vs Budget Rollups
+-- =============================================
+
+-- Persistent day/week/month x store aggregates of daily_sales_budget_view,
+-- maintained per affected bucket by refresh_sales_budget_rollup()
+CREATE TABLE IF NOT EXISTS sales_budget_rollup (
+    grain TEXT NOT NULL, -- 'day', 'week' or 'month'
+    bucket_start DATE NOT NULL,
+    store_name TEXT NOT NULL,
+    fiscal_year INTEGER NOT NULL,
+    store_id INTEGER,
+    days_count INTEGER NOT NULL,
+    total_actual_sales DECIMAL(14,2) NOT NULL,
+    total_budget_forecast DECIMAL(14,2),
+    total_variance_amount DECIMAL(14,2) NOT NULL,
+    variance_percent_sum NUMERIC, -- AVG(variance_percent) = sum / count
+    variance_percent_count INTEGER NOT NULL DEFAULT 0,
+    refreshed_at TIMESTAMPTZ DEFAULT NOW(),
+    PRIMARY KEY (grain, store_name, bucket_start, fiscal_year)
+);
+
+CREATE INDEX IF NOT EXISTS idx_sales_budget_rollup_bucket ON sales_budget_rollup(grain, bucket_start);
+CREATE INDEX IF NOT EXISTS idx_sales_budget_rollup_store ON sales_budget_rollup(grain, store_id, bucket_start);
+
 -- =============================================
 -- Views for Dashboard Integration
 -- =============================================
@@ -97,53 +272,55 @@ SELECT
     hds.created_at
 FROM historical_daily_sales hds
 LEFT JOIN budget_forecasts bf 
-    ON hds.store_name = bf.store_name 
+    ON hds.store_key = bf.store_key 
     AND hds.sale_date = bf.forecast_date 
     AND hds.fiscal_year = bf.fiscal_year
-LEFT JOIN store_name_mapping snm 
-    ON hds.store_name = snm.excel_store_name
+JOIN store_name_mapping snm 
+    ON hds.store_key = snm.id
 WHERE hds.data_type = 'actual';
 
--- Monthly aggregated view
-CREATE OR REPLACE VIEW monthly_sales_budget_summary AS
+-- Monthly aggregated view (served from sales_budget_rollup)
+DROP VIEW IF EXISTS monthly_sales_budget_summary;
+CREATE VIEW monthly_sales_budget_summary AS
 SELECT 
     store_name,
     store_id,
-    DATE_TRUNC('month', sale_date) as month_year,
+    DATE_TRUNC('month', bucket_start) as month_year,
     fiscal_year,
-    COUNT(*) as days_in_month,
-    SUM(actual_sales) as total_actual_sales,
-    SUM(budget_forecast) as total_budget_forecast,
-    AVG(variance_percent) as avg_variance_percent,
-    SUM(variance_amount) as total_variance_amount,
+    days_count as days_in_month,
+    total_actual_sales,
+    total_budget_forecast,
+    variance_percent_sum / NULLIF(variance_percent_count, 0) as avg_variance_percent,
+    total_variance_amount,
     CASE 
-        WHEN SUM(budget_forecast) > 0 
-        THEN ((SUM(actual_sales) - SUM(budget_forecast)) / SUM(budget_forecast)) * 100
+        WHEN total_budget_forecast > 0 
+        THEN ((total_actual_sales - total_budget_forecast) / total_budget_forecast) * 100
         ELSE NULL 
     END as month_variance_percent
-FROM daily_sales_budget_view
-GROUP BY store_name, store_id, DATE_TRUNC('month', sale_date), fiscal_year
+FROM sales_budget_rollup
+WHERE grain = 'month'
 ORDER BY month_year DESC;
 
--- Weekly aggregated view
-CREATE OR REPLACE VIEW weekly_sales_budget_summary AS
+-- Weekly aggregated view (served from sales_budget_rollup)
+DROP VIEW IF EXISTS weekly_sales_budget_summary;
+CREATE VIEW weekly_sales_budget_summary AS
 SELECT 
     store_name,
     store_id,
-    DATE_TRUNC('week', sale_date) as week_starting,
+    DATE_TRUNC('week', bucket_start) as week_starting,
     fiscal_year,
-    COUNT(*) as days_in_week,
-    SUM(actual_sales) as total_actual_sales,
-    SUM(budget_forecast) as total_budget_forecast,
-    AVG(variance_percent) as avg_variance_percent,
-    SUM(variance_amount) as total_variance_amount,
+    days_count as days_in_week,
+    total_actual_sales,
+    total_budget_forecast,
+    variance_percent_sum / NULLIF(variance_percent_count, 0) as avg_variance_percent,
+    total_variance_amount,
     CASE 
-        WHEN SUM(budget_forecast) > 0 
-        THEN ((SUM(actual_sales) - SUM(budget_forecast)) / SUM(budget_forecast)) * 100
+        WHEN total_budget_forecast > 0 
+        THEN ((total_actual_sales - total_budget_forecast) / total_budget_forecast) * 100
         ELSE NULL 
     END as week_variance_percent
-FROM daily_sales_budget_view
-GROUP BY store_name, store_id, DATE_TRUNC('week', sale_date), fiscal_year
+FROM sales_budget_rollup
+WHERE grain = 'week'
 ORDER BY week_starting DESC;
 
 -- =============================================
@@ -168,7 +345,7 @@ BEGIN
         p_store_name, p_sale_date, p_day_of_week, p_day_number,
         p_fiscal_year, p_sales_amount, p_data_type
     )
-    ON CONFLICT (store_name, sale_date, fiscal_year, data_type) 
+    ON CONFLICT (store_key, sale_date, fiscal_year, data_type) 
     DO UPDATE SET
         sales_amount = EXCLUDED.sales_amount,
         day_of_week = EXCLUDED.day_of_week,
@@ -201,7 +378,7 @@ BEGIN
         p_store_name, p_forecast_date, p_day_of_week, p_day_number,
         p_fiscal_year, p_forecast_amount, p_variance_adjustment, p_forecast_type
     )
-    ON CONFLICT (store_name, forecast_date, fiscal_year, forecast_type)
+    ON CONFLICT (store_key, forecast_date, fiscal_year, forecast_type)
     DO UPDATE SET
         forecast_amount = EXCLUDED.forecast_amount,
         variance_adjustment = EXCLUDED.variance_adjustment,
@@ -216,6 +393,58 @@ EXCEPTION
 END;
 $$ LANGUAGE plpgsql;
 
+-- Recompute the rollup buckets that overlap [p_from, p_to]; NULL bounds mean
+-- all history, so refresh_sales_budget_rollup() is a full rebuild
+CREATE OR REPLACE FUNCTION refresh_sales_budget_rollup(
+    p_from DATE DEFAULT NULL,
+    p_to DATE DEFAULT NULL
+) RETURNS INTEGER AS $$
+DECLARE
+    v_grain TEXT;
+    v_lower DATE;
+    v_upper DATE;
+    v_rows INTEGER;
+    v_total INTEGER := 0;
+BEGIN
+    FOREACH v_grain IN ARRAY ARRAY['day', 'week', 'month'] LOOP
+        v_lower := COALESCE(DATE_TRUNC(v_grain, p_from)::DATE, '-infinity'::DATE);
+        v_upper := COALESCE((DATE_TRUNC(v_grain, p_to) + ('1 ' || v_grain)::INTERVAL)::DATE, 'infinity'::DATE);
+
+        DELETE FROM sales_budget_rollup
+        WHERE grain = v_grain AND bucket_start >= v_lower AND bucket_start < v_upper;
+
+        INSERT INTO sales_budget_rollup (
+            grain, bucket_start, store_name, fiscal_year, store_id, days_count,
+            total_actual_sales, total_budget_forecast, total_variance_amount,
+            variance_percent_sum, variance_percent_count
+        )
+        SELECT
+            v_grain,
+            DATE_TRUNC(v_grain, sale_date)::DATE,
+            store_name,
+            fiscal_year,
+            MAX(store_id),
+            COUNT(*),
+            SUM(actual_sales),
+            SUM(budget_forecast),
+            SUM(variance_amount),
+            SUM(variance_percent),
+            COUNT(variance_percent)
+        FROM daily_sales_budget_view
+        WHERE sale_date >= v_lower AND sale_date < v_upper
+        GROUP BY DATE_TRUNC(v_grain, sale_date)::DATE, store_name, fiscal_year;
+
+        GET DIAGNOSTICS v_rows = ROW_COUNT;
+        v_total := v_total + v_rows;
+    END LOOP;
+
+    -- Delivered on commit; the API reloads its budget variance cube
+    PERFORM pg_notify('sales_budget_rollup', COALESCE(p_from::TEXT, '') || ':' || COALESCE(p_to::TEXT, ''));
+
+    RETURN v_total;
+END;
+$$ LANGUAGE plpgsql;
+
 -- =============================================
 -- Trigger for updated_at timestamps
 -- =============================================
@@ -227,10 +456,12 @@ BEGIN
 END;
 $$ LANGUAGE plpgsql;
 
+DROP TRIGGER IF EXISTS update_historical_sales_updated_at ON historical_daily_sales;
 CREATE TRIGGER update_historical_sales_updated_at
     BEFORE UPDATE ON historical_daily_sales
     FOR EACH ROW EXECUTE FUNCTION update_updated_at_column();
 
+DROP TRIGGER IF EXISTS update_budget_forecasts_updated_at ON budget_forecasts;
 CREATE TRIGGER update_budget_forecasts_updated_at
     BEFORE UPDATE ON budget_forecasts
     FOR EACH ROW EXECUTE FUNCTION update_updated_at_column();
@@ -240,7 +471,11 @@ CREATE TRIGGER update_budget_forecasts_updated_at
 -- =============================================
 COMMENT ON TABLE historical_daily_sales IS 'Historical daily sales data imported from Excel files including both actual and forecast data';
 COMMENT ON TABLE budget_forecasts IS 'Budget and forecast data by store and date for variance analysis';
-COMMENT ON TABLE store_name_mapping IS 'Mapping between Excel store names and database store records';
+COMMENT ON TABLE store_name_mapping IS 'Mapping between Excel store names and database store records; id is the store_key of the budget fact tables';
+COMMENT ON TABLE import_fingerprints IS 'Workbook and sheet content fingerprints from the last successful import';
+COMMENT ON TABLE ingest_checkpoint IS 'Committed offset and running counts of chunked, resumable loads per target and source';
+COMMENT ON TABLE import_row_hashes IS 'Per-row content hashes used by incremental imports to skip unchanged rows';
+COMMENT ON TABLE sales_budget_rollup IS 'Day/week/month x store sales vs budget aggregates maintained incrementally by the importer';
 COMMENT ON VIEW daily_sales_budget_view IS 'Combined view of daily sales actuals vs budget with variance calculations';
 COMMENT ON VIEW monthly_sales_budget_summary IS 'Monthly aggregated sales vs budget performance';
 COMMENT ON VIEW weekly_sales_budget_summary IS 'Weekly aggregated sales vs budget performance';
\ No newline at end of file
@@ -7,11 +7,12 @@ This script will:
 3. Verify the setup
 """
 
+import argparse
 import os
 import sys
 import psycopg2
 import logging
-from import_sales_budget_data import SalesBudgetImporter
+from import_sales_budget_data import DEFAULT_EXCEL_FILE_PATH, SalesBudgetImporter
 
 # Setup logging
 logging.basicConfig(
@@ -168,10 +169,17 @@ def verify_setup(connection_string: str) -> bool:
 
 def main():
     """Main setup process"""
+    parser = argparse.ArgumentParser(description="Set up the Sales & Budget Data system")
+    parser.add_argument('excel_file_path', nargs='?', default=DEFAULT_EXCEL_FILE_PATH,
+                        help="Path to the sales & budget workbook")
+    parser.add_argument('--incremental', action='store_true',
+                        help="Skip unchanged workbooks and only load new or changed rows")
+    args = parser.parse_args()
+    
     logger.info("Starting Sales & Budget Data system setup")
     
     # Configuration
-    excel_file_path = r"C:\Users\Jay\OneDrive - trufflesgroupttg\Database Design & Planning Documents\Cascadia Daily Sales & Budget Data.xlsx"
+    excel_file_path = args.excel_file_path
     connection_string = os.getenv('DATABASE_URL')
     
     if not connection_string:
@@ -195,7 +203,7 @@ def main():
     
     # Step 3: Import data
     logger.info("Starting data import...")
-    importer = SalesBudgetImporter(excel_file_path, connection_string)
+    importer = SalesBudgetImporter(excel_file_path, connection_string, incremental=args.incremental)
     if not importer.run_import():
         logger.error("Data import failed")
         sys.exit(1)
@@ -0,0 +1,62 @@
+from datetime import date, timedelta
+
+import pytest
+
+from app.services.budget_cube import BudgetCube
+
+
+def _row(store, day, fiscal_year, actual, budget=None, store_id=None):
+    return {
+        "store_name": store, "store_id": store_id, "bucket_start": day, "fiscal_year": fiscal_year,
+        "days_count": 1, "actual": actual, "budget": budget, "budget_days": int(budget is not None),
+    }
+
+
+@pytest.fixture
+def cube():
+    first = date(2026, 3, 1)
+    rows = []
+    for i in range(10):
+        day = first + timedelta(days=i)
+        rows.append(_row("North", day, 2026, 100.0, 80.0, store_id=1))
+        if i != 4:
+            rows.append(_row("South", day, 2026, 50.0))
+    return BudgetCube(rows)
+
+
+def test_day_totals(cube):
+    results = cube.variance("day", store_names=["North"], start_date=date(2026, 3, 9))
+    assert [r["bucket_start"] for r in results] == [date(2026, 3, 10), date(2026, 3, 9)]
+    assert results[0]["total_variance_amount"] == 20.0
+    assert results[0]["variance_percent"] == 25.0
+    assert results[0]["store_id"] == 1
+
+
+def test_no_budget_is_none(cube):
+    (result,) = cube.variance("month", store_names=["South"])
+    assert result["total_budget_forecast"] is None
+    assert result["variance_percent"] is None
+    assert result["days_count"] == 9
+
+
+def test_day_without_rows_keeps_the_fiscal_year():
+    first = date(2026, 3, 1)
+    # No store has a row on the second day
+    rows = [_row("North", first, 2026, 1.0), _row("North", first + timedelta(days=2), 2026, 2.0)]
+    results = BudgetCube(rows).variance("fiscal_year")
+    assert len(results) == 1
+    assert results[0]["fiscal_year"] == 2026
+    assert results[0]["days_count"] == 2
+    assert results[0]["total_actual_sales"] == 3.0
+
+
+def test_all_stores_and_week_buckets(cube):
+    results = cube.variance("week", by_store=False)
+    # 2026-03-01 is a Sunday, so the first week holds one day
+    assert [r["bucket_start"] for r in results] == [date(2026, 3, 9), date(2026, 3, 2), date(2026, 2, 23)]
+    assert sum(r["total_actual_sales"] for r in results) == 10 * 100.0 + 9 * 50.0
+
+
+def test_unknown_grain(cube):
+    with pytest.raises(ValueError):
+        cube.variance("quarter")
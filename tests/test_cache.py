@@ -0,0 +1,95 @@
+import asyncio
+
+import pytest
+
+from app.core.cache import ALL_STORES, ResultCache
+
+
+def _load(value, calls):
+    async def loader():
+        calls.append(value)
+        await asyncio.sleep(0)
+        return value
+    return loader
+
+
+def _run(coro):
+    return asyncio.run(coro)
+
+
+def test_hit_after_miss():
+    cache, calls = ResultCache(ttl=60, max_entries=10), []
+
+    async def scenario():
+        first = await cache.get_or_load("k", (("sales", 1),), _load("a", calls))
+        second = await cache.get_or_load("k", (("sales", 1),), _load("b", calls))
+        return first, second
+
+    assert _run(scenario()) == ("a", "a")
+    assert calls == ["a"]
+    assert cache.stats()["hits"] == 1
+
+
+def test_invalidate_by_store():
+    cache, calls = ResultCache(ttl=60, max_entries=10), []
+
+    async def scenario():
+        await cache.get_or_load("store1", (("inventory", 1),), _load(1, calls))
+        await cache.get_or_load("store2", (("inventory", 2),), _load(2, calls))
+        await cache.get_or_load("all", (("inventory", ALL_STORES),), _load(0, calls))
+        await cache.get_or_load("other", (("sales", 1),), _load(3, calls))
+
+    _run(scenario())
+    # Store 1's entry and the all-store entry include store 1; the rest survive
+    assert cache.invalidate("inventory", {1}) == 2
+    assert cache.stats()["entries"] == 2
+    assert cache.invalidate("inventory") == 1
+    assert cache.invalidate("sales") == 1
+
+
+def test_invalidation_during_load_is_not_stored():
+    cache, calls = ResultCache(ttl=60, max_entries=10), []
+
+    async def scenario():
+        async def loader():
+            cache.invalidate("sales")
+            return "stale"
+        await cache.get_or_load("k", (("sales", ALL_STORES),), loader)
+        return await cache.get_or_load("k", (("sales", ALL_STORES),), _load("fresh", calls))
+
+    assert _run(scenario()) == "fresh"
+
+
+def test_concurrent_misses_share_one_load():
+    cache, calls = ResultCache(ttl=60, max_entries=10), []
+
+    async def scenario():
+        loader = _load("v", calls)
+        return await asyncio.gather(*(cache.get_or_load("k", (("sales", 1),), loader) for _ in range(3)))
+
+    assert _run(scenario()) == ["v", "v", "v"]
+    assert calls == ["v"]
+    assert cache.stats()["coalesced"] == 2
+
+
+def test_lru_eviction():
+    cache, calls = ResultCache(ttl=60, max_entries=2), []
+
+    async def scenario():
+        for key in ("a", "b", "a", "c"):
+            await cache.get_or_load(key, (), _load(key, calls))
+
+    _run(scenario())
+    assert cache.stats()["evictions"] == 1
+    assert set(cache._entries) == {"a", "c"}
+
+
+def test_failed_load_is_not_cached():
+    cache = ResultCache(ttl=60, max_entries=10)
+
+    async def failing():
+        raise RuntimeError("boom")
+
+    with pytest.raises(RuntimeError):
+        _run(cache.get_or_load("k", (), failing))
+    assert cache.stats()["entries"] == 0
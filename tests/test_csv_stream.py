@@ -0,0 +1,58 @@
+import asyncio
+import gzip
+
+import pytest
+
+from app.utils.csv_stream import CsvFormatError, iter_batches, iter_csv_rows
+
+
+async def _chunks(data, size):
+    for i in range(0, len(data), size):
+        yield data[i:i + size]
+
+
+def _rows(data, size=4):
+    async def collect():
+        return [row async for row in iter_csv_rows(_chunks(data, size))]
+    return asyncio.run(collect())
+
+
+BODY = 'sku,note\nA1,"first line\nsecond line"\nA2,"say ""hi"", bye"\nA3,\n'.encode()
+
+
+@pytest.mark.parametrize("size", [1, 3, 7, len(BODY)])
+def test_quoted_newlines_across_chunks(size):
+    assert _rows(BODY, size) == [
+        (2, {"sku": "A1", "note": "first line\nsecond line"}),
+        (3, {"sku": "A2", "note": 'say "hi", bye'}),
+        (4, {"sku": "A3", "note": ""}),
+    ]
+
+
+def test_gzip_bom_and_crlf():
+    body = gzip.compress("﻿sku,qty\r\nA1,2\r\n\r\nA2,3".encode())
+    assert _rows(body, 5) == [(2, {"sku": "A1", "qty": "2"}), (4, {"sku": "A2", "qty": "3"})]
+
+
+def test_multibyte_character_split_across_chunks():
+    assert _rows("sku,name\nA1,café\n".encode(), 1) == [(2, {"sku": "A1", "name": "café"})]
+
+
+def test_field_count_mismatch():
+    with pytest.raises(CsvFormatError, match="line 2: expected 2 fields, got 3"):
+        _rows(b"a,b\n1,2,3\n")
+
+
+def test_missing_header():
+    with pytest.raises(CsvFormatError, match="missing header row"):
+        _rows(b"")
+
+
+def test_batches():
+    async def numbers():
+        for i in range(5):
+            yield i
+
+    async def collect():
+        return [batch async for batch in iter_batches(numbers(), 2)]
+    assert asyncio.run(collect()) == [[0, 1], [2, 3], [4]]
@@ -0,0 +1,36 @@
+import numpy as np
+
+from app.services.reorder_engine import DO_NOT_REORDER, LTO, NO_EXCEPTION, STRIKE, abc_classes, compute_reorder
+
+
+def test_abc_classes_rank_within_store():
+    stores = np.array([1, 1, 1, 1, 2, 2])
+    revenue = np.array([10.0, 70.0, 15.0, 5.0, 0.0, 1.0])
+    # Store 1: 70 (0% before) A, 15 (70%) A, 10 (85%) B, 5 (95%) C; store 2: 1 A, unsold C
+    assert abc_classes(stores, revenue).tolist() == [1, 0, 0, 2, 2, 0]
+
+
+def test_abc_classes_empty():
+    assert len(abc_classes(np.array([]), np.array([]))) == 0
+
+
+def test_compute_reorder():
+    n = 5
+    result = compute_reorder(
+        store_ids=np.ones(n, dtype=np.int64),
+        on_hand=np.array([2, 0, 0, 0, 0]),
+        units_sold=np.array([28, 28, 28, 28, 28]),
+        revenue=np.full(n, 1.0),
+        min_qty=np.array([0, 0, 0, 4, 0]),
+        multiplier=np.ones(n),
+        units_per_case=np.array([6, 0, 1, 1, 1]),
+        exception=np.array([NO_EXCEPTION, NO_EXCEPTION, DO_NOT_REORDER, LTO, STRIKE]),
+        window_days=28,
+    )
+    assert result.weekly_velocity.tolist() == [7.0] * n
+    assert result.abc_class.tolist() == ["A", "A", "A", "A", "B"]
+    # 7 a week x 3 weeks of supply for A; LTO is held at its minimum
+    assert result.target_qty.tolist() == [21, 21, 21, 4, 14]
+    # 19 needed rounds up to 4 cases of 6; a case size of 0 counts as 1
+    assert result.recommended_qty.tolist() == [24, 21, 0, 4, 0]
+    assert result.cases.tolist() == [4, 21, 0, 4, 0]
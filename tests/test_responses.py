@@ -0,0 +1,77 @@
+import gzip
+from datetime import date
+from decimal import Decimal
+
+import orjson
+import pytest
+from fastapi import HTTPException
+from starlette.requests import Request
+
+from app.models.schemas import InventoryStatus
+from app.utils import responses
+
+ROWS = [
+    {"store_id": 1, "sku": "A1", "quantity": Decimal("2"), "extra": [1, 2], "day": date(2026, 1, 2)},
+    {"store_id": 2, "sku": "A,2", "quantity": None, "extra": None, "day": None},
+]
+
+
+def _request(accept="", accept_encoding=""):
+    headers = [(b"accept", accept.encode()), (b"accept-encoding", accept_encoding.encode())]
+    return Request({"type": "http", "method": "GET", "path": "/", "headers": headers})
+
+
+@pytest.mark.parametrize("accept, expected", [
+    ("", "json"),
+    ("text/csv", "csv"),
+    ("application/json;q=0.5, text/csv;q=0.9", "csv"),
+    ("text/html", "json"),
+    ("text/csv;q=0", "json"),
+])
+def test_negotiate(accept, expected):
+    assert responses.negotiate(_request(accept)) == expected
+
+
+def test_explicit_format_wins():
+    assert responses.negotiate(_request("text/csv"), "json") == "json"
+
+
+def test_unavailable_msgpack(monkeypatch):
+    monkeypatch.setattr(responses, "msgpack", None)
+    with pytest.raises(HTTPException) as info:
+        responses.negotiate(_request(), "msgpack")
+    assert info.value.status_code == 406
+    assert responses.negotiate(_request("application/msgpack")) == "json"
+
+
+def test_encode_json_and_ndjson():
+    body = responses.encode_rows(ROWS, "json", [])
+    assert orjson.loads(body)[0] == {"store_id": 1, "sku": "A1", "quantity": 2.0, "extra": [1, 2], "day": "2026-01-02"}
+    lines = responses.encode_rows(ROWS, "ndjson", []).splitlines()
+    assert [orjson.loads(line) for line in lines] == orjson.loads(body)
+
+
+def test_encode_csv():
+    body = responses.encode_rows(ROWS, "csv", ["sku", "quantity", "extra", "day"]).decode()
+    assert body.splitlines() == ["sku,quantity,extra,day", 'A1,2,"[1, 2]",2026-01-02', '"A,2",,,']
+
+
+def test_encode_csv_empty_keeps_header():
+    assert responses.encode_rows([], "csv", ["store_id", "sku"]) == b"store_id,sku\r\n"
+
+
+def test_rows_response_compresses_large_bodies(monkeypatch):
+    monkeypatch.setattr(responses.settings, "response_compress_min_bytes", 10)
+    monkeypatch.setattr(responses, "brotli", None)
+    rows = [{"store_id": 1, "sku": "A1", "quantity": 3}] * 50
+    response = responses.rows_response(_request(accept_encoding="br, gzip"), rows, InventoryStatus)
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.headers["vary"] == "Accept, Accept-Encoding"
+    assert orjson.loads(gzip.decompress(response.body)) == rows
+
+
+def test_rows_response_small_body_is_not_compressed(monkeypatch):
+    monkeypatch.setattr(responses.settings, "response_compress_min_bytes", 10_000)
+    response = responses.rows_response(_request("text/csv", "gzip"), ROWS[:1], InventoryStatus)
+    assert "content-encoding" not in response.headers
+    assert response.media_type == responses.MEDIA_TYPES["csv"]
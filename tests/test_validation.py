@@ -0,0 +1,107 @@
+from datetime import date, timedelta
+from decimal import Decimal
+
+import pandas as pd
+import pytest
+from pydantic import ValidationError
+
+from app.models.schemas import InventoryRecord, InventorySnapshotRecord, SalesRecord
+from app.models.validation import QUARANTINE, REJECT, BatchValidationError, validate_batch
+from app.services import ingestion_service
+
+TOMORROW = (date.today() + timedelta(days=1)).isoformat()
+
+SALES = [
+    {"store_id": "1", "sku": "SKU-1", "quantity": "3", "price": "9.99", "sale_date": "2024-01-05"},
+    # Slow path, but still valid: Pydantic coerces these
+    {"store_id": " 2 ", "sku": "SKU_2", "quantity": "+4", "price": "1e1", "sale_date": "2024-01-05"},
+    {"store_id": "3", "sku": "SKU-3", "quantity": "2", "price": "0.50", "sale_date": "2024-01-05T00:00"},
+    # Invalid
+    {"store_id": "x", "sku": "SKU-4", "quantity": "1", "price": "1", "sale_date": "2024-01-05"},
+    {"store_id": "5", "sku": "bad sku", "quantity": "1", "price": "1", "sale_date": "2024-01-05"},
+    {"store_id": "6", "sku": "SKU-6", "quantity": "0", "price": "1", "sale_date": "2024-01-05"},
+    {"store_id": "7", "sku": "SKU-7", "quantity": "1", "price": "-1", "sale_date": "2024-01-05"},
+    {"store_id": "8", "sku": "SKU-8", "quantity": "1", "price": "1", "sale_date": "2024-02-30"},
+    {"store_id": "9", "sku": "SKU-9", "quantity": "1", "price": "1", "sale_date": TOMORROW},
+    {"store_id": "10", "sku": "SKU-10", "quantity": "1", "price": "1"},
+]
+
+INVENTORY = [
+    {"store_id": "1", "sku": "SKU-1", "quantity": "0", "last_updated": "2024-01-05"},
+    {"store_id": "2", "sku": "SKU-2", "quantity": "5", "last_updated": "2024-01-05"},
+    {"store_id": "3", "sku": "SKU-3", "quantity": "-1", "last_updated": "2024-01-05"},
+    {"store_id": "4", "sku": "SKU-4", "quantity": "007", "last_updated": TOMORROW},
+]
+
+
+def _per_row(rows, model):
+    """What the per-row Pydantic path accepts, and the errors it reports."""
+    valid, errors = {}, []
+    for row, raw in enumerate(rows):
+        try:
+            valid[row] = model(**raw).dict()
+        except ValidationError as exc:
+            errors.extend((row, ".".join(str(p) for p in e["loc"]), e["msg"]) for e in exc.errors())
+    return valid, errors
+
+
+@pytest.mark.parametrize("model, rows", [
+    (SalesRecord, SALES),
+    (InventoryRecord, INVENTORY),
+    (InventorySnapshotRecord, INVENTORY),
+])
+def test_matches_per_row_validation(model, rows):
+    frame = pd.DataFrame(rows, dtype=object)
+    frame = frame.where(frame.notna(), None)
+    result = validate_batch(frame, model, QUARANTINE)
+
+    expected_valid, expected_errors = _per_row(rows, model)
+    assert result.valid.to_dict("index") == expected_valid
+    assert list(result.errors.itertuples(index=False, name=None)) == expected_errors
+
+
+def test_fast_path_types():
+    frame = pd.DataFrame(SALES[:1], dtype=object)
+    row = validate_batch(frame, SalesRecord).valid.iloc[0]
+    assert row["store_id"] == 1 and row["quantity"] == 3
+    assert row["price"] == Decimal("9.99")
+    assert row["sale_date"] == date(2024, 1, 5)
+
+
+def test_reject_mode_raises_with_the_report():
+    frame = pd.DataFrame(INVENTORY, dtype=object)
+    with pytest.raises(BatchValidationError) as info:
+        validate_batch(frame, InventoryRecord, REJECT)
+    assert set(info.value.errors["row"]) == {0, 2, 3}
+
+
+def test_snapshot_allows_zero_quantity():
+    frame = pd.DataFrame(INVENTORY[:2], dtype=object)
+    assert validate_batch(frame, InventorySnapshotRecord).valid["quantity"].tolist() == [0, 5]
+
+
+JSON_SALES = [
+    {"store_id": 1, "sku": "SKU-1", "quantity": 3, "price": 9.99, "sale_date": "2024-01-05"},
+    {"store_id": 2, "sku": "SKU-2", "quantity": 1, "price": 10, "sale_date": "2024-01-05", "extra": True},
+    {"store_id": 3, "sku": "SKU-3", "quantity": 1, "price": "0.5", "sale_date": "2024-01-05"},
+    {"store_id": 4, "sku": "SKU-4", "quantity": 0, "price": -2.5, "sale_date": "2024-01-05"},
+    {"store_id": 5, "sku": "SKU-5", "quantity": 1, "sale_date": "2024-01-05"},
+    {"store_id": None, "sku": "SKU-6", "quantity": 1, "price": 1.0, "sale_date": TOMORROW},
+]
+
+
+def test_json_records_match_per_row_validation():
+    batch = list(enumerate(JSON_SALES))
+    rows, errors = ingestion_service._validated_records(batch, SalesRecord, ingestion_service.SALES_COLUMNS, QUARANTINE)
+
+    expected_valid, expected_errors = _per_row([{k: v for k, v in r.items() if v is not None} for r in JSON_SALES],
+                                               SalesRecord)
+    assert rows == [tuple(v[c] for c in ingestion_service.SALES_COLUMNS) for v in expected_valid.values()]
+    assert list(errors.itertuples(index=False, name=None)) == expected_errors
+
+
+def test_decode_records():
+    assert ingestion_service.decode_records(b'{"records": [{"sku": "A"}]}') == [{"sku": "A"}]
+    for body in (b"{", b"[]", b'{"records": [1]}'):
+        with pytest.raises(ingestion_service.InvalidPayload):
+            ingestion_service.decode_records(body)
@@ -0,0 +1,220 @@
+#!/usr/bin/env python3
+"""
+Backfill sales & budget history from many workbooks in one run
+Finds every forecast sheet ('FCST FY26', 'Budget FY2024', ...) in the given
+workbooks and directories, parses the sheets in a process pool (each one
+read with openpyxl in read-only mode, which keeps the workbook's XML out of
+memory; the sheet's cells are still held whole while it is parsed) and
+loads the results through a single bulk loader connection as they arrive,
+committing per sheet. At most two sheets per worker are parsed or waiting
+to be loaded at once, so memory is bounded by the size of a few sheets
+however many years are backfilled. Each sheet is loaded in checkpointed
+batches keyed on its content, so rerunning a failed backfill skips
+finished sheets and resumes the interrupted ones; a backfill that succeeds
+clears the checkpoints, so the next run loads everything again. Rollups
+are refreshed once at the end for the whole date range.
+"""
+
+import argparse
+import logging
+import multiprocessing
+import os
+import sys
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from typing import Iterator, List, NamedTuple, Optional, Tuple
+
+import pandas as pd
+from openpyxl import load_workbook
+
+from budget_bulk_loader import BudgetBulkLoader, StoreKeyCache
+from import_fingerprints import WORKBOOK, IncrementalTracker, file_fingerprint, frame_fingerprint
+from import_sales_budget_data import SalesBudgetImporter, read_sheet, sheet_fiscal_year
+
+logger = logging.getLogger(__name__)
+
+WORKBOOK_EXTENSIONS = ('.xlsx', '.xlsm')
+
+
+class SheetResult(NamedTuple):
+    path: str
+    sheet_name: str
+    fingerprint: str
+    historical: pd.DataFrame
+    forecast: pd.DataFrame
+
+
+def discover_workbooks(paths: List[str]) -> List[str]:
+    """Expand directories (recursively) into the workbooks they contain, skipping Excel lock files"""
+    found = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, _, files in os.walk(path):
+                found.extend(
+                    os.path.join(root, name) for name in files
+                    if name.lower().endswith(WORKBOOK_EXTENSIONS) and not name.startswith('~$')
+                )
+        else:
+            found.append(path)
+    return sorted(os.path.abspath(path) for path in found)
+
+
+def forecast_sheets(path: str) -> List[Tuple[str, int]]:
+    """(sheet name, forecast fiscal year) of every forecast sheet in the workbook"""
+    workbook = load_workbook(path, read_only=True)
+    try:
+        names = workbook.sheetnames
+    finally:
+        workbook.close()
+    sheets = [(name, sheet_fiscal_year(name)) for name in names]
+    return [(name, year) for name, year in sheets if year is not None]
+
+
+def parse_sheet(path: str, sheet_name: str, fiscal_year: int) -> SheetResult:
+    """Read and reshape one sheet; runs in a worker process"""
+    importer = SalesBudgetImporter(path, None)
+    df = read_sheet(path, sheet_name)
+    structure = importer.parse_excel_structure(df, fiscal_year)
+    if not structure['store_columns']:
+        empty = pd.DataFrame()
+        return SheetResult(path, sheet_name, frame_fingerprint(df), empty, empty)
+    adjustments = importer.extract_variance_adjustments(df, structure)
+    historical, forecast = importer.process_data_rows(df, structure, adjustments)
+    return SheetResult(path, sheet_name, frame_fingerprint(df), historical, forecast)
+
+
+class WorkbookBackfill:
+    def __init__(self, paths: List[str], connection_string: str, workers: Optional[int] = None,
+                 incremental: bool = False, restart: bool = False):
+        self.paths = paths
+        self.connection_string = connection_string
+        self.workers = workers or os.cpu_count() or 2
+        self.incremental = incremental
+        self.restart = restart
+        self.importer = SalesBudgetImporter(None, connection_string, incremental=incremental)
+        self.date_range = None
+
+    def _sheet_tasks(self, workbooks: List[str]) -> Iterator[Tuple[str, str, int]]:
+        for path in workbooks:
+            if self.incremental:
+                tracker = IncrementalTracker(self.importer.conn, path)
+                if tracker.fingerprint_unchanged(WORKBOOK, file_fingerprint(path)):
+                    logger.info(f"{path}: unchanged since last import, skipping")
+                    continue
+            sheets = forecast_sheets(path)
+            if not sheets:
+                logger.warning(f"{path}: no forecast sheets found")
+            for sheet_name, fiscal_year in sheets:
+                yield path, sheet_name, fiscal_year
+
+    def _extend_range(self, frame: pd.DataFrame, column: str):
+        if frame.empty:
+            return
+        low, high = frame[column].min().date(), frame[column].max().date()
+        if self.date_range is None:
+            self.date_range = (low, high)
+        else:
+            self.date_range = (min(self.date_range[0], low), max(self.date_range[1], high))
+
+    def _load(self, result: SheetResult, loader: BudgetBulkLoader):
+        """Load one parsed sheet in checkpointed batches, then its fingerprint and row hashes in incremental mode"""
+        conn = self.importer.conn
+        tracker = IncrementalTracker(conn, result.path)
+        label = f"{os.path.basename(result.path)} [{result.sheet_name}]"
+        if result.historical.empty and result.forecast.empty:
+            logger.warning(f"{label}: no store columns or rows found")
+            return
+        if self.incremental and tracker.fingerprint_unchanged(result.sheet_name, result.fingerprint):
+            logger.info(f"{label}: unchanged since last import, skipping")
+            return
+
+        historical, forecast = result.historical, result.forecast
+        if self.incremental:
+            historical, historical_keys, _ = tracker.diff(historical, 'historical')
+            forecast, forecast_keys, _ = tracker.diff(forecast, 'forecast')
+        checkpoint = f"{result.fingerprint}:{'incremental' if self.incremental else 'full'}"
+        if self.restart:
+            loader.clear_checkpoints(checkpoint)
+        try:
+            historical_result = loader.load_historical(historical, checkpoint) if not historical.empty else None
+            forecast_result = loader.load_forecasts(forecast, checkpoint) if not forecast.empty else None
+            if self.incremental:
+                tracker.record_rows(historical_keys)
+                tracker.record_rows(forecast_keys)
+                tracker.record_fingerprint(result.sheet_name, result.fingerprint)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        for kind, load_result in (('historical', historical_result), ('forecast', forecast_result)):
+            if load_result is not None:
+                logger.info(f"{label}: {kind} {load_result.inserted} inserted, {load_result.updated} updated, "
+                            f"{len(load_result.rejected)} rejected")
+        self._extend_range(historical, 'sale_date')
+        self._extend_range(forecast, 'forecast_date')
+
+    def run(self) -> bool:
+        workbooks = discover_workbooks(self.paths)
+        logger.info(f"Backfilling from {len(workbooks)} workbooks with {self.workers} workers")
+        if not self.importer.connect_database():
+            return False
+        loaded_workbooks = set()
+        try:
+            loader = BudgetBulkLoader(self.importer.conn, store_keys=StoreKeyCache(self.importer.conn))
+            tasks = self._sheet_tasks(workbooks)
+            # spawn keeps the parent's database connection out of the workers
+            with ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context('spawn')) as pool:
+                pending = {}
+                while True:
+                    while len(pending) < self.workers * 2:
+                        task = next(tasks, None)
+                        if task is None:
+                            break
+                        pending[pool.submit(parse_sheet, *task)] = task
+                    if not pending:
+                        break
+                    done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        path, sheet_name, _ = pending.pop(future)
+                        self._load(future.result(), loader)
+                        loaded_workbooks.add(path)
+
+            if self.date_range is not None and not self.importer._refresh_rollup_range(*self.date_range):
+                logger.error("Backfill loaded but rollups were not refreshed")
+                return False
+            if self.incremental:
+                for path in loaded_workbooks:
+                    IncrementalTracker(self.importer.conn, path).record_fingerprint(WORKBOOK, file_fingerprint(path))
+            loader.clear_checkpoints()
+            self.importer.conn.commit()
+            logger.info("Backfill completed successfully")
+            return True
+        except Exception as e:
+            logger.error(f"Backfill failed: {e}")
+            return False
+        finally:
+            self.importer.close_connection()
+
+
+def main():
+    """Main entry point"""
+    parser = argparse.ArgumentParser(description="Backfill Cascadia sales & budget history from many workbooks")
+    parser.add_argument('paths', nargs='+', help="Workbooks or directories of workbooks")
+    parser.add_argument('--workers', type=int, help="Sheet parsing processes (default: CPU count)")
+    parser.add_argument('--incremental', action='store_true',
+                        help="Skip unchanged workbooks and sheets and only load new or changed rows")
+    parser.add_argument('--restart', action='store_true',
+                        help="Ignore checkpoints of earlier runs and load every sheet from the first row")
+    args = parser.parse_args()
+
+    connection_string = os.getenv('DATABASE_URL')
+    if not connection_string:
+        logger.error("Please set DATABASE_URL environment variable with your Supabase connection string")
+        sys.exit(1)
+
+    backfill = WorkbookBackfill(args.paths, connection_string, workers=args.workers, incremental=args.incremental,
+                                restart=args.restart)
+    sys.exit(0 if backfill.run() else 1)
+
+
+if __name__ == "__main__":
+    main()